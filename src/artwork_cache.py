@@ -0,0 +1,64 @@
+# artwork_cache.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import Gio
+from euterpe_gtk.disk_cache import DiskCache
+
+# Default size of the artwork cache on disk in bytes.
+DEFAULT_MAX_SIZE = 100 * 1024 * 1024
+
+
+class ArtworkCache(DiskCache):
+    '''
+    ArtworkCache stores images downloaded from the Euterpe server on disk
+    so that they do not have to be downloaded again. Once the cache grows
+    above its maximum size the least recently used images are removed.
+
+    Images are keyed by the server address, the kind of artwork ("album" or
+    "artist"), the album or artist ID and the ArtworkSize.
+
+    All methods must be called from the main thread.
+    '''
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        super().__init__(directory, max_size)
+
+    def lookup_image(self, server, kind, item_id, size):
+        '''
+        Returns a Gio.File for the cached image or None when there is no
+        such image in the cache.
+        '''
+        path = self.lookup((server, kind, item_id, size))
+        if path is None:
+            return None
+
+        return Gio.File.new_for_path(path)
+
+    def store_image(self, server, kind, item_id, size, data):
+        '''
+        Stores `data` (GLib.Bytes) as the image for this key. Writing to
+        disk happens asynchronously.
+        '''
+        self.store((server, kind, item_id, size), data)
+
+    def remove_image(self, server, kind, item_id):
+        '''
+        Removes all sizes of an image from the cache. Used when the
+        image has been changed on the server.
+        '''
+        for size in ('full', 'small'):
+            self.remove((server, kind, item_id, size))
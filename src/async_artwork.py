@@ -17,12 +17,72 @@
 
 from functools import partial
 
-from gi.repository import Gio, Gdk, Gtk
+from gi.repository import Gio, Gdk, Gtk, GLib
 from gi.repository.GdkPixbuf import Pixbuf
-from euterpe_gtk.service import ArtworkSize
+from euterpe_gtk.service import ArtworkSize, ARTWORK_ALBUM, ARTWORK_ARTIST
+from euterpe_gtk.lru_cache import LRUCache
 import euterpe_gtk.log as log
 
 
+# Maximum number of bytes which decoded artwork images may occupy in memory.
+PIXBUF_CACHE_MAX_SIZE = 64 * 1024 * 1024
+
+
+class PixbufCache(object):
+    '''
+    PixbufCache keeps decoded artwork images in memory so that the same image
+    shown on many places at once is decoded and stored only once. The least
+    recently used images are dropped when the cache grows above `max_size`
+    bytes.
+    '''
+
+    def __init__(self, max_size):
+        self._pixbufs = LRUCache(max_size=max_size,
+            size_func=lambda pb: pb.get_byte_length())
+
+    def get(self, key):
+        return self._pixbufs.get(key)
+
+    def put(self, key, pb):
+        self._pixbufs.put(key, pb)
+
+    def remove(self, server, kind, artwork_id):
+        '''
+        Removes all sizes of a particular image from the cache.
+        '''
+        self._pixbufs.remove_if(lambda k: k[:3] == (server, kind, artwork_id))
+
+
+_pixbuf_cache = PixbufCache(PIXBUF_CACHE_MAX_SIZE)
+
+# Maps pixbuf cache keys to the list of AsyncArtwork waiting for the image
+# to be decoded. Only the first one actually decodes it.
+_pending_decodes = {}
+
+
+def _on_artwork_pixbuf_ready(obj, res, cache_key):
+    waiters = _pending_decodes.pop(cache_key, [])
+
+    try:
+        pb = Pixbuf.new_from_stream_finish(res)
+    except GLib.Error as err:
+        log.debug("_on_artwork_pixbuf_ready: decoding failed for {}: {}",
+            cache_key, err)
+        pb = None
+
+    if pb is not None:
+        _pixbuf_cache.put(cache_key, pb)
+
+    for artwork, request, show, artwork_id in waiters:
+        if request.is_cancelled():
+            continue
+
+        if pb is None:
+            artwork._set_default_artwork()
+        else:
+            show(pb, artwork_id)
+
+
 class AsyncArtwork(object):
 
     def __init__(self, gtk_image, size):
@@ -40,69 +100,71 @@ class AsyncArtwork(object):
         self._displayed_artwork_id = None
 
     def load_album_image(self, album_id, size=ArtworkSize.FULL, force=False):
-        if force != True and self._displayed_artwork_id == album_id:
-            return
-
-        if self._previous_request is not None:
-            self._previous_request.cancel()
-
-        self._set_default_artwork()
-
-        cancellable = Gio.Cancellable.new()
-        self._previous_request = cancellable
-        self._euterpe.get_album_artwork(
-            album_id,
-            size,
-            cancellable,
-            partial(self._change_artwork, handler=self._on_artwork_pixbuf_ready),
-            album_id,
-        )
+        self._load(ARTWORK_ALBUM, album_id, size, force, self._show_pixbuf)
 
     def load_artist_image(self, artist_id, size=ArtworkSize.FULL, force=False):
-        if force != True and self._displayed_artwork_id == artist_id:
-            return
-
-        if self._previous_request is not None:
-            self._previous_request.cancel()
-
-        self._set_default_artwork()
-
-        cancellable = Gio.Cancellable.new()
-        self._previous_request = cancellable
-        self._euterpe.get_artist_artwork(
-            artist_id,
-            size,
-            cancellable,
-            partial(self._change_artwork, handler=self._on_artwork_pixbuf_ready),
-            artist_id,
-        )
+        self._load(ARTWORK_ARTIST, artist_id, size, force, self._show_pixbuf)
 
     def load_album_picture_view(self, album_id, size=ArtworkSize.FULL, force=False):
         '''
         This is imilar to load_album_image but instead uses the self-resizing PictureView
         element to display the pixel buffer instead of the default image.
         '''
-        if force != True and self._displayed_artwork_id == album_id:
+        self._load(ARTWORK_ALBUM, album_id, size, force, self._show_picture_view)
+
+    def _load(self, kind, artwork_id, size, force, show):
+        if force != True and self._displayed_artwork_id == artwork_id:
             return
 
         if self._previous_request is not None:
             self._previous_request.cancel()
+            self._previous_request = None
+
+        server = self._euterpe.get_address()
+        if force:
+            _pixbuf_cache.remove(server, kind, artwork_id)
+
+        cache_key = (server, kind, artwork_id, size, self._size)
+        pb = _pixbuf_cache.get(cache_key)
+        if pb is not None:
+            show(pb, artwork_id)
+            return
 
         self._set_default_artwork()
 
         cancellable = Gio.Cancellable.new()
         self._previous_request = cancellable
-        self._euterpe.get_album_artwork(
-            album_id,
+
+        # The same image is already being downloaded and decoded for another
+        # AsyncArtwork of this size. Wait for it instead of downloading it
+        # once more.
+        waiters = _pending_decodes.get(cache_key, None)
+        if waiters is not None:
+            waiters.append((self, cancellable, show, artwork_id))
+            return
+
+        get_artwork = self._euterpe.get_album_artwork
+        if kind == ARTWORK_ARTIST:
+            get_artwork = self._euterpe.get_artist_artwork
+
+        get_artwork(
+            artwork_id,
             size,
             cancellable,
-            partial(self._change_artwork, handler=self._on_artwork_pixbuf_pv),
-            album_id,
+            partial(
+                self._change_artwork,
+                cache_key=cache_key,
+                show=show,
+                request=cancellable,
+            ),
+            artwork_id,
         )
 
-    def _change_artwork(self, status, body_stream, cancel, artwork_id, handler=None):
-        if handler is None:
-            log.error("AsyncArtwork._change_artwork called with None handler")
+    def _change_artwork(self, status, body_stream, cancel, artwork_id,
+        cache_key=None, show=None, request=None):
+        if request is not None and request.is_cancelled():
+            # A newer image has been requested or the artwork is being
+            # destroyed. Nothing to show.
             return
 
         if status is None and body_stream is None:
@@ -123,28 +185,39 @@ class AsyncArtwork(object):
             self._set_default_artwork()
             return
 
-        Pixbuf.new_from_stream_at_scale_async(body_stream, self._size, self._size,
-            True, cancel, handler, artwork_id)
-
-    def _on_artwork_pixbuf_ready(self, obj, res, artwork_id):
-        pb = Pixbuf.new_from_stream_finish(res)
+        # Another AsyncArtwork of the same size may have decoded this image
+        # while the response was on its way.
+        pb = _pixbuf_cache.get(cache_key)
+        if pb is not None:
+            body_stream.close_async(GLib.PRIORITY_DEFAULT, None, None)
+            show(pb, artwork_id)
+            return
 
-        if pb is None:
-            log.debug("_on_artwork_pixbuf_ready: pix buffer was None, id {}", artwork_id)
-            self._set_default_artwork()
+        waiter = (self, request, show, artwork_id)
+        waiters = _pending_decodes.get(cache_key, None)
+        if waiters is not None:
+            # Only the first response is decoded, this one is not needed.
+            body_stream.close_async(GLib.PRIORITY_DEFAULT, None, None)
+            waiters.append(waiter)
             return
 
-        self._displayed_artwork_id = artwork_id
-        self._image.set_from_pixbuf(pb)
+        _pending_decodes[cache_key] = [waiter]
 
-    def _on_artwork_pixbuf_pv(self, obj, res, artwork_id):
-        pb = Pixbuf.new_from_stream_finish(res)
+        # The decoding is not cancellable since its result is shared by
+        # all waiters and is stored in the pixbuf cache.
+        Pixbuf.new_from_stream_at_scale_async(body_stream, self._size, self._size,
+            True, None, _on_artwork_pixbuf_ready, cache_key)
 
-        if pb is None:
-            log.debug("_on_artwork_pixbuf_pv: pix buffer was None, id {}", artwork_id)
-            self._set_default_artwork()
-            return
+    def _show_pixbuf(self, pb, artwork_id):
+        if self._pv is not None:
+            self._image_parent.remove(self._pv)
+            self._pv = None
+            self._image_parent.add(self._image)
+
+        self._displayed_artwork_id = artwork_id
+        self._image.set_from_pixbuf(pb)
 
+    def _show_picture_view(self, pb, artwork_id):
         self._displayed_artwork_id = artwork_id
         try:
             pv = PictureView(pb)
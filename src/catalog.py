@@ -0,0 +1,499 @@
+# catalog.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import json
+import time
+import queue
+import sqlite3
+import threading
+from gi.repository import GLib
+import euterpe_gtk.log as log
+
+CATALOG_ALBUM = 'album'
+CATALOG_ARTIST = 'artist'
+CATALOG_SONG = 'song'
+
+CATALOG_KINDS = [CATALOG_ARTIST, CATALOG_ALBUM, CATALOG_SONG]
+
+# The key of the ID in the browse API items of every kind.
+CATALOG_ID_KEYS = {
+    CATALOG_ARTIST: "artist_id",
+    CATALOG_ALBUM: "album_id",
+    CATALOG_SONG: "id",
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS artists (
+    server TEXT NOT NULL,
+    artist_id INTEGER NOT NULL,
+    name TEXT,
+    generation INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (server, artist_id)
+);
+
+CREATE TABLE IF NOT EXISTS albums (
+    server TEXT NOT NULL,
+    album_id INTEGER NOT NULL,
+    artist_id INTEGER,
+    name TEXT,
+    generation INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (server, album_id)
+);
+
+CREATE TABLE IF NOT EXISTS tracks (
+    server TEXT NOT NULL,
+    track_id INTEGER NOT NULL,
+    album_id INTEGER,
+    artist_id INTEGER,
+    track_number INTEGER,
+    title TEXT,
+    generation INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (server, track_id)
+);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    server TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    full_synced_at INTEGER NOT NULL,
+    synced_at INTEGER NOT NULL,
+    mode TEXT NOT NULL,
+    items INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    PRIMARY KEY (server, kind)
+);
+
+CREATE INDEX IF NOT EXISTS tracks_by_album ON tracks (server, album_id);
+CREATE INDEX IF NOT EXISTS tracks_by_artist ON tracks (server, artist_id);
+'''
+
+
+class Catalog(object):
+    '''
+    Catalog is a local copy of the libraries of Euterpe servers kept in an
+    SQLite database. It stores the items returned by the browse API as they
+    are so that the widgets could use them in place of the server responses.
+    Items of different servers are kept apart.
+
+    The catalog is filled by the CatalogSync. Until a full sync of every kind
+    has finished for a server the catalog may be incomplete for it. Use
+    `is_synced` before trusting an empty result.
+
+    Writes are done in order by a worker thread with its own connection so
+    that storing thousands of items never blocks the UI. Queries are made
+    in the calling thread and do not see writes which are still queued. Use
+    `flush` to wait for them.
+
+    When the database could not be opened all queries return None and all
+    writes are ignored so that callers fall back to the server.
+    '''
+
+    def __init__(self, file_name):
+        self._db = None
+        self._writer_db = None
+        self._writes = queue.Queue()
+        self._writer = None
+
+        try:
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+            self._db = sqlite3.connect(file_name)
+            # Readers do not wait for the writer in WAL mode.
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            self._db.commit()
+            # The writer connection is only ever used by the writer thread.
+            self._writer_db = sqlite3.connect(file_name,
+                check_same_thread=False)
+        except (OSError, sqlite3.Error) as err:
+            log.warning("opening catalog {} failed: {}", file_name, err)
+            self._db = None
+            self._writer_db = None
+            return
+
+        self._writer = threading.Thread(
+            target=self._write_thread,
+            name="catalog-writer",
+            daemon=True,
+        )
+        self._writer.start()
+
+    def is_available(self):
+        return self._db is not None
+
+    def is_synced(self, server):
+        '''
+        Returns True when a full sync of every kind has finished for `server`.
+        '''
+        if self._db is None:
+            return False
+
+        row = self._fetch_one(
+            "SELECT COUNT(*) FROM sync_state WHERE server = ?",
+            (server,),
+        )
+        return row is not None and row[0] == len(CATALOG_KINDS)
+
+    def get_sync_state(self, server, kind):
+        '''
+        Returns a dict with the last successful sync of `kind` for `server` or
+        None when there was no full sync for it yet. Example:
+
+            {
+                "full_synced_at": 1735689600,
+                "synced_at": 1735776000,
+                "mode": "delta",
+                "items": 12,
+                "duration": 230.5,
+            }
+
+        Times are Unix timestamps. The duration is in milliseconds and
+        "items" is the number of items downloaded by the sync.
+        '''
+        row = self._fetch_one(
+            '''SELECT full_synced_at, synced_at, mode, items, duration
+            FROM sync_state WHERE server = ? AND kind = ?''',
+            (server, kind),
+        )
+        if row is None:
+            return None
+
+        return {
+            "full_synced_at": row[0],
+            "synced_at": row[1],
+            "mode": row[2],
+            "items": row[3],
+            "duration": row[4],
+        }
+
+    def set_sync_state(self, server, kind, full, items, duration):
+        '''
+        Records a successful sync of `kind` for `server`. `full` tells whether
+        it walked every item or only the new ones.
+        '''
+        self._write(self._set_sync_state, server, kind, full, items, duration)
+
+    def _set_sync_state(self, db, server, kind, full, items, duration):
+        now = int(time.time())
+        full_synced_at = now
+
+        try:
+            with db:
+                if not full:
+                    row = db.execute(
+                        '''SELECT full_synced_at FROM sync_state
+                        WHERE server = ? AND kind = ?''',
+                        (server, kind),
+                    ).fetchone()
+                    if row is not None:
+                        full_synced_at = row[0]
+
+                db.execute(
+                    '''INSERT OR REPLACE INTO sync_state
+                    (server, kind, full_synced_at, synced_at, mode, items,
+                    duration)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                    (server, kind, full_synced_at, now,
+                        "full" if full else "delta", items, duration),
+                )
+        except sqlite3.Error as err:
+            log.warning("storing catalog sync state failed: {}", err)
+
+    def store(self, server, kind, items, generation):
+        '''
+        Inserts or replaces `items` (a list of dicts as returned by the browse
+        API) of `kind` for `server`. All of them are marked with `generation`.
+        The items must not be changed afterwards.
+        '''
+        self._write(self._store, server, kind, items, generation)
+
+    def _store(self, db, server, kind, items, generation):
+        if kind == CATALOG_ARTIST:
+            query = '''INSERT OR REPLACE INTO artists
+                (server, artist_id, name, generation, data)
+                VALUES (?, ?, ?, ?, ?)'''
+            rows = [
+                (server, item.get("artist_id"), item.get("artist"),
+                    generation, json.dumps(item))
+                for item in items
+            ]
+        elif kind == CATALOG_ALBUM:
+            query = '''INSERT OR REPLACE INTO albums
+                (server, album_id, artist_id, name, generation, data)
+                VALUES (?, ?, ?, ?, ?, ?)'''
+            rows = [
+                (server, item.get("album_id"), item.get("artist_id"),
+                    item.get("album"), generation, json.dumps(item))
+                for item in items
+            ]
+        elif kind == CATALOG_SONG:
+            query = '''INSERT OR REPLACE INTO tracks
+                (server, track_id, album_id, artist_id, track_number, title,
+                generation, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
+            rows = [
+                (server, item.get("id"), item.get("album_id"),
+                    item.get("artist_id"), item.get("track"),
+                    item.get("title"), generation, json.dumps(item))
+                for item in items
+            ]
+        else:
+            log.warning("unknown catalog kind: {}", kind)
+            return
+
+        try:
+            with db:
+                db.executemany(query, rows)
+        except sqlite3.Error as err:
+            log.warning("storing {} {} items in the catalog failed: {}",
+                len(rows), kind, err)
+
+    def remove_stale(self, server, kind, generation):
+        '''
+        Removes the items of `kind` for `server` which were not stored with
+        `generation`. Used after a full sync so that items deleted from the
+        server are deleted from the catalog too.
+        '''
+        self._write(self._remove_stale, server, kind, generation)
+
+    def _remove_stale(self, db, server, kind, generation):
+        table = _tables[kind]
+        try:
+            with db:
+                db.execute(
+                    "DELETE FROM {} WHERE server = ? AND generation != ?".format(
+                        table),
+                    (server, generation),
+                )
+        except sqlite3.Error as err:
+            log.warning("removing stale {} items failed: {}", kind, err)
+
+    def remove_server(self, server):
+        '''
+        Removes everything stored for `server`.
+        '''
+        self._write(self._remove_server, server)
+
+    def _remove_server(self, db, server):
+        try:
+            with db:
+                for table in list(_tables.values()) + ["sync_state"]:
+                    db.execute(
+                        "DELETE FROM {} WHERE server = ?".format(table),
+                        (server,),
+                    )
+        except sqlite3.Error as err:
+            log.warning("removing catalog for {} failed: {}", server, err)
+
+    def count(self, server, kind):
+        '''
+        Returns the number of items of `kind` stored for `server`.
+        '''
+        if self._db is None:
+            return None
+
+        row = self._fetch_one(
+            "SELECT COUNT(*) FROM {} WHERE server = ?".format(_tables[kind]),
+            (server,),
+        )
+        if row is None:
+            return None
+        return row[0]
+
+    def max_id(self, server, kind):
+        '''
+        Returns the highest ID of the items of `kind` stored for `server` or
+        None when there are none.
+        '''
+        row = self._fetch_one(
+            "SELECT MAX({}) FROM {} WHERE server = ?".format(
+                _id_columns[kind], _tables[kind]),
+            (server,),
+        )
+        if row is None:
+            return None
+        return row[0]
+
+    def get_album_tracks(self, server, album_id):
+        '''
+        Returns the list of tracks of an album ordered by their track numbers.
+        '''
+        return self._fetch_items(
+            '''SELECT data FROM tracks WHERE server = ? AND album_id = ?
+            ORDER BY track_number, title''',
+            (server, album_id),
+        )
+
+    def get_artist_albums(self, server, artist_id):
+        '''
+        Returns the list of albums with tracks of an artist ordered by name.
+        Compilations are included even when their album artist is another
+        one. Every album is a dict such as:
+
+            {
+                "artist": "Artist Name",
+                "artist_id": 42,
+                "album": "Album Name",
+                "album_id": 7,
+            }
+        '''
+        # One track for every album is enough. SQLite returns the columns
+        # of an arbitrary row of every group.
+        tracks = self._fetch_items(
+            '''SELECT data FROM tracks WHERE server = ? AND artist_id = ?
+            GROUP BY album_id''',
+            (server, artist_id),
+        )
+        if tracks is None:
+            return None
+
+        albums = [
+            {
+                "artist": track.get("artist"),
+                "artist_id": track.get("artist_id"),
+                "album": track.get("album"),
+                "album_id": track.get("album_id"),
+            }
+            for track in tracks
+        ]
+        albums.sort(key=lambda a: (a["album"] or "").casefold())
+        return albums
+
+    def get_artist_tracks(self, server, artist_id):
+        '''
+        Returns the list of tracks of an artist ordered by album and track
+        number.
+        '''
+        return self._fetch_items(
+            '''SELECT data FROM tracks WHERE server = ? AND artist_id = ?
+            ORDER BY album_id, track_number, title''',
+            (server, artist_id),
+        )
+
+    def get_album(self, server, album_id):
+        return self._fetch_item(
+            "SELECT data FROM albums WHERE server = ? AND album_id = ?",
+            (server, album_id),
+        )
+
+    def get_artist(self, server, artist_id):
+        return self._fetch_item(
+            "SELECT data FROM artists WHERE server = ? AND artist_id = ?",
+            (server, artist_id),
+        )
+
+    def get_track(self, server, track_id):
+        return self._fetch_item(
+            "SELECT data FROM tracks WHERE server = ? AND track_id = ?",
+            (server, track_id),
+        )
+
+    def flush(self, callback, *args):
+        '''
+        Calls `callback` with `args` in the main loop once all writes made
+        before it are done.
+        '''
+        if self._db is None:
+            GLib.idle_add(_call_once, callback, args)
+            return
+
+        self._writes.put((_notify_flushed, (callback, args)))
+
+    def close(self):
+        '''
+        Waits for the queued writes and closes the database.
+        '''
+        if self._db is None:
+            return
+
+        self._writes.put(None)
+        self._writer.join()
+        self._writer = None
+        self._writer_db.close()
+        self._writer_db = None
+        self._db.close()
+        self._db = None
+
+    def _write(self, func, *args):
+        if self._db is None:
+            return
+        self._writes.put((func, args))
+
+    def _write_thread(self):
+        while True:
+            write = self._writes.get()
+            if write is None:
+                break
+
+            func, args = write
+            try:
+                func(self._writer_db, *args)
+            except Exception:
+                sys.excepthook(*sys.exc_info())
+
+    def _fetch_item(self, query, params):
+        row = self._fetch_one(query, params)
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def _fetch_one(self, query, params):
+        if self._db is None:
+            return None
+
+        try:
+            return self._db.execute(query, params).fetchone()
+        except sqlite3.Error as err:
+            log.warning("catalog query failed: {}", err)
+            return None
+
+    def _fetch_items(self, query, params):
+        if self._db is None:
+            return None
+
+        try:
+            rows = self._db.execute(query, params).fetchall()
+        except sqlite3.Error as err:
+            log.warning("catalog query failed: {}", err)
+            return None
+
+        return [json.loads(row[0]) for row in rows]
+
+
+def _notify_flushed(db, callback, args):
+    GLib.idle_add(_call_once, callback, args)
+
+
+def _call_once(callback, args):
+    callback(*args)
+    return False
+
+
+_tables = {
+    CATALOG_ARTIST: "artists",
+    CATALOG_ALBUM: "albums",
+    CATALOG_SONG: "tracks",
+}
+
+_id_columns = {
+    CATALOG_ARTIST: "artist_id",
+    CATALOG_ALBUM: "album_id",
+    CATALOG_SONG: "track_id",
+}
@@ -0,0 +1,438 @@
+# catalog_sync.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+from gi.repository import GObject, Gio, GLib
+from euterpe_gtk.catalog import CATALOG_KINDS, CATALOG_ID_KEYS
+from euterpe_gtk.http import Priority, LANE_MAX_CONNS
+from euterpe_gtk.utils import emit_signal
+import euterpe_gtk.log as log
+
+SIGNAL_SYNC_FINISHED = "sync-finished"
+
+# Number of items requested with every browse page during a full sync.
+SYNC_PAGE_SIZE = 500
+
+# Number of items requested with every browse page during a delta sync.
+# Usually only a handful of items are new.
+SYNC_DELTA_PAGE_SIZE = 50
+
+# Number of browse pages requested at the same time. Two connections of the
+# low priority HTTP lane are left for artwork and prefetching while syncing.
+SYNC_CONCURRENCY = max(1, LANE_MAX_CONNS[Priority.LOW] - 2)
+
+# Number of times a failed page is requested again before the sync of its
+# kind is given up.
+SYNC_PAGE_RETRIES = 2
+
+# Number of seconds after which a delta sync does a full sync instead. Delta
+# syncs do not see changes of items which were already in the catalog.
+SYNC_FULL_INTERVAL = 7 * 24 * 60 * 60
+
+SYNC_MODE_FULL = "full"
+SYNC_MODE_DELTA = "delta"
+
+
+class CatalogSync(GObject.Object):
+    '''
+    CatalogSync copies the library of the current Euterpe server into the
+    Catalog. Artists, albums and songs are synced one kind after the other
+    in one of two modes.
+
+    A full sync walks the browse API ordered by ID. The first page tells how
+    many pages there are and the rest are requested `SYNC_CONCURRENCY` at a
+    time. Ordering by ID makes sure items added on the server during the sync
+    do not move the items of pages which are not yet downloaded. Items which
+    were not seen during the walk are removed from the catalog at its end.
+
+    A delta sync walks the browse API ordered by descending ID and stops at
+    the first item which is already in the catalog. It starts with a single
+    item page which tells the newest item and, with its number of pages, the
+    number of items on the server. When there are no new items this is the
+    only request. After the walk the number of items in the catalog must be
+    the same as the one on the server. Otherwise items were deleted on the
+    server and a full sync of the kind follows.
+
+    All requests are made with low priority so that they never stand in the
+    way of requests made by the user. Items are stored by the writer thread
+    of the Catalog. The sync waits for it before counting the items in the
+    catalog.
+
+    The "sync-finished" signal is emitted with True when every kind was
+    synced successfully and False otherwise.
+    '''
+
+    __gsignals__ = {
+        SIGNAL_SYNC_FINISHED: (GObject.SignalFlags.RUN_FIRST, None, (bool,)),
+    }
+
+    def __init__(self, service, catalog):
+        GObject.Object.__init__(self)
+        self._service = service
+        self._catalog = catalog
+        self._cancellable = None
+        # Incremented for every sync so that responses for a cancelled one
+        # are ignored.
+        self._sync_id = 0
+        self._running = False
+        self._full = False
+        self._server = None
+        self._kinds = []
+        self._failed = False
+        self._started_at = 0
+        self._last_stats = None
+
+        # State for the kind which is currently synced.
+        self._kind = None
+        self._mode = None
+        self._generation = 0
+        self._known_max_id = None
+        self._server_count = None
+        self._pending_pages = []
+        self._retries = {}
+        self._in_flight = 0
+        self._pages = 0
+        self._items = 0
+        self._kind_failed = False
+        self._kind_started_at = 0
+        self._kind_stats = {}
+
+    def start(self, full=False):
+        '''
+        Starts a sync with the current server unless there is one running
+        already. Kinds which were never synced in full, or not recently
+        enough, get a full sync even when `full` is False.
+        '''
+        if self._running or not self._catalog.is_available():
+            return
+
+        server = self._service.get_address()
+        if server is None:
+            return
+
+        self._sync_id += 1
+        self._running = True
+        self._full = full
+        self._server = server
+        self._cancellable = Gio.Cancellable()
+        self._kinds = list(CATALOG_KINDS)
+        self._failed = False
+        self._kind_stats = {}
+        self._started_at = GLib.get_monotonic_time()
+
+        log.debug("catalog sync with {} started", server)
+        self._start_kind()
+
+    def cancel(self):
+        if not self._running:
+            return
+
+        log.debug("catalog sync with {} cancelled", self._server)
+        self._sync_id += 1
+        self._running = False
+        self._cancellable.cancel()
+        self._cancellable = None
+
+    def is_running(self):
+        return self._running
+
+    def get_last_stats(self):
+        '''
+        Returns a dict with the stats of the last finished sync or None if
+        there was none yet. Example:
+
+            {
+                "server": "https://music.example.com",
+                "success": True,
+                "duration": 630.4,
+                "kinds": {
+                    "album": {
+                        "mode": "delta",
+                        "items": 3,
+                        "pages": 2,
+                        "count": 1203,
+                        "duration": 120.1,
+                        "success": True,
+                    },
+                    ...
+                },
+            }
+
+        Durations are in milliseconds. "items" is the number of downloaded
+        items and "count" is the number of items in the catalog afterwards.
+        A kind for which a delta sync fell back to a full one has the stats
+        of the full sync with the "fallback" key set to True.
+        '''
+        if self._last_stats is None:
+            return None
+        return self._last_stats.copy()
+
+    def _start_kind(self):
+        if len(self._kinds) == 0:
+            self._finish()
+            return
+
+        self._kind = self._kinds.pop(0)
+        self._kind_started_at = GLib.get_monotonic_time()
+        self._kind_failed = False
+        self._pages = 0
+        self._items = 0
+
+        state = self._catalog.get_sync_state(self._server, self._kind)
+        if self._full or state is None or \
+                time.time() - state["full_synced_at"] > SYNC_FULL_INTERVAL:
+            self._start_full()
+        else:
+            self._start_delta()
+
+    def _start_full(self):
+        self._mode = SYNC_MODE_FULL
+        self._generation = GLib.get_real_time()
+        self._pending_pages = []
+        self._retries = {}
+        self._in_flight = 0
+
+        # The number of pages is not known until the first one arrives.
+        self._request_page(1, SYNC_PAGE_SIZE, "asc", self._on_full_page)
+
+    def _start_delta(self):
+        self._mode = SYNC_MODE_DELTA
+        self._generation = GLib.get_real_time()
+        self._known_max_id = self._catalog.max_id(self._server, self._kind)
+        self._server_count = None
+        self._retries = {}
+        self._in_flight = 0
+
+        self._request_page(1, 1, "desc", self._on_count_page)
+
+    def _request_page(self, page, per_page, order, callback):
+        uri = self._service.get_browse_uri(self._kind, page, per_page,
+            "id", order)
+        self._in_flight += 1
+        # Sync pages would push everything else out of the response cache.
+        self._service.make_request(uri, callback, self._sync_id, page,
+            priority=Priority.LOW, cancellable=self._cancellable,
+            revalidate=False)
+
+    def _on_full_page(self, status, body, sync_id, page):
+        if sync_id != self._sync_id:
+            return
+
+        self._in_flight -= 1
+
+        data = _page_data(status, body)
+        if data is None:
+            if self._retry(page, status):
+                self._pending_pages.insert(0, page)
+            else:
+                self._pending_pages = []
+        else:
+            self._store(data)
+
+            if page == 1:
+                pages_count = body.get("pages_count", 1)
+                self._pending_pages = list(range(2, pages_count + 1))
+
+        while len(self._pending_pages) > 0 and \
+                self._in_flight < SYNC_CONCURRENCY:
+            self._request_page(self._pending_pages.pop(0), SYNC_PAGE_SIZE,
+                "asc", self._on_full_page)
+
+        if self._in_flight == 0 and len(self._pending_pages) == 0:
+            self._finish_kind()
+
+    def _on_count_page(self, status, body, sync_id, page):
+        if sync_id != self._sync_id:
+            return
+
+        self._in_flight -= 1
+
+        data = _page_data(status, body)
+        if data is None:
+            if self._retry("count", status):
+                self._request_page(1, 1, "desc", self._on_count_page)
+            else:
+                self._finish_kind()
+            return
+
+        # With one item per page the number of pages is the number of items.
+        self._server_count = 0
+        if len(data) > 0:
+            self._server_count = body.get("pages_count", len(data))
+
+        if self._is_known(data):
+            self._check_count()
+            return
+
+        self._request_page(1, SYNC_DELTA_PAGE_SIZE, "desc",
+            self._on_delta_page)
+
+    def _on_delta_page(self, status, body, sync_id, page):
+        if sync_id != self._sync_id:
+            return
+
+        self._in_flight -= 1
+
+        data = _page_data(status, body)
+        if data is None:
+            if self._retry(page, status):
+                self._request_page(page, SYNC_DELTA_PAGE_SIZE, "desc",
+                    self._on_delta_page)
+            else:
+                self._finish_kind()
+            return
+
+        id_key = CATALOG_ID_KEYS[self._kind]
+        new_items = [
+            item for item in data
+            if self._known_max_id is None or
+                (item.get(id_key) or 0) > self._known_max_id
+        ]
+        self._store(new_items)
+
+        if len(new_items) == len(data) and len(data) > 0 and \
+                page < body.get("pages_count", 1):
+            self._request_page(page + 1, SYNC_DELTA_PAGE_SIZE, "desc",
+                self._on_delta_page)
+            return
+
+        self._check_count()
+
+    def _check_count(self):
+        self._catalog.flush(self._on_count_flushed, self._sync_id)
+
+    def _on_count_flushed(self, sync_id):
+        if sync_id != self._sync_id:
+            return
+
+        count = self._catalog.count(self._server, self._kind)
+        if count == self._server_count:
+            self._finish_kind()
+            return
+
+        log.debug("catalog sync: {} has {} {} items but the server has {}, "
+            "doing a full sync", self._server, count, self._kind,
+            self._server_count)
+
+        # The stats of a kind which fell back are the ones of the full sync.
+        self._pages = 0
+        self._items = 0
+        self._kind_started_at = GLib.get_monotonic_time()
+        self._start_full()
+
+    def _is_known(self, data):
+        if len(data) == 0:
+            return True
+        if self._known_max_id is None:
+            return False
+        item_id = data[0].get(CATALOG_ID_KEYS[self._kind]) or 0
+        return item_id <= self._known_max_id
+
+    def _store(self, data):
+        self._catalog.store(self._server, self._kind, data, self._generation)
+        self._pages += 1
+        self._items += len(data)
+
+    def _retry(self, key, status):
+        '''
+        Returns True when the failed request for `key` should be made again.
+        Marks the current kind as failed otherwise.
+        '''
+        retries = self._retries.get(key, 0)
+        if retries < SYNC_PAGE_RETRIES:
+            log.debug("catalog sync: {} {} page {} failed with {}, retrying",
+                self._mode, self._kind, key, status)
+            self._retries[key] = retries + 1
+            return True
+
+        log.warning("catalog sync: {} {} page {} failed with {}",
+            self._mode, self._kind, key, status)
+        self._kind_failed = True
+        return False
+
+    def _finish_kind(self):
+        duration = (GLib.get_monotonic_time() - self._kind_started_at) / 1000
+        full = self._mode == SYNC_MODE_FULL
+
+        if self._kind_failed:
+            # Items missing from a partial walk may still be on the server.
+            self._failed = True
+        else:
+            if full:
+                self._catalog.remove_stale(self._server, self._kind,
+                    self._generation)
+            self._catalog.set_sync_state(self._server, self._kind, full,
+                self._items, duration)
+
+        self._catalog.flush(self._on_kind_flushed, self._sync_id, duration)
+
+    def _on_kind_flushed(self, sync_id, duration):
+        if sync_id != self._sync_id:
+            return
+
+        full = self._mode == SYNC_MODE_FULL
+        count = self._catalog.count(self._server, self._kind)
+        self._kind_stats[self._kind] = {
+            "mode": self._mode,
+            "items": self._items,
+            "pages": self._pages,
+            "count": count,
+            "duration": duration,
+            "success": not self._kind_failed,
+            "fallback": full and self._server_count is not None,
+        }
+
+        log.debug("catalog sync: {} {} items of {} in {} pages for {:.1f}ms, "
+            "{} in the catalog{}", self._mode, self._items, self._kind,
+            self._pages, duration, count,
+            " (failed)" if self._kind_failed else "")
+
+        self._server_count = None
+        self._start_kind()
+
+    def _finish(self):
+        duration = (GLib.get_monotonic_time() - self._started_at) / 1000
+        success = not self._failed
+        self._last_stats = {
+            "server": self._server,
+            "success": success,
+            "duration": duration,
+            "kinds": self._kind_stats,
+        }
+
+        log.debug("catalog sync with {} finished for {:.1f}ms{}",
+            self._server, duration, "" if success else " (failed)")
+
+        self._running = False
+        self._cancellable = None
+        emit_signal(self, SIGNAL_SYNC_FINISHED, success)
+
+
+def _page_data(status, body):
+    '''
+    Returns the list of items of a browse page response or None when the
+    request failed.
+    '''
+    if status != 200 or not isinstance(body, dict):
+        return None
+
+    data = body.get("data")
+    if not isinstance(data, list):
+        return None
+
+    return data
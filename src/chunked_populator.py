@@ -0,0 +1,163 @@
+# chunked_populator.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+from gi.repository import GLib
+import euterpe_gtk.log as log
+
+# Time in microseconds which a populator may spend adding items before it
+# lets GTK draw a frame. About half a frame at 60Hz.
+FRAME_BUDGET_US = 8000
+
+
+class ChunkedPopulator(object):
+    '''
+    ChunkedPopulator adds items to a widget in idle callbacks of the main
+    loop. Every callback adds items until its time budget runs out and then
+    returns to the main loop so that it could handle input and draw the
+    widget. This way long lists are shown gradually without blocking the UI.
+
+    Population stops when the widget is unrealized or destroyed.
+
+        populator = ChunkedPopulator(self, "albums")
+        populator.populate(albums, self._add_album)
+    '''
+
+    def __init__(self, widget, name, budget=FRAME_BUDGET_US):
+        self._name = name
+        self._budget = budget
+        self._source_id = None
+        self._items = None
+        self._next = 0
+        self._add_func = None
+        self._done_func = None
+        self._frames = 0
+        self._started_at = 0
+        self._last_stats = None
+
+        widget.connect("unrealize", self._on_widget_gone)
+        widget.connect("destroy", self._on_widget_gone)
+
+    def populate(self, items, add_func, done_func=None):
+        '''
+        Calls `add_func` with every item of `items` in order. Calls
+        `done_func` with no arguments after the last one, or after the first
+        one for which `add_func` raised. A population which is still running
+        is cancelled first.
+        '''
+        self.cancel()
+
+        self._items = items
+        self._next = 0
+        self._add_func = add_func
+        self._done_func = done_func
+        self._frames = 0
+        self._started_at = GLib.get_monotonic_time()
+
+        # Idle priority is lower than the one for drawing so that a frame
+        # is drawn between two chunks.
+        self._source_id = GLib.idle_add(
+            self._add_chunk,
+            priority=GLib.PRIORITY_DEFAULT_IDLE,
+        )
+
+    def cancel(self):
+        '''
+        Stops adding items. Items already added are left in place.
+        '''
+        if self._source_id is None:
+            return
+
+        GLib.source_remove(self._source_id)
+        self._finish(cancelled=True)
+
+    def is_running(self):
+        return self._source_id is not None
+
+    def get_last_stats(self):
+        '''
+        Returns a dict with the stats of the last finished or cancelled
+        population or None if there was none yet. Example:
+
+            {
+                "items": 60,
+                "frames": 3,
+                "duration": 41.2,
+                "cancelled": False,
+            }
+
+        The duration is in milliseconds.
+        '''
+        if self._last_stats is None:
+            return None
+        return self._last_stats.copy()
+
+    def _add_chunk(self):
+        self._frames += 1
+        deadline = GLib.get_monotonic_time() + self._budget
+
+        # At least one item is added on every call so that population always
+        # moves forward even with very slow items.
+        while self._next < len(self._items):
+            item = self._items[self._next]
+            self._next += 1
+            try:
+                self._add_func(item)
+            except Exception:
+                sys.excepthook(*sys.exc_info())
+                log.warning("populating {} stopped: adding item {} failed",
+                    self._name, self._next - 1)
+                if self._source_id is None:
+                    return False
+                done_func = self._done_func
+                self._finish(cancelled=True)
+                if done_func is not None:
+                    done_func()
+                return False
+
+            if self._source_id is None:
+                # Cancelled by the add function.
+                return False
+
+            if GLib.get_monotonic_time() >= deadline:
+                return True
+
+        done_func = self._done_func
+        self._finish(cancelled=False)
+        if done_func is not None:
+            done_func()
+        return False
+
+    def _finish(self, cancelled):
+        duration = (GLib.get_monotonic_time() - self._started_at) / 1000
+        self._last_stats = {
+            "items": self._next,
+            "frames": self._frames,
+            "duration": duration,
+            "cancelled": cancelled,
+        }
+        log.debug("populating {}: {} items in {} frames for {:.1f}ms{}",
+            self._name, self._next, self._frames, duration,
+            " (cancelled)" if cancelled else "")
+
+        self._source_id = None
+        self._items = None
+        self._add_func = None
+        self._done_func = None
+
+    def _on_widget_gone(self, *args):
+        self.cancel()
@@ -0,0 +1,250 @@
+# disk_cache.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import hashlib
+import tempfile
+
+from collections import OrderedDict
+from gi.repository import Gio, GLib
+import euterpe_gtk.log as log
+
+# Suffix of the files which are still being written into the cache directory.
+PARTIAL_SUFFIX = ".part"
+
+
+class DiskCache(object):
+    '''
+    DiskCache stores files in a directory. Once the files grow above the
+    maximum size of the cache the least recently used ones are removed.
+
+    Files are identified by keys which are tuples of strings and numbers.
+
+    All methods must be called from the main thread.
+    '''
+
+    def __init__(self, directory, max_size):
+        self._directory = directory
+        self._max_size = max_size
+        self._entries = None
+        self._size = 0
+
+    def set_max_size(self, max_size):
+        '''
+        Changes the maximum size in bytes of the cache. Files over the new
+        size are evicted the next time the cache is used.
+        '''
+        self._max_size = max_size
+        if self._entries is not None:
+            self._evict()
+
+    def get_max_size(self):
+        return self._max_size
+
+    def get_size(self):
+        '''
+        Returns the number of bytes used by the cached files.
+        '''
+        self._load_index()
+        return self._size
+
+    def lookup(self, key):
+        '''
+        Returns the path to the cached file for `key` or None when there
+        is no such file in the cache.
+        '''
+        self._load_index()
+        name = self._file_name(key)
+        if name not in self._entries:
+            return None
+
+        self._entries.move_to_end(name)
+        path = os.path.join(self._directory, name)
+        try:
+            # The modification time is what orders the entries when the
+            # index is loaded the next time the program starts.
+            os.utime(path)
+        except OSError:
+            self._forget(name)
+            return None
+
+        return path
+
+    def store(self, key, data):
+        '''
+        Stores `data` (GLib.Bytes) as the file for `key`. Writing to disk
+        happens asynchronously.
+        '''
+        self._load_index()
+        name = self._file_name(key)
+        path = os.path.join(self._directory, name)
+
+        if not self._make_directory():
+            return
+
+        self._forget(name)
+        file = Gio.File.new_for_path(path)
+        file.replace_contents_bytes_async(
+            data,
+            None,
+            False,
+            Gio.FileCreateFlags.REPLACE_DESTINATION,
+            None,
+            self._on_stored,
+            name,
+            data.get_size(),
+        )
+
+    def _on_stored(self, file, result, name, data_size):
+        try:
+            file.replace_contents_finish(result)
+        except GLib.Error as err:
+            log.warning("Storing file in cache {} failed: {}",
+                self._directory, err)
+            return
+
+        self._add_entry(name, data_size)
+
+    def new_partial_file(self):
+        '''
+        Returns a path to a new empty file in the cache directory. It could
+        be written to and then added to the cache with `add_file`. Or
+        removed with `discard_partial_file`. Partial files left from previous
+        runs are removed automatically.
+
+        Returns None when the file could not be created.
+        '''
+        if not self._make_directory():
+            return None
+
+        try:
+            fd, path = tempfile.mkstemp(
+                suffix=PARTIAL_SUFFIX,
+                dir=self._directory,
+            )
+        except OSError as err:
+            log.warning("Creating partial file in cache {} failed: {}",
+                self._directory, err)
+            return None
+
+        os.close(fd)
+        return path
+
+    def add_file(self, key, partial_path):
+        '''
+        Moves a file created with `new_partial_file` into the cache as the
+        file for `key`.
+        '''
+        self._load_index()
+        name = self._file_name(key)
+        path = os.path.join(self._directory, name)
+
+        try:
+            os.replace(partial_path, path)
+            data_size = os.path.getsize(path)
+        except OSError as err:
+            log.warning("Adding file to cache {} failed: {}",
+                self._directory, err)
+            self.discard_partial_file(partial_path)
+            return
+
+        self._add_entry(name, data_size)
+
+    def discard_partial_file(self, partial_path):
+        try:
+            os.remove(partial_path)
+        except OSError:
+            pass
+
+    def remove(self, key):
+        '''
+        Removes the file for `key` from the cache.
+        '''
+        self._load_index()
+        name = self._file_name(key)
+        if name not in self._entries:
+            return
+        self._delete(name)
+
+    def _add_entry(self, name, data_size):
+        self._forget(name)
+        self._entries[name] = data_size
+        self._size += data_size
+        self._evict()
+
+    def _make_directory(self):
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+        except OSError as err:
+            log.warning("Creating cache directory {} failed: {}",
+                self._directory, err)
+            return False
+        return True
+
+    def _evict(self):
+        while self._size > self._max_size and len(self._entries) > 0:
+            name = next(iter(self._entries))
+            self._delete(name)
+
+    def _delete(self, name):
+        self._forget(name)
+        try:
+            os.remove(os.path.join(self._directory, name))
+        except OSError as err:
+            log.debug("Removing cached file {} failed: {}", name, err)
+
+    def _forget(self, name):
+        data_size = self._entries.pop(name, None)
+        if data_size is not None:
+            self._size -= data_size
+
+    def _load_index(self):
+        '''
+        Reads the cache directory once and builds the LRU index from the
+        modification times of the files in it.
+        '''
+        if self._entries is not None:
+            return
+
+        self._entries = OrderedDict()
+        self._size = 0
+
+        try:
+            files = [f for f in os.scandir(self._directory) if f.is_file()]
+        except FileNotFoundError:
+            return
+        except OSError as err:
+            log.warning("Reading cache directory {} failed: {}",
+                self._directory, err)
+            return
+
+        stats = []
+        for f in files:
+            if f.name.endswith(PARTIAL_SUFFIX):
+                self.discard_partial_file(f.path)
+                continue
+            stats.append((f.name, f.stat()))
+
+        for name, stat in sorted(stats, key=lambda s: s[1].st_mtime):
+            self._entries[name] = stat.st_size
+            self._size += stat.st_size
+
+        self._evict()
+
+    def _file_name(self, key):
+        key = "\n".join([str(getattr(k, 'value', k)) for k in key])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
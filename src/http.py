@@ -16,10 +16,15 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import gi
+import re
 import sys
 import enum
+import json
+import time
 
-from gi.repository import Soup
+from collections import deque, OrderedDict
+from gi.repository import Soup, Gio, GLib
+from euterpe_gtk.lru_cache import LRUCache
 
 class Priority(enum.Enum):
     '''
@@ -30,7 +35,31 @@ class Priority(enum.Enum):
     NORMAL = 0
     HIGH = 1
 
-_session = None
+# Connection budget for every priority lane. Every lane has its own Soup session
+# so requests in one lane never wait for a free connection in another. This way
+# a page full of LOW priority artwork requests cannot block searching or
+# changing a playlist.
+LANE_MAX_CONNS = {
+    Priority.LOW: 4,
+    Priority.NORMAL: 4,
+    Priority.HIGH: 2,
+}
+
+# Maximum number of requests which may wait in a lane for a free connection.
+# Requests beyond that are failed immediately instead of piling up.
+LANE_QUEUE_DEPTH = {
+    Priority.LOW: 500,
+    Priority.NORMAL: 100,
+    Priority.HIGH: 100,
+}
+
+# Maximum number of bytes of response bodies kept for revalidation.
+RESPONSE_CACHE_MAX_SIZE = 16 * 1024 * 1024
+
+# Number of finished requests for which timings are kept.
+REQUEST_METRICS_SIZE = 1000
+
+_lanes = {}
 
 def Init():
     '''
@@ -40,20 +69,395 @@ def Init():
     Make sure to call this before any other calls to libraries which would
     want to load LibSoup.
     '''
-    init_session()
+    for priority in Priority:
+        init_lane(priority)
 
-def init_session():
-    global _session
-
-    if _session is not None:
-        return _session
+def init_session(priority=Priority.NORMAL):
+    '''
+    Returns the Soup session used for requests with `priority`.
+    '''
+    return init_lane(priority).session
 
-    _session = Soup.Session(
-        max_conns=6,
-        user_agent="Euterpe-GTK HTTP Client",
+def init_lane(priority):
+    '''
+    Returns the lane for `priority`, creating it on first use.
+    '''
+    lane = _lanes.get(priority, None)
+    if lane is not None:
+        return lane
+
+    lane = Lane(
+        priority,
+        LANE_MAX_CONNS[priority],
+        LANE_QUEUE_DEPTH[priority],
     )
+    _lanes[priority] = lane
+    return lane
+
+def response_cache():
+    '''
+    Returns the ResponseCache used by requests which revalidate.
+    '''
+    return _response_cache
+
+def request_metrics():
+    '''
+    Returns the RequestMetrics with the timings of the recent requests.
+    '''
+    return _request_metrics
+
+def lanes_stats():
+    '''
+    Returns a dict with the counters of every lane keyed by its Priority.
+    See Lane.get_stats for the counters themselves.
+    '''
+    return {priority: lane.get_stats() for priority, lane in _lanes.items()}
+
+
+class Lane(object):
+    '''
+    Lane is a queue of HTTP requests with the same priority. It has its own
+    Soup session and allows at most `max_conns` requests to be in flight at
+    the same time. The rest wait in a FIFO queue of at most `queue_depth`
+    items.
+
+    All methods must be called from the main thread.
+    '''
+
+    def __init__(self, priority, max_conns, queue_depth):
+        self.priority = priority
+        self.session = Soup.Session(
+            max_conns=max_conns,
+            max_conns_per_host=max_conns,
+            user_agent="Euterpe-GTK HTTP Client",
+        )
+        self._max_conns = max_conns
+        self._queue_depth = queue_depth
+        self._queue = deque()
+        self._in_flight = 0
+
+        self._started = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def submit(self, start, fail):
+        '''
+        Schedules `start` to be called once there is a free connection in
+        the lane. It receives the number of seconds spent in the queue.
+        `start` returns True when it has sent the request and must then make
+        sure `release` is called once the request is done. It returns False
+        when the request was not sent, such as when it was cancelled while
+        waiting, and the connection is given to the next one right away.
+        `fail` is called instead of `start` when the queue is full.
+        '''
+        if len(self._queue) >= self._queue_depth:
+            self._rejected += 1
+            fail()
+            return
+
+        self._queue.append((time.monotonic(), start))
+        self._dispatch()
+
+    def release(self):
+        '''
+        Marks one of the in-flight requests as finished and starts the next
+        queued one, if any.
+        '''
+        if self._in_flight > 0:
+            self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        # Requests which were not sent are drained in this loop. Calling
+        # `release` from `start` would recurse once for every one of them.
+        while self._in_flight < self._max_conns and len(self._queue) > 0:
+            queued_at, start = self._queue.popleft()
+            wait = time.monotonic() - queued_at
+            self._started += 1
+            self._total_wait += wait
+            if wait > self._max_wait:
+                self._max_wait = wait
+
+            self._in_flight += 1
+            try:
+                started = start(wait)
+            except Exception:
+                sys.excepthook(*sys.exc_info())
+                started = False
+
+            if not started:
+                self._in_flight -= 1
+
+    def get_stats(self):
+        '''
+        Returns a dict with the lane counters:
+
+            * queued (int) - requests waiting for a free connection right now
+            * in_flight (int) - requests being executed right now
+            * started (int) - requests which left the queue since start up
+            * rejected (int) - requests failed because the queue was full
+            * avg_wait (float) - average seconds spent in the queue
+            * max_wait (float) - longest seconds spent in the queue
+        '''
+        avg_wait = 0.0
+        if self._started > 0:
+            avg_wait = self._total_wait / self._started
+
+        return {
+            "queued": len(self._queue),
+            "in_flight": self._in_flight,
+            "started": self._started,
+            "rejected": self._rejected,
+            "avg_wait": avg_wait,
+            "max_wait": self._max_wait,
+        }
+
+
+class ResponseCache(object):
+    '''
+    ResponseCache keeps the bodies of responses which came with an ETag or
+    a Last-Modified header together with them. Requests made with
+    `revalidate` send them back as If-None-Match and If-Modified-Since. When
+    the server answers with 304 Not Modified the body from the cache is
+    used instead of downloading it again.
+
+    Responses are keyed by URL and Authorization header so that users never
+    see the responses of others. The least recently used ones are removed
+    once their bodies are more than `max_size` bytes.
+
+    All methods must be called from the main thread.
+    '''
+
+    def __init__(self, max_size):
+        self._max_size = max_size
+        self._entries = LRUCache(max_size=max_size,
+            size_func=lambda entry: len(entry[2]))
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        '''
+        Returns a (etag, last_modified, body) tuple for `key` or None.
+        '''
+        return self._entries.get(key)
+
+    def put(self, key, etag, last_modified, body):
+        self.remove(key)
+
+        # A single huge body would push out everything else.
+        if len(body) > self._max_size // 4:
+            return
+
+        self._entries.put(key, (etag, last_modified, body))
+
+    def remove(self, key):
+        self._entries.remove(key)
+
+    def clear(self):
+        self._entries.clear()
+
+    def record(self, not_modified):
+        '''
+        Counts a revalidated response. `not_modified` is True when it was
+        served from the cache.
+        '''
+        if not_modified:
+            self._hits += 1
+        else:
+            self._misses += 1
+
+    def get_stats(self):
+        '''
+        Returns a dict with the number of responses served from the cache
+        (hits), revalidated responses which had to be downloaded (misses),
+        cached responses and their size in bytes.
+        '''
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "entries": len(self._entries),
+            "size": self._entries.get_size(),
+        }
+
+
+_response_cache = ResponseCache(RESPONSE_CACHE_MAX_SIZE)
+
 
-    return _session
+class RequestMetrics(object):
+    '''
+    RequestMetrics keeps the timings of the last `size` finished requests
+    in a ring buffer. Every request is a dict such as:
+
+        {
+            "finished_at": 1735689600.5,
+            "method": "GET",
+            "endpoint": "/v1/playlist/{id}",
+            "priority": "NORMAL",
+            "status": 200,
+            "queue_wait": 0.1,
+            "dns": 0.0,
+            "connect": 12.7,
+            "tls": 8.3,
+            "ttfb": 45.2,
+            "body": 3.9,
+            "total": 62.0,
+            "bytes": 5120,
+            "reused": False,
+        }
+
+    Durations are in milliseconds. "connect" includes "tls". "ttfb" is the
+    time between sending the request and the first byte of the response.
+    Durations which did not apply, such as connecting on a reused
+    connection, are 0. Numbers in the endpoint path are replaced with
+    "{id}" so that requests for different items are grouped together.
+
+    All methods must be called from the main thread.
+    '''
+
+    def __init__(self, size):
+        self._requests = deque(maxlen=size)
+
+    def record(self, request):
+        self._requests.append(request)
+
+    def get_requests(self):
+        '''
+        Returns a list with the recorded requests from the oldest to the
+        newest.
+        '''
+        return list(self._requests)
+
+    def clear(self):
+        self._requests.clear()
+
+    def get_summary(self):
+        '''
+        Returns a list with a dict for every endpoint and priority pair
+        with the most used first. The first one is for all requests and has
+        "*" as endpoint and priority. Example:
+
+            {
+                "endpoint": "/v1/browse/",
+                "priority": "NORMAL",
+                "count": 42,
+                "errors": 1,
+                "bytes": 180244,
+                "queue_wait": {"p50": 0.0, "p90": 0.2, "p99": 1.3},
+                "connect": {"p50": 0.0, "p90": 15.1, "p99": 20.4},
+                "ttfb": {"p50": 35.0, "p90": 80.2, "p99": 130.8},
+                "body": {"p50": 1.1, "p90": 6.4, "p99": 9.0},
+                "total": {"p50": 40.3, "p90": 95.1, "p99": 160.2},
+            }
+
+        Requests without a 2xx or 3xx status count as errors.
+        '''
+        groups = OrderedDict()
+        groups[("*", "*")] = list(self._requests)
+        for request in self._requests:
+            key = (request["endpoint"], request["priority"])
+            groups.setdefault(key, []).append(request)
+
+        summary = [
+            _summarize(endpoint, priority, requests)
+            for (endpoint, priority), requests in groups.items()
+        ]
+        summary[1:] = sorted(summary[1:], key=lambda s: s["count"],
+            reverse=True)
+        return summary
+
+    def export(self, file_name):
+        '''
+        Writes the summary and all recorded requests in `file_name` as JSON.
+        Raises OSError when writing fails.
+        '''
+        data = {
+            "exported_at": time.time(),
+            "summary": self.get_summary(),
+            "requests": self.get_requests(),
+        }
+        with open(file_name, "w") as fh:
+            json.dump(data, fh, indent=2)
+
+
+_request_metrics = RequestMetrics(REQUEST_METRICS_SIZE)
+
+_METRICS_DURATIONS = ["queue_wait", "connect", "ttfb", "body", "total"]
+_METRICS_PERCENTILES = [50, 90, 99]
+
+
+def _summarize(endpoint, priority, requests):
+    summary = {
+        "endpoint": endpoint,
+        "priority": priority,
+        "count": len(requests),
+        "errors": sum(1 for r in requests if not 200 <= r["status"] < 400),
+        "bytes": sum(r["bytes"] for r in requests),
+    }
+
+    for name in _METRICS_DURATIONS:
+        values = sorted(r[name] for r in requests)
+        summary[name] = {
+            "p{}".format(p): _percentile(values, p)
+            for p in _METRICS_PERCENTILES
+        }
+
+    return summary
+
+
+def _percentile(values, percent):
+    '''
+    Returns the nearest-rank percentile of the sorted `values`.
+    '''
+    if len(values) == 0:
+        return 0.0
+    rank = max(1, -(-percent * len(values) // 100))
+    return values[rank - 1]
+
+
+def _collect_metrics(message, priority, queue_wait):
+    message.add_flags(Soup.MessageFlags.COLLECT_METRICS)
+    message.connect("finished", _on_message_finished, priority, queue_wait)
+
+
+def _on_message_finished(message, priority, queue_wait):
+    metrics = message.get_metrics()
+    if metrics is None:
+        return
+
+    def span(start, end):
+        if start == 0 or end < start:
+            return 0.0
+        return (end - start) / 1000
+
+    connect_start = metrics.get_connect_start()
+    fetch_start = metrics.get_fetch_start()
+    response_end = metrics.get_response_end()
+    if response_end == 0:
+        # Cancelled or failed before the whole response was read.
+        response_end = GLib.get_monotonic_time()
+
+    _request_metrics.record({
+        "finished_at": time.time(),
+        "method": message.get_method(),
+        "endpoint": _metrics_endpoint(message.get_uri().get_path()),
+        "priority": priority.name,
+        "status": int(message.get_status()),
+        "queue_wait": queue_wait * 1000,
+        "dns": span(metrics.get_dns_start(), metrics.get_dns_end()),
+        "connect": span(connect_start, metrics.get_connect_end()),
+        "tls": span(metrics.get_tls_start(), metrics.get_connect_end()),
+        "ttfb": span(metrics.get_request_start(),
+            metrics.get_response_start()),
+        "body": span(metrics.get_response_start(), response_end),
+        "total": span(fetch_start, response_end) + queue_wait * 1000,
+        "bytes": metrics.get_response_body_bytes_received(),
+        "reused": connect_start == 0,
+    })
+
+
+def _metrics_endpoint(path):
+    return re.sub(r'/\d+(?=/|$)', '/{id}', path)
 
 
 class Request(object):
@@ -64,9 +468,18 @@ class Request(object):
 
         Note that the request callback will be called once the whole
         response body has been received.
+
+        Request supports cancellation using its optional `cancellable`
+        argument. Cancelled requests call their callback with None status
+        and body.
+
+        GET requests made with `revalidate` go through the ResponseCache.
+        A 304 Not Modified response is given to the callback as a 200 one
+        with the cached body.
     '''
 
-    def __init__(self, address, callback, priority=Priority.NORMAL):
+    def __init__(self, address, callback, priority=Priority.NORMAL,
+            cancellable=None, revalidate=False):
         '''
         callback must be a function with the following arguments
 
@@ -76,16 +489,22 @@ class Request(object):
         '''
 
         self._priority = to_soup_priority(priority)
-        self._session = init_session()
+        self._lane = init_lane(priority)
+        self._session = self._lane.session
         self._address = address
         self._callback = callback
         self._headers = {}
+        self._cancellable = cancellable
+        self._revalidate = revalidate
+        self._cached = None
 
     def set_header(self, name, value):
         self._headers[name] = value
 
     def get(self, *args):
         req = Soup.Message.new("GET", self._address)
+        if self._revalidate:
+            self._add_validators(req)
         self._do(req, args)
 
     def post(self, content_type, body, *args):
@@ -108,26 +527,99 @@ class Request(object):
         self._do(req, args)
 
     def _do(self, req, args):
+        self._lane.submit(
+            lambda wait: self._start(req, args, wait),
+            lambda: self._call_callback(None, None, args),
+        )
+
+    def _start(self, req, args, wait):
+        if self._cancellable is not None and self._cancellable.is_cancelled():
+            self._call_callback(None, None, args)
+            return False
+
         try:
+            _collect_metrics(req, self._lane.priority, wait)
             for k, v in self._headers.items():
                 req.props.request_headers.append(k, v)
+            req.set_priority(self._priority)
             self._session.send_and_read_async(
                 req,
                 self._priority,
-                None,
+                self._cancellable,
                 self._request_cb,
                 args,
             )
         except Exception:
             sys.excepthook(*sys.exc_info())
-            self._callback(None, None)
+            self._call_callback(None, None, args)
+            return False
+
+        return True
 
     def _request_cb(self, source, result, args):
+        self._lane.release()
         message = source.get_async_result_message(result)
         status = message.get_status()
-        resp_body = source.send_and_read_finish(result).get_data()
+        try:
+            resp_body = source.send_and_read_finish(result).get_data()
+        except GLib.Error as err:
+            if not err.matches(Gio.io_error_quark(), Gio.IOErrorEnum.CANCELLED):
+                sys.excepthook(*sys.exc_info())
+            self._call_callback(None, None, args)
+            return
+        except Exception:
+            sys.excepthook(*sys.exc_info())
+            self._call_callback(None, None, args)
+            return
+
+        if self._revalidate:
+            status, resp_body = self._revalidated(message, status, resp_body)
+
         self._call_callback(status, resp_body, args)
 
+    def _cache_key(self):
+        return (self._address, self._headers.get("Authorization", None))
+
+    def _add_validators(self, req):
+        self._cached = _response_cache.get(self._cache_key())
+        if self._cached is None:
+            return
+
+        etag, last_modified, _ = self._cached
+        headers = req.props.request_headers
+        if etag is not None:
+            headers.append("If-None-Match", etag)
+        if last_modified is not None:
+            headers.append("If-Modified-Since", last_modified)
+
+    def _revalidated(self, message, status, body):
+        '''
+        Returns the status and body which should be given to the callback
+        and updates the response cache.
+        '''
+        key = self._cache_key()
+
+        if status == Soup.Status.NOT_MODIFIED and self._cached is not None:
+            _response_cache.record(True)
+            return 200, self._cached[2]
+
+        if self._cached is not None:
+            _response_cache.record(False)
+
+        if status != Soup.Status.OK:
+            _response_cache.remove(key)
+            return status, body
+
+        headers = message.get_response_headers()
+        etag = headers.get_one("ETag")
+        last_modified = headers.get_one("Last-Modified")
+        if etag is None and last_modified is None:
+            _response_cache.remove(key)
+        else:
+            _response_cache.put(key, etag, last_modified, body)
+
+        return status, body
+
     def _call_callback(self, status, body, args):
         try:
             self._callback(status, body, *(args))
@@ -159,7 +651,8 @@ class AsyncRequest(object):
         '''
 
         self._priority = to_soup_priority(priority)
-        self._session = init_session()
+        self._lane = init_lane(priority)
+        self._session = self._lane.session
         self._address = address
         self._callback = callback
         self._headers = {}
@@ -192,9 +685,23 @@ class AsyncRequest(object):
         self._do(req, args)
 
     def _do(self, req, args):
+        self._lane.submit(
+            lambda wait: self._start(req, args, wait),
+            lambda: self._fail(args),
+        )
+
+    def _start(self, req, args, wait):
+        if self._cancellable is not None and self._cancellable.is_cancelled():
+            # The request was cancelled while waiting in the lane queue. There
+            # is no point of sending it at all.
+            self._fail(args)
+            return False
+
         try:
+            _collect_metrics(req, self._lane.priority, wait)
             for k, v in self._headers.items():
                 req.props.request_headers.append(k, v)
+            req.set_priority(self._priority)
             self._session.send_async(
                 req,
                 self._priority,
@@ -204,15 +711,22 @@ class AsyncRequest(object):
             )
         except Exception:
             sys.excepthook(*sys.exc_info())
-            self._callback(None, None, None, *(args))
+            self._fail(args)
+            return False
+
+        return True
 
     def _request_cb(self, source, result, args):
+        # The lane slot is freed as soon as the headers are here. Reading the
+        # body is up to the callback and the Soup session connection limit
+        # still applies while it is being read.
+        self._lane.release()
         message = source.get_async_result_message(result)
         status = message.get_status()
         try:
             body_stream = source.send_finish(result)
         except Exception:
-            self._callback(None, None, None, *(args))
+            self._fail(args)
             return
 
         self._call_callback(status, body_stream, args)
@@ -223,6 +737,12 @@ class AsyncRequest(object):
         except Exception:
             sys.excepthook(*sys.exc_info())
 
+    def _fail(self, args):
+        try:
+            self._callback(None, None, None, *(args))
+        except Exception:
+            sys.excepthook(*sys.exc_info())
+
 
 def to_soup_priority(priority):
     if priority == Priority.LOW:
@@ -0,0 +1,112 @@
+# json_decoder.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import re
+import json
+import codecs
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Characters which may follow an element of a JSON array.
+_DELIMITERS = ' \t\n\r,]'
+
+_STATE_START = 0
+_STATE_FIRST_VALUE = 1
+_STATE_VALUE = 2
+_STATE_SEPARATOR = 3
+_STATE_END = 4
+
+
+class JSONArrayDecoder(object):
+    '''
+    JSONArrayDecoder decodes a JSON array which arrives in chunks of bytes.
+    Each call to `feed` returns the elements of the array which were
+    completed by its chunk. Raises ValueError when the data is not a valid
+    JSON array.
+
+        decoder = JSONArrayDecoder()
+        for chunk in chunks:
+            items.extend(decoder.feed(chunk))
+        items.extend(decoder.close())
+    '''
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._state = _STATE_START
+
+    def feed(self, data, final=False):
+        buf = self._buf + self._text.decode(data, final)
+        size = len(buf)
+        pos = 0
+        items = []
+
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos >= size:
+                break
+
+            if self._state == _STATE_START:
+                if buf[pos] != '[':
+                    raise ValueError("expected a JSON array")
+                pos += 1
+                self._state = _STATE_FIRST_VALUE
+            elif self._state == _STATE_FIRST_VALUE and buf[pos] == ']':
+                pos += 1
+                self._state = _STATE_END
+            elif self._state in (_STATE_FIRST_VALUE, _STATE_VALUE):
+                try:
+                    item, end = self._decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError as err:
+                    if final:
+                        raise ValueError(str(err))
+                    # The rest of the element is not here yet.
+                    break
+
+                if not final and (end >= size or buf[end] not in _DELIMITERS):
+                    # A number such as "1" in "1e5" or "-2.5" may be decoded
+                    # before the rest of it is here. Only an element followed
+                    # by a delimiter is surely complete.
+                    break
+
+                items.append(item)
+                pos = end
+                self._state = _STATE_SEPARATOR
+            elif self._state == _STATE_SEPARATOR:
+                if buf[pos] == ',':
+                    self._state = _STATE_VALUE
+                elif buf[pos] == ']':
+                    self._state = _STATE_END
+                else:
+                    raise ValueError(
+                        "unexpected '{}' in JSON array".format(buf[pos]))
+                pos += 1
+            else:
+                raise ValueError("unexpected data after the JSON array")
+
+        self._buf = buf[pos:]
+        return items
+
+    def close(self):
+        '''
+        Returns the elements which were waiting for the end of the data.
+        Raises ValueError when the array is not complete.
+        '''
+        items = self.feed(b"", final=True)
+        if self._state != _STATE_END:
+            raise ValueError("incomplete JSON array")
+        return items
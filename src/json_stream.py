@@ -0,0 +1,140 @@
+# json_stream.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import queue
+import threading
+from gi.repository import GLib
+from euterpe_gtk.json_decoder import JSONArrayDecoder
+
+# Number of bytes read from the response stream at once.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Maximum number of decoded items handed to the callback at once. Items are
+# handed as soon as a chunk is decoded so batches may be smaller.
+STREAM_BATCH_SIZE = 500
+
+
+class JSONArrayStream(object):
+    '''
+    JSONArrayStream reads a JSON array from a Gio.InputStream such as the
+    body of an http.AsyncRequest. The stream is read asynchronously in the
+    main loop and the chunks are decoded in a worker thread. So neither the
+    whole body nor the whole decoded array has to be in memory at once.
+
+    Both callbacks are called in the main loop:
+
+        * on_items(items, *args) - zero or more times with lists of decoded
+          elements in the order of the array.
+        * on_done(error, *args) - once at the end. `error` is None on
+          success and an error message otherwise, including when the
+          `cancellable` was cancelled.
+
+    The stream is closed at the end.
+    '''
+
+    def __init__(self, stream, cancellable, on_items, on_done, *args):
+        self._stream = stream
+        self._cancellable = cancellable
+        self._on_items = on_items
+        self._on_done = on_done
+        self._args = args
+        self._chunks = queue.Queue()
+        # Set by the worker when decoding has failed and there is no point
+        # in reading any more.
+        self._stop = threading.Event()
+
+    def start(self):
+        thread = threading.Thread(
+            target=self._decode_thread,
+            name="json-stream",
+            daemon=True,
+        )
+        thread.start()
+        self._read_next()
+
+    def _read_next(self):
+        self._stream.read_bytes_async(
+            STREAM_CHUNK_SIZE,
+            GLib.PRIORITY_DEFAULT,
+            self._cancellable,
+            self._on_read,
+        )
+
+    def _on_read(self, stream, result):
+        try:
+            data = stream.read_bytes_finish(result).get_data()
+        except GLib.Error as err:
+            self._chunks.put(err.message)
+            self._close_stream()
+            return
+
+        if self._stop.is_set():
+            self._close_stream()
+            return
+
+        if data is None or len(data) == 0:
+            self._chunks.put(None)
+            self._close_stream()
+            return
+
+        self._chunks.put(data)
+        self._read_next()
+
+    def _close_stream(self):
+        self._stream.close_async(GLib.PRIORITY_DEFAULT, None, None)
+
+    def _decode_thread(self):
+        decoder = JSONArrayDecoder()
+        error = None
+
+        while True:
+            chunk = self._chunks.get()
+            try:
+                if chunk is None:
+                    items = decoder.close()
+                elif isinstance(chunk, str):
+                    error = chunk
+                    break
+                else:
+                    items = decoder.feed(chunk)
+            except ValueError as err:
+                error = "decoding JSON failed: {}".format(err)
+                self._stop.set()
+                break
+            except Exception:
+                sys.excepthook(*sys.exc_info())
+                error = "decoding JSON failed"
+                self._stop.set()
+                break
+
+            for start in range(0, len(items), STREAM_BATCH_SIZE):
+                GLib.idle_add(self._deliver_items,
+                    items[start:start + STREAM_BATCH_SIZE])
+
+            if chunk is None:
+                break
+
+        GLib.idle_add(self._deliver_done, error)
+
+    def _deliver_items(self, items):
+        self._on_items(items, *self._args)
+        return False
+
+    def _deliver_done(self, error):
+        self._on_done(error, *self._args)
+        return False
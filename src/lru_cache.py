@@ -0,0 +1,115 @@
+# lru_cache.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    '''
+    LRUCache keeps values in memory and removes the least recently used ones
+    once it is full. It is full when it has more than `max_entries` values
+    or when the sizes of its values, as returned by `size_func`, add up to
+    more than `max_size`. Either limit may be None. The most recently stored
+    value is never removed because of the size limit.
+
+    With `ttl` values expire that many seconds after they were stored.
+    '''
+
+    def __init__(self, max_entries=None, ttl=None, max_size=None,
+            size_func=None):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._max_size = max_size
+        self._size_func = size_func
+        self._size = 0
+        # Maps keys to (stored_at, value) tuples.
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        '''
+        Returns the value for `key` or None when there is no such value or
+        it has expired.
+        '''
+        entry = self._entries.get(key, None)
+        if entry is not None and self._ttl is not None and \
+                time.monotonic() - entry[0] > self._ttl:
+            self.remove(key)
+            entry = None
+
+        if entry is None:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, value):
+        self.remove(key)
+        self._entries[key] = (time.monotonic(), value)
+        self._size += self._value_size(value)
+
+        while len(self._entries) > 1 and self._is_full():
+            oldest = next(iter(self._entries))
+            self.remove(oldest)
+
+    def remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= self._value_size(entry[1])
+
+    def remove_if(self, predicate):
+        '''
+        Removes the values of all keys for which `predicate` returns True.
+        '''
+        for key in [k for k in self._entries if predicate(k)]:
+            self.remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    def get_size(self):
+        return self._size
+
+    def get_stats(self):
+        '''
+        Returns a dict with the number of cache hits, misses, values in the
+        cache and their size.
+        '''
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "entries": len(self._entries),
+            "size": self._size,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _is_full(self):
+        if self._max_entries is not None and \
+                len(self._entries) > self._max_entries:
+            return True
+        return self._max_size is not None and self._size > self._max_size
+
+    def _value_size(self, value):
+        if self._size_func is None:
+            return 0
+        return self._size_func(value)
@@ -38,6 +38,12 @@ import euterpe_gtk.log as log
 
 HELP_URL = "https://listen-to-euterpe.eu/docs"
 
+# Response ID of the export button of the HTTP requests dialog.
+HTTP_METRICS_EXPORT = 1
+
+# Number of endpoints shown in the HTTP requests dialog.
+HTTP_METRICS_SHOWN = 12
+
 class Application(Gtk.Application):
     def __init__(self, version):
         super().__init__(application_id='com.doycho.euterpe.gtk',
@@ -53,6 +59,8 @@ class Application(Gtk.Application):
         self._config_store = None
         self._cache_store = None
 
+        self._set_up_caches()
+
         if platform.system() == "Linux":
             self._set_up_mpris()
 
@@ -83,6 +91,31 @@ class Application(Gtk.Application):
         win = EuterpeGtkWindow(application=self)
         win.present()
 
+    def _set_up_caches(self):
+        '''
+        The sizes of the on-disk caches in bytes could be changed with the
+        "artwork_cache_size" and "audio_cache_size" keys in the config file.
+        Downloading upcoming tracks into the audio cache could be turned off
+        with the "disable_track_prefetch" key and tracks larger than
+        "track_prefetch_max_size" bytes are not downloaded.
+        '''
+        config = self.get_config_store()
+
+        cache_size = config.get_integer("artwork_cache_size")
+        if cache_size > 0:
+            self._euterpe.get_artwork_cache().set_max_size(cache_size)
+
+        cache_size = config.get_integer("audio_cache_size")
+        if cache_size > 0:
+            self._player.get_audio_cache().set_max_size(cache_size)
+
+        prefetcher = self._player.get_prefetcher()
+        prefetcher.set_enabled(not config.get_boolean("disable_track_prefetch"))
+
+        prefetch_size = config.get_integer("track_prefetch_max_size")
+        if prefetch_size > 0:
+            prefetcher.set_max_size(prefetch_size)
+
     def _set_up_mpris(self):
         from euterpe_gtk.mpris import MPRIS
 
@@ -107,6 +140,7 @@ class Application(Gtk.Application):
             "about_dialog": self.on_about_dialog,
             "search": self.on_search,
             "show_playlists": self.on_show_playlists,
+            "http_metrics": self.on_http_metrics,
         }
 
         for action_name, handler in actions.items():
@@ -122,6 +156,7 @@ class Application(Gtk.Application):
         self.set_accels_for_action("app.toggle_shuffle", ["<Control>H"])
         self.set_accels_for_action("app.search", ["<Control>F"])
         self.set_accels_for_action("app.reference", ["F1"])
+        self.set_accels_for_action("app.http_metrics", ["<Control><Shift>D"])
         self.set_accels_for_action("win.go-back", ["<Alt>Left"])
 
     def on_logout(self, *args):
@@ -195,6 +230,53 @@ class Application(Gtk.Application):
         else:
             log.error("the main window has no 'open_playlists_screen' property")
 
+    def on_http_metrics(self, *args):
+        '''
+        Shows the timings of the recent HTTP requests. Meant for debugging
+        slow responses.
+        '''
+        dialog = Gtk.MessageDialog(
+            transient_for=self.props.active_window,
+            modal=True,
+            message_type=Gtk.MessageType.INFO,
+            text="HTTP Requests",
+            secondary_use_markup=True,
+            secondary_text=_format_http_metrics(
+                http.request_metrics().get_summary()
+            ),
+        )
+        dialog.add_button("_Export", HTTP_METRICS_EXPORT)
+        dialog.add_button("_Close", Gtk.ResponseType.CLOSE)
+        dialog.connect("response", self._on_http_metrics_response)
+        dialog.show()
+
+    def _on_http_metrics_response(self, dialog, response_id):
+        if response_id != HTTP_METRICS_EXPORT:
+            dialog.destroy()
+            return
+
+        chooser = Gtk.FileChooserNative.new(
+            "Export HTTP Requests",
+            dialog,
+            Gtk.FileChooserAction.SAVE,
+            "_Export",
+            "_Cancel"
+        )
+        chooser.set_do_overwrite_confirmation(True)
+        chooser.set_current_name("euterpe-http-requests.json")
+
+        if chooser.run() != Gtk.ResponseType.ACCEPT:
+            return
+
+        file_name = chooser.get_filename()
+        try:
+            http.request_metrics().export(file_name)
+        except OSError as err:
+            log.warning("exporting HTTP requests to {} failed: {}",
+                file_name, err)
+        else:
+            log.message("HTTP requests exported to {}", file_name)
+
     def get_player(self):
         return self._player
 
@@ -247,3 +329,29 @@ class Application(Gtk.Application):
 def main(version):
     app = Application(version)
     return app.run(sys.argv)
+
+
+def _format_http_metrics(summary):
+    '''
+    Returns Pango markup with a table of the request timings summary.
+    Durations are the median and 90th percentile in milliseconds.
+    '''
+    if len(summary) == 0 or summary[0]["count"] == 0:
+        return "No requests yet."
+
+    lines = ["{:<28} {:>6} {:>5} {:>4} {:>13} {:>13} {:>13}".format(
+        "endpoint", "lane", "count", "err", "wait", "ttfb", "total",
+    )]
+    for row in summary[:HTTP_METRICS_SHOWN + 1]:
+        lines.append("{:<28} {:>6} {:>5} {:>4} {:>13} {:>13} {:>13}".format(
+            row["endpoint"][-28:],
+            row["priority"],
+            row["count"],
+            row["errors"],
+            "{:.0f}/{:.0f}".format(row["queue_wait"]["p50"],
+                row["queue_wait"]["p90"]),
+            "{:.0f}/{:.0f}".format(row["ttfb"]["p50"], row["ttfb"]["p90"]),
+            "{:.0f}/{:.0f}".format(row["total"]["p50"], row["total"]["p90"]),
+        ))
+
+    return "<tt>{}</tt>".format(GLib.markup_escape_text("\n".join(lines)))
@@ -0,0 +1,182 @@
+# play_queue.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from gi.repository import GObject
+from euterpe_gtk.utils import emit_signal
+
+SIGNAL_TRACKS_INSERTED = "tracks-inserted"
+SIGNAL_TRACKS_REMOVED = "tracks-removed"
+
+
+class PlayQueue(GObject.Object):
+    '''
+    PlayQueue is the list of tracks of the player. Every track added to
+    the queue becomes an entry with an ID which does not change while the
+    entry is in the queue, even when tracks around it are inserted, moved or
+    removed. The same track may be in the queue many times as different
+    entries.
+
+    Changes are announced with the "tracks-inserted" and "tracks-removed"
+    signals. Both have the position of the first changed entry and the
+    number of entries as arguments. Moving an entry is a removal followed by
+    an insertion.
+    '''
+
+    __gsignals__ = {
+        SIGNAL_TRACKS_INSERTED: (GObject.SignalFlags.RUN_FIRST, None,
+            (int, int)),
+        SIGNAL_TRACKS_REMOVED: (GObject.SignalFlags.RUN_FIRST, None,
+            (int, int)),
+    }
+
+    def __init__(self):
+        GObject.Object.__init__(self)
+        # Entry IDs in queue order.
+        self._entries = []
+        # Maps entry IDs to track dicts.
+        self._tracks = {}
+        # Maps track IDs to the set of entry IDs for this track.
+        self._by_track_id = {}
+        # Maps entry IDs to their positions. Rebuilt on first use after
+        # a change in the middle of the queue. None when it is stale.
+        self._positions = {}
+        self._last_entry_id = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, position):
+        '''
+        Returns the track dict at `position`.
+        '''
+        return self._tracks[self._entries[position]]
+
+    def get_entry_id(self, position):
+        return self._entries[position]
+
+    def get_entry(self, entry_id):
+        '''
+        Returns the track dict of the entry with `entry_id` or None when
+        there is no such entry.
+        '''
+        return self._tracks.get(entry_id, None)
+
+    def position_of(self, entry_id):
+        '''
+        Returns the position of the entry with `entry_id` or None when there
+        is no such entry in the queue.
+        '''
+        if entry_id not in self._tracks:
+            return None
+
+        if self._positions is None:
+            self._positions = {
+                eid: pos for pos, eid in enumerate(self._entries)
+            }
+
+        return self._positions[entry_id]
+
+    def find_track(self, track_id):
+        '''
+        Returns the IDs of all entries for the track with `track_id`.
+        '''
+        return list(self._by_track_id.get(track_id, ()))
+
+    def tracks(self, start=0, end=None):
+        '''
+        Returns a list with the track dicts from `start` up to `end`. The
+        dicts themselves are not copied.
+        '''
+        return [self._tracks[eid] for eid in self._entries[start:end]]
+
+    def append(self, tracks):
+        self.insert(len(self._entries), tracks)
+
+    def insert(self, position, tracks):
+        '''
+        Inserts `tracks` (a list of track dicts) before `position`.
+        '''
+        if len(tracks) == 0:
+            return
+
+        position = max(0, min(position, len(self._entries)))
+        at_end = position == len(self._entries)
+
+        entry_ids = []
+        for track in tracks:
+            self._last_entry_id += 1
+            entry_id = self._last_entry_id
+            entry_ids.append(entry_id)
+            self._tracks[entry_id] = track
+            self._by_track_id.setdefault(track.get("id"), set()).add(entry_id)
+
+        self._entries[position:position] = entry_ids
+
+        if not at_end:
+            self._positions = None
+        elif self._positions is not None:
+            for offset, entry_id in enumerate(entry_ids):
+                self._positions[entry_id] = position + offset
+
+        emit_signal(self, SIGNAL_TRACKS_INSERTED, position, len(entry_ids))
+
+    def remove(self, position, count=1):
+        '''
+        Removes `count` entries starting from `position`.
+        '''
+        removed = self._entries[position:position + count]
+        if len(removed) == 0:
+            return
+
+        at_end = position + len(removed) == len(self._entries)
+        del self._entries[position:position + len(removed)]
+
+        for entry_id in removed:
+            track = self._tracks.pop(entry_id)
+            same_track = self._by_track_id.get(track.get("id"))
+            same_track.discard(entry_id)
+            if len(same_track) == 0:
+                del self._by_track_id[track.get("id")]
+            if at_end and self._positions is not None:
+                del self._positions[entry_id]
+
+        if not at_end:
+            self._positions = None
+
+        emit_signal(self, SIGNAL_TRACKS_REMOVED, position, len(removed))
+
+    def move(self, source, destination):
+        '''
+        Moves the entry at `source` so that it ends up at `destination`.
+        The entry keeps its ID.
+        '''
+        if source == destination:
+            return
+
+        entry_id = self._entries.pop(source)
+        self._positions = None
+        emit_signal(self, SIGNAL_TRACKS_REMOVED, source, 1)
+
+        self._entries.insert(destination, entry_id)
+        emit_signal(self, SIGNAL_TRACKS_INSERTED, destination, 1)
+
+    def replace(self, tracks):
+        '''
+        Replaces all entries of the queue with new ones for `tracks`.
+        '''
+        self.remove(0, len(self._entries))
+        self.append(tracks)
@@ -16,21 +16,37 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from gi.repository import GObject, GLib, Gst
-from euterpe_gtk.utils import emit_signal
+from euterpe_gtk.utils import emit_signal, audio_cache_dir
+from euterpe_gtk.disk_cache import DiskCache
+from euterpe_gtk.prefetcher import TrackPrefetcher
+from euterpe_gtk.shuffle_order import ShuffleOrder
+from euterpe_gtk.play_queue import PlayQueue
 import euterpe_gtk.log as log
 from functools import partial
 from enum import Enum
-import random
 
 SIGNAL_PROGRESS = "progress"
 SIGNAL_STATE_CHANGED = "state-changed"
 SIGNAL_TRACK_CHANGED = "track-changed"
 SIGNAL_PLAYLIST_CHANGED = "playlist-changed"
+SIGNAL_TRACKS_INSERTED = "tracks-inserted"
+SIGNAL_TRACKS_REMOVED = "tracks-removed"
 SIGNAL_REPEAT_CHANGED = "repeat-changed"
 SIGNAL_SHUFFLE_CHANGED = "shuffle-changed"
 SIGNAL_VOLUME_CHANGED = "volume-changed"
 SIGNAL_SEEKED = "seeked"
 
+# When gapless playback is on the next track is prepared when the current
+# one has this many nanoseconds left.
+GAPLESS_PREPARE_NS = 20 * Gst.SECOND
+
+# Default size of the on-disk cache of played tracks in bytes.
+AUDIO_CACHE_MAX_SIZE = 1024 * 1024 * 1024
+
+# Number of upcoming tracks which are downloaded into the audio cache while
+# the current one is playing.
+PREFETCH_COUNT = 2
+
 
 class Repeat(Enum):
     NONE = 1
@@ -54,6 +70,10 @@ class Player(GObject.Object):
         SIGNAL_STATE_CHANGED: (GObject.SignalFlags.RUN_FIRST, None, ()),
         SIGNAL_TRACK_CHANGED: (GObject.SignalFlags.RUN_FIRST, None, ()),
         SIGNAL_PLAYLIST_CHANGED: (GObject.SignalFlags.RUN_FIRST, None, ()),
+        SIGNAL_TRACKS_INSERTED: (GObject.SignalFlags.RUN_FIRST, None,
+            (int, int)),
+        SIGNAL_TRACKS_REMOVED: (GObject.SignalFlags.RUN_FIRST, None,
+            (int, int)),
         SIGNAL_REPEAT_CHANGED: (GObject.SignalFlags.RUN_FIRST, None, ()),
         SIGNAL_SHUFFLE_CHANGED: (GObject.SignalFlags.RUN_FIRST, None, ()),
         SIGNAL_SEEKED: (GObject.SignalFlags.RUN_FIRST, None, ()),
@@ -63,25 +83,60 @@ class Player(GObject.Object):
 
     def __init__(self, euterpeService):
         GObject.GObject.__init__(self)
-        self._playlist = []
+        self._playlist = PlayQueue()
+        # Position and count of the changed tracks are forwarded so that
+        # the UI could update only them instead of the whole queue.
+        self._playlist.connect(
+            "tracks-inserted",
+            partial(self._on_queue_changed, SIGNAL_TRACKS_INSERTED),
+        )
+        self._playlist.connect(
+            "tracks-removed",
+            partial(self._on_queue_changed, SIGNAL_TRACKS_REMOVED),
+        )
         self._current_playlist_index = None
+        self._pipeline = None
+        # _playbin is the pipeline while there is a track loaded in it and
+        # None otherwise.
         self._playbin = None
         self._volumebin = None
         self._progress_id = 0
         self._service = euterpeService
         self._seek_to = None
         self._shuffle = Shuffle.NONE
+        self._shuffle_order = ShuffleOrder()
         self._repeat = Repeat.NONE
         self._volume_level = 1.0
         self._restored_progress = None
+        self._gapless = True
+        self._concat = None
+        self._current_source = None
+        self._next_source = None
+        self._audio_cache = DiskCache(audio_cache_dir(), AUDIO_CACHE_MAX_SIZE)
+        self._prefetcher = TrackPrefetcher(euterpeService, self._audio_cache)
+        # Playlist indexes of the tracks which will be played after the
+        # current one, in order. Shuffled picks are made once and kept here
+        # so that the prefetched tracks are the ones actually played next.
+        self._upcoming = []
+
+    def get_audio_cache(self):
+        return self._audio_cache
+
+    def get_prefetcher(self):
+        return self._prefetcher
+
+    def _on_queue_changed(self, signal, queue, position, count):
+        emit_signal(self, signal, position, count)
 
     def set_playlist(self, playlist):
-        self.stop()
-        self._playlist = playlist
+        self._unload(Gst.State.READY)
+        self._reset_upcoming()
+        self._playlist.replace(playlist)
         if len(playlist) > 0:
             self._current_playlist_index = 0
         else:
             self._current_playlist_index = None
+        self._shuffle_order.reset(len(playlist), self._current_playlist_index)
         emit_signal(self, SIGNAL_PLAYLIST_CHANGED)
         emit_signal(self, SIGNAL_STATE_CHANGED)
 
@@ -89,16 +144,19 @@ class Player(GObject.Object):
         if len(tracks) == 0:
             return
 
-        self._playlist.extend(tracks)
+        self._playlist.append(tracks)
+        self._shuffle_order.extend(len(tracks))
         if self._current_playlist_index is None:
             self._current_playlist_index = 0
+        self._reset_upcoming()
         emit_signal(self, SIGNAL_PLAYLIST_CHANGED)
         emit_signal(self, SIGNAL_STATE_CHANGED)
 
     def _load_from_current_index(self):
         '''
             Moves forward the current index if there is one. Stops the
-            currently playing track if any and then creates a new playbin.
+            currently playing track if any and then loads the track at the
+            current index in the pipeline.
         '''
         pl_len = len(self._playlist)
 
@@ -112,40 +170,80 @@ class Player(GObject.Object):
         if self._current_playlist_index >= pl_len:
             self._current_playlist_index = 0
 
-        track = self._playlist[self._current_playlist_index]
-        track_url = self._service.get_track_url(track["id"])
-        token = self._service.get_token()
+        source = self._create_track_source(self._current_playlist_index)
+        self._setup_new_playbin(source)
 
-        self._setup_new_playbin(track_url, token)
+    def _create_track_source(self, index):
+        '''
+        Creates a TrackSource for the track at `index` in the playlist. It
+        reads the track from the audio cache when it is there. Otherwise
+        the track is streamed from the server and stored in the cache while
+        being played.
+        '''
+        track = self._playlist.get(index)
+        cache_key = (self._service.get_address(), track["id"])
+
+        cached_path = self._audio_cache.lookup(cache_key)
+        if cached_path is not None:
+            log.debug("playing track {} from the audio cache", track["id"])
+            return TrackSource(index, cached_path=cached_path)
+
+        return TrackSource(
+            index,
+            play_uri=self._service.get_track_url(track["id"]),
+            token=self._service.get_token(),
+            cache_key=cache_key,
+            partial_path=self._audio_cache.new_partial_file(),
+        )
 
-    def _setup_new_playbin(self, play_uri, token):
-        self.stop()
+    def _setup_new_playbin(self, source):
+        '''
+        Makes the pipeline play the TrackSource `source`. The pipeline itself
+        is reused, only the source of the previous track is replaced.
+        '''
+        pipeline = self._get_pipeline()
 
-        pipeline = Gst.Pipeline.new('mainpipeline')
+        # READY keeps the audio sink open while stopping the data flow.
+        pipeline.set_state(Gst.State.READY)
 
-        src = Gst.ElementFactory.make("souphttpsrc", "source")
-        src.set_property('location', play_uri)
-        src.set_property('user-agent', "Euterpe GTK Gstreamer")
-        src.set_property('timeout', 30)
+        # Drop the messages from the previous track which are still queued
+        # so that they do not affect the new one. Such as a late EOS.
+        bus = pipeline.get_bus()
+        bus.set_flushing(True)
+        bus.set_flushing(False)
 
-        if token is not None:
-            headers = Gst.Structure.new_empty('extra-headers')
-            headers.set_value("Authorization", "Bearer " + token)
-            src.set_property('extra-headers', headers)
+        self._remove_track_sources()
 
-        buff = Gst.ElementFactory.make("queue2", "buffer")
-        buff.set_property("use-buffering", True)
-        buff.set_property("max-size-bytes", 10485760) # 10MB
-        buff.set_property("max-size-time", 30000000000) # 30s
-        buff.set_property("high-watermark", 0.20)
+        self._playbin = pipeline
+        self._restored_progress = None
+        self._seek_to = None
 
-        dec = Gst.ElementFactory.make("decodebin", "decoder")
+        self._attach_track_source(source)
+        self._current_source = source
+        self._shuffle_order.select(self._current_playlist_index)
+        self._advance_upcoming()
 
-        pipeline.add(src)
-        pipeline.add(buff)
-        pipeline.add(dec)
-        src.link(buff)
-        buff.link(dec)
+        emit_signal(self, SIGNAL_TRACK_CHANGED)
+
+    def _get_pipeline(self):
+        '''
+        Returns the pipeline used for playback, creating it on first use. It
+        lives for the whole session:
+
+            (TrackSource)* -> concat -> audioconvert -> volume -> autoaudiosink
+
+        Every track is decoded in its own TrackSource bin which is linked
+        to the concat element. When one track ends the concat continues
+        with the next one without any gap, if it has been prepared already.
+        '''
+        if self._pipeline is not None:
+            return self._pipeline
+
+        pipeline = Gst.Pipeline.new('mainpipeline')
+
+        concat = Gst.ElementFactory.make("concat", "tracks")
+        pipeline.add(concat)
+        concat.connect("notify::active-pad", self._on_active_pad_changed)
 
         audio = Gst.Bin.new('audiobin')
         conv = Gst.ElementFactory.make("audioconvert", "aconv")
@@ -164,8 +262,7 @@ class Player(GObject.Object):
         convsinkpad = conv.get_static_pad("sink")
         audio.add_pad(Gst.GhostPad.new('sink', convsinkpad))
         pipeline.add(audio)
-
-        dec.connect("pad-added", self._on_newpad, audio)
+        concat.link(audio)
 
         bus = pipeline.get_bus()
         bus.add_signal_watch()
@@ -175,16 +272,177 @@ class Player(GObject.Object):
 
         volume.props.volume = self._volume_level
 
-        self._playbin = pipeline
-        self._restored_progress = None
+        self._pipeline = pipeline
+        self._concat = concat
         self._volumebin = volume
+        return pipeline
+
+    def _remove_track_sources(self):
+        for source in [self._current_source, self._next_source]:
+            if source is not None:
+                self._detach_track_source(source)
+
+        self._current_source = None
+        self._next_source = None
+
+    def _attach_track_source(self, source):
+        '''
+        Adds the source bin to the pipeline and links it to a new sink pad
+        of the concat element.
+        '''
+        self._pipeline.add(source.bin)
+        concat_pad = self._concat.request_pad_simple("sink_%u")
+        source.bin.get_static_pad("src").link(concat_pad)
+        source.concat_pad = concat_pad
+
+    def _detach_track_source(self, source):
+        source.bin.set_state(Gst.State.NULL)
+        self._pipeline.remove(source.bin)
+        self._concat.release_request_pad(source.concat_pad)
+        source.concat_pad = None
+        source.finish_caching(self._audio_cache)
+
+    def _maybe_prepare_next_track(self, playbin):
+        '''
+        Prepares the next track for gapless playback once the current one
+        is close to its end.
+        '''
+        if not self._gapless or self._next_source is not None:
+            return
+
+        (ok, dur) = playbin.query_duration(Gst.Format.TIME)
+        if not ok:
+            return
+
+        (ok, pos) = playbin.query_position(Gst.Format.TIME)
+        if not ok or dur - pos > GAPLESS_PREPARE_NS:
+            return
+
+        self._prepare_next_track()
+
+    def _prepare_next_track(self):
+        '''
+        Creates the source for the next track in the queue and starts it.
+        Its data waits in the concat element until the current track is
+        finished.
+        '''
+        if self._playbin is None or self._next_source is not None:
+            return
+
+        ind = self._next_index()
+        if ind is None:
+            return
+
+        log.debug("preparing track at index {} for gapless playback", ind)
+        source = self._create_track_source(ind)
+        self._attach_track_source(source)
+        source.bin.sync_state_with_parent()
+        self._next_source = source
+
+    def _discard_next_track(self):
+        '''
+        Removes the prepared next track. Used when the queue settings have
+        changed and the next track may be a different one.
+        '''
+        if self._next_source is None:
+            return
+
+        self._detach_track_source(self._next_source)
+        self._next_source = None
+
+    def _switch_to_next_source(self):
+        '''
+        Checks whether the concat element moved to the prepared next track
+        and if so makes it the current one. Returns True when that is the case.
+        '''
+        next_source = self._next_source
+        if next_source is None or self._concat is None:
+            return False
+
+        if self._concat.get_property("active-pad") != next_source.concat_pad:
+            return False
+
+        log.debug("gapless switch to track at index {}", next_source.index)
+        self._make_next_source_current()
+        return True
+
+    def _skip_to_next_source(self):
+        '''
+        Makes the prepared next track the current one right away. Removing
+        the current source from the concat element makes it continue with
+        the next one, whose data is already waiting in it.
+        '''
+        log.debug("skipping to prepared track at index {}",
+            self._next_source.index)
         self._seek_to = None
+        self._make_next_source_current()
+
+    def _make_next_source_current(self):
+        next_source = self._next_source
+        if self._current_source is not None:
+            self._detach_track_source(self._current_source)
+        self._current_source = next_source
+        self._next_source = None
+        self._current_playlist_index = next_source.index
+        self._restored_progress = None
+        self._shuffle_order.select(self._current_playlist_index)
+        self._advance_upcoming()
+        self._prefetch_upcoming()
+
         emit_signal(self, SIGNAL_TRACK_CHANGED)
+        emit_signal(self, SIGNAL_STATE_CHANGED)
 
-    def _on_newpad(self, dec, pad, sinkbin):
-        # TODO: check caps!
-        sink_pad = sinkbin.get_static_pad("sink")
-        pad.link(sink_pad)
+    def _advance_upcoming(self):
+        '''
+        Drops the current track from the front of the upcoming tracks. When
+        the current track is not the one which was planned the whole plan
+        is thrown away.
+        '''
+        if len(self._upcoming) > 0 and \
+                self._upcoming[0] == self._current_playlist_index:
+            self._upcoming.pop(0)
+        else:
+            self._upcoming = []
+
+    def _reset_upcoming(self):
+        '''
+        Throws away the upcoming tracks. Used when the playlist or the queue
+        settings have changed.
+        '''
+        self._upcoming = []
+        if self._playbin is not None:
+            self._prefetch_upcoming()
+        else:
+            self._prefetcher.cancel()
+
+    def _prefetch_upcoming(self):
+        '''
+        Plans the next PREFETCH_COUNT tracks and starts downloading them
+        into the audio cache.
+        '''
+        if self._current_playlist_index is None:
+            return
+
+        while len(self._upcoming) < PREFETCH_COUNT:
+            if len(self._upcoming) > 0:
+                last = self._upcoming[-1]
+            else:
+                last = self._current_playlist_index
+            ind = self._index_after(last)
+            if ind is None:
+                break
+            self._upcoming.append(ind)
+
+        current = self._playlist.get(self._current_playlist_index)
+        tracks = []
+        for ind in self._upcoming:
+            track = self._playlist.get(ind)
+            if track["id"] == current["id"]:
+                # It is being streamed and cached right now.
+                continue
+            tracks.append(track)
+
+        self._prefetcher.prefetch(tracks)
 
     def _on_bus_error(self, bus, message):
         (error, parsed) = message.parse_error()
@@ -203,6 +461,17 @@ class Player(GObject.Object):
         else:
             self.stop()
 
+    def _on_active_pad_changed(self, concat, pspec):
+        # Called from the streaming thread. The stream-start bus message
+        # can not be used for this since the pipeline posts it only after
+        # every sink has started a new stream. The cache file sinks of the
+        # track sources start theirs as soon as their download starts.
+        GLib.idle_add(self._on_active_pad_idle)
+
+    def _on_active_pad_idle(self):
+        self._switch_to_next_source()
+        return False
+
     def _on_stream_start(self, bus, message):
         if self._seek_to is None:
             return
@@ -328,12 +597,24 @@ class Player(GObject.Object):
             emit_signal(self, SIGNAL_SEEKED)
 
     def stop(self):
+        '''
+        Stops the playback and releases the audio output.
+        '''
+        self._unload(Gst.State.NULL)
+        self._prefetcher.cancel()
+
+    def _unload(self, state):
+        '''
+        Stops the playback and removes the current track from the pipeline.
+        The pipeline is left in `state`. READY keeps the audio output open
+        for the track which will be loaded next.
+        '''
         if self._playbin is None:
             return
 
-        self._playbin.set_state(Gst.State.NULL)
+        self._playbin.set_state(state)
+        self._remove_track_sources()
         self._playbin = None
-        self._volumebin = None
         emit_signal(self, SIGNAL_STATE_CHANGED)
 
     def play(self):
@@ -346,6 +627,7 @@ class Player(GObject.Object):
 
         self._playbin.set_state(Gst.State.PLAYING)
         emit_signal(self, SIGNAL_STATE_CHANGED)
+        self._prefetch_upcoming()
 
         self._progress_id += 1
 
@@ -372,6 +654,7 @@ class Player(GObject.Object):
             return True
 
         emit_signal(self, SIGNAL_PROGRESS, progress)
+        self._maybe_prepare_next_track(playbin)
         return True
 
     def get_position(self):
@@ -400,23 +683,67 @@ class Player(GObject.Object):
         emit_signal(self, SIGNAL_STATE_CHANGED)
 
     def next(self):
+        if self._next_source is not None:
+            # Keep to the order chosen when the next track was prepared.
+            ind = self._next_source.index
+        else:
+            ind = self._next_index()
+
+        if ind is None:
+            return
+
+        self._play_index(ind)
+
+    def _play_index(self, ind):
+        '''
+        Starts playing the track at `ind`. The prepared next track is used
+        when it is the same one so that it starts without connecting to the
+        server and buffering again.
+        '''
+        next_source = self._next_source
+        if self._playbin is not None and next_source is not None and \
+                next_source.index == ind:
+            self._skip_to_next_source()
+            self.play()
+            return
+
+        self._current_playlist_index = ind
+        self._load_from_current_index()
+        self.play()
+
+    def _next_index(self):
+        '''
+        Returns the index of the track which would be played after the
+        current one or None if there is no such track.
+        '''
+        if len(self._upcoming) > 0:
+            return self._upcoming[0]
+
+        return self._index_after(self._current_playlist_index)
+
+    def _index_after(self, ind):
+        '''
+        Returns the index of the track which would be played after the
+        one at `ind` or None if there is no such track.
+        '''
         pl_len = len(self._playlist)
 
         if pl_len < 1:
             log.warning("trying next on empty playlist")
-            return
+            return None
 
-        if self._current_playlist_index is None:
+        if ind is None:
             log.warning("calling next() when current playlist index is None")
-            return
+            return None
 
-        ind = self._current_playlist_index
         if self._repeat == Repeat.SONG:
             # Do nothing, leave the song index the same!
             pass
         elif self._shuffle == Shuffle.QUEUE:
-            while pl_len > 1 and self._current_playlist_index == ind:
-                ind = random.randint(0, pl_len - 1)
+            return self._shuffle_order.index_after(
+                ind,
+                wrap=self._repeat == Repeat.QUEUE,
+            )
         else:
             ind += 1
 
@@ -424,20 +751,18 @@ class Player(GObject.Object):
             ind = 0
 
         if ind >= pl_len:
-            log.warning("trying to play track beyond the playlist length")
-            return
+            log.debug("no track after the end of the playlist")
+            return None
 
-        self._current_playlist_index = ind
-        self._load_from_current_index()
-        self.play()
+        return ind
 
     def has_next(self):
         if self._current_playlist_index is None:
             return False
-        if self._shuffle != Shuffle.NONE:
-            return True
         if self._repeat != Repeat.NONE:
             return True
+        if self._shuffle == Shuffle.QUEUE:
+            return self._shuffle_order.has_after(self._current_playlist_index)
         if self._current_playlist_index + 1 >= len(self._playlist):
             return False
         return True
@@ -445,8 +770,8 @@ class Player(GObject.Object):
     def has_previous(self):
         if self._current_playlist_index is None:
             return False
-        if self._shuffle != Shuffle.NONE:
-            return False
+        if self._shuffle == Shuffle.QUEUE:
+            return self._shuffle_order.has_before(self._current_playlist_index)
         if self._current_playlist_index - 1 < 0:
             return False
         return True
@@ -460,8 +785,12 @@ class Player(GObject.Object):
             return
 
         ind = self._current_playlist_index
-        ind -= 1
-        if ind < 0:
+        if self._shuffle == Shuffle.QUEUE:
+            # Walks back through the shuffle history.
+            ind = self._shuffle_order.index_before(ind)
+        else:
+            ind -= 1
+        if ind is None or ind < 0:
             log.warning("trying to play track before the start of playlist")
             return
 
@@ -509,7 +838,7 @@ class Player(GObject.Object):
         if self._current_playlist_index >= len(self._playlist):
             return None
 
-        return self._playlist[self._current_playlist_index].copy()
+        return self._playlist.get(self._current_playlist_index).copy()
 
     def get_track_index(self):
         '''
@@ -522,9 +851,7 @@ class Player(GObject.Object):
             log.warning("trying to play track outside of the playlist")
             return
 
-        self._current_playlist_index = index
-        self._load_from_current_index()
-        self.play()
+        self._play_index(index)
 
     def is_active(self):
         '''
@@ -537,7 +864,18 @@ class Player(GObject.Object):
         return pl_len > 0 and ind is not None
 
     def get_playlist(self):
-        return self._playlist[:]
+        '''
+        Returns a copy of the list of tracks in the queue. Prefer get_queue
+        when the whole list is not needed.
+        '''
+        return self._playlist.tracks()
+
+    def get_queue(self):
+        '''
+        Returns the PlayQueue with the tracks of the player. It must not be
+        modified directly, use the methods of the player instead.
+        '''
+        return self._playlist
 
     def get_shuffle(self):
         return self._shuffle
@@ -552,21 +890,54 @@ class Player(GObject.Object):
             self._repeat = Repeat.SONG
         else:
             self._repeat = Repeat.NONE
+        self._discard_next_track()
+        self._reset_upcoming()
         emit_signal(self, SIGNAL_REPEAT_CHANGED)
 
     def toggle_shuffle(self):
         self._shuffle = Shuffle.NONE if self._shuffle == Shuffle.QUEUE else\
             Shuffle.QUEUE
+        self._reset_shuffle_order()
+        self._discard_next_track()
+        self._reset_upcoming()
         emit_signal(self, SIGNAL_SHUFFLE_CHANGED)
 
     def set_shuffle(self, shuffle):
-        self._shuffle = shuffle
+        if self._shuffle != shuffle:
+            self._shuffle = shuffle
+            self._reset_shuffle_order()
+        self._discard_next_track()
+        self._reset_upcoming()
         emit_signal(self, SIGNAL_SHUFFLE_CHANGED)
 
+    def _reset_shuffle_order(self):
+        '''
+        Starts a new shuffle order from the current track.
+        '''
+        self._shuffle_order.reset(
+            len(self._playlist),
+            self._current_playlist_index,
+        )
+
     def set_repeat(self, repeat):
         self._repeat = repeat
+        self._discard_next_track()
+        self._reset_upcoming()
         emit_signal(self, SIGNAL_REPEAT_CHANGED)
 
+    def get_gapless(self):
+        return self._gapless
+
+    def set_gapless(self, gapless):
+        '''
+        Turns gapless playback on or off. With it the next track is prepared
+        shortly before the end of the current one and is played right after
+        it without any silence in between.
+        '''
+        self._gapless = gapless
+        if not gapless:
+            self._discard_next_track()
+
     def set_volume(self, val):
         if val < 0:
             val = 0
@@ -602,14 +973,24 @@ class Player(GObject.Object):
             self._volume_level = state['volume']
             emit_signal(self, SIGNAL_VOLUME_CHANGED, self._volume_level)
 
+        if 'gapless' in state:
+            self._gapless = state['gapless']
+
         if 'playlist' not in state or len(state['playlist']) == 0:
             return
 
-        self._playlist = state['playlist']
+        self._playlist.replace(state['playlist'])
 
         if 'index' in state:
             self._current_playlist_index = state['index']
 
+        restored = 'shuffle_order' in state and self._shuffle_order.restore(
+            state['shuffle_order'],
+            len(self._playlist),
+        )
+        if not restored:
+            self._reset_shuffle_order()
+
         if self._current_playlist_index is None:
             return
 
@@ -638,12 +1019,140 @@ class Player(GObject.Object):
 
         state = {
             "index": self._current_playlist_index,
-            "playlist": self._playlist,
+            "playlist": self._playlist.tracks(),
             "progress": progress,
             "position": position,
             "shuffle": self._shuffle,
             "repeat": self._repeat,
             "volume": self._volume_level,
+            "gapless": self._gapless,
+            "shuffle_order": self._shuffle_order.get_state(),
         }
 
         store.set_object("player_state", state)
+
+
+class TrackSource(object):
+    '''
+    TrackSource is a bin which reads a single track and decodes it. Its "src"
+    pad starts producing raw audio once the decoder finds the audio stream.
+
+    Tracks found in the audio cache are read from `cached_path`:
+
+        filesrc -> decodebin -> (src ghost pad)
+
+    Otherwise they are streamed from the Euterpe server. When `partial_path`
+    is given the downloaded data is written into it as well so that it
+    could be added to the audio cache under `cache_key`:
+
+        souphttpsrc -> tee -> queue2 -> decodebin -> (src ghost pad)
+                           -> queue -> filesink
+
+    `index` is the index of the track in the player's playlist.
+    '''
+
+    def __init__(self, index, play_uri=None, token=None, cached_path=None,
+        cache_key=None, partial_path=None):
+        self.index = index
+        self.concat_pad = None
+        self.bin = Gst.Bin.new(None)
+
+        self._cache_key = cache_key
+        self._partial_path = partial_path
+        self._download_complete = False
+        self._download_seeked = False
+
+        dec = Gst.ElementFactory.make("decodebin", "decoder")
+        self.bin.add(dec)
+
+        if cached_path is not None:
+            src = Gst.ElementFactory.make("filesrc", "source")
+            src.set_property('location', cached_path)
+            self.bin.add(src)
+            src.link(dec)
+        else:
+            self._add_http_source(play_uri, token, dec)
+
+        self._src_pad = Gst.GhostPad.new_no_target("src", Gst.PadDirection.SRC)
+        self.bin.add_pad(self._src_pad)
+
+        dec.connect("pad-added", self._on_newpad)
+
+    def _add_http_source(self, play_uri, token, dec):
+        src = Gst.ElementFactory.make("souphttpsrc", "source")
+        src.set_property('location', play_uri)
+        src.set_property('user-agent', "Euterpe GTK Gstreamer")
+        src.set_property('timeout', 30)
+
+        if token is not None:
+            headers = Gst.Structure.new_empty('extra-headers')
+            headers.set_value("Authorization", "Bearer " + token)
+            src.set_property('extra-headers', headers)
+
+        buff = Gst.ElementFactory.make("queue2", "buffer")
+        buff.set_property("use-buffering", True)
+        buff.set_property("max-size-bytes", 10485760) # 10MB
+        buff.set_property("max-size-time", 30000000000) # 30s
+        buff.set_property("high-watermark", 0.20)
+
+        self.bin.add(src)
+        self.bin.add(buff)
+
+        if self._partial_path is None:
+            src.link(buff)
+            buff.link(dec)
+            return
+
+        tee = Gst.ElementFactory.make("tee", "cache-tee")
+        cache_queue = Gst.ElementFactory.make("queue", "cache-queue")
+        cache_sink = Gst.ElementFactory.make("filesink", "cache-sink")
+        cache_sink.set_property("location", self._partial_path)
+        cache_sink.set_property("sync", False)
+        cache_sink.set_property("async", False)
+
+        self.bin.add(tee)
+        self.bin.add(cache_queue)
+        self.bin.add(cache_sink)
+
+        src.link(tee)
+        tee.link(buff)
+        buff.link(dec)
+        tee.link(cache_queue)
+        cache_queue.link(cache_sink)
+
+        cache_sink.get_static_pad("sink").add_probe(
+            Gst.PadProbeType.EVENT_DOWNSTREAM | Gst.PadProbeType.EVENT_FLUSH,
+            self._on_cache_sink_event,
+        )
+
+    def _on_cache_sink_event(self, pad, info):
+        # Called from the streaming thread.
+        event = info.get_event()
+        if event.type == Gst.EventType.EOS:
+            self._download_complete = True
+        elif event.type == Gst.EventType.FLUSH_START:
+            # After a seek the file will not contain the whole track in order.
+            self._download_seeked = True
+        return Gst.PadProbeReturn.OK
+
+    def finish_caching(self, cache):
+        '''
+        Adds the downloaded track to `cache` if the whole of it was
+        downloaded without seeking. Must be called after the bin has been
+        set to the NULL state.
+        '''
+        if self._partial_path is None:
+            return
+
+        if self._download_complete and not self._download_seeked:
+            cache.add_file(self._cache_key, self._partial_path)
+        else:
+            cache.discard_partial_file(self._partial_path)
+
+        self._partial_path = None
+
+    def _on_newpad(self, dec, pad):
+        # TODO: check caps!
+        if self._src_pad.get_target() is not None:
+            return
+        self._src_pad.set_target(pad)
@@ -0,0 +1,260 @@
+# prefetcher.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from gi.repository import Gio, GLib
+import euterpe_gtk.log as log
+
+# Tracks larger than this many bytes are not prefetched. Their downloads are
+# stopped as soon as they go past it so that long tracks which may never be
+# played do not take the bandwidth.
+PREFETCH_MAX_SIZE = 32 * 1024 * 1024
+
+# Number of bytes read from the response of a prefetched track at once.
+PREFETCH_CHUNK_SIZE = 64 * 1024
+
+
+class TrackPrefetcher(object):
+    '''
+    TrackPrefetcher downloads the tracks which are about to be played into
+    the audio cache in the background. So that skipping to them starts the
+    playback from the disk right away.
+
+    Tracks are downloaded one at a time in the LOW priority HTTP lane. The
+    lane slot is freed once the response headers arrive, so a single
+    download makes sure prefetching never uses more than one of its
+    connections while reading bodies. Downloads are cancelled as soon as
+    their track is no longer among the upcoming ones or once they are
+    larger than `max_size` bytes. Such tracks are remembered so that they
+    are not downloaded again every time the upcoming tracks are planned.
+    '''
+
+    def __init__(self, service, cache):
+        self._service = service
+        self._cache = cache
+        self._enabled = True
+        self._max_size = PREFETCH_MAX_SIZE
+        # Cache keys of the tracks waiting to be downloaded, in order.
+        self._waiting = []
+        # The _Download in progress or None.
+        self._download = None
+        # Cache keys of the tracks which were larger than `_max_size`.
+        self._too_large = set()
+
+    def set_enabled(self, enabled):
+        '''
+        Turns prefetching on or off. Turning it off cancels the download in
+        progress.
+        '''
+        self._enabled = enabled
+        if not enabled:
+            self.cancel()
+
+    def is_enabled(self):
+        return self._enabled
+
+    def set_max_size(self, max_size):
+        if max_size > self._max_size:
+            self._too_large.clear()
+        self._max_size = max_size
+
+    def get_max_size(self):
+        return self._max_size
+
+    def prefetch(self, tracks):
+        '''
+        Makes sure `tracks` (a list of track dicts) are in the audio cache or
+        are being downloaded into it, in their order. Downloads for all other
+        tracks are cancelled.
+        '''
+        if not self._enabled:
+            tracks = []
+
+        server = self._service.get_address()
+        wanted = [(server, track["id"]) for track in tracks]
+
+        download = self._download
+        if download is not None and download.key not in wanted:
+            log.debug("prefetch of track {} is not needed anymore",
+                download.key[1])
+            self._download = None
+            download.cancellable.cancel()
+
+        self._waiting = [
+            key for key in wanted
+            if self._download is None or key != self._download.key
+        ]
+        self._start_next()
+
+    def cancel(self):
+        '''
+        Cancels all downloads in progress.
+        '''
+        self.prefetch([])
+
+    def _start_next(self):
+        while self._download is None and len(self._waiting) > 0:
+            key = self._waiting.pop(0)
+            if key in self._too_large or self._cache.lookup(key) is not None:
+                continue
+            self._start_download(key)
+
+    def _start_download(self, key):
+        partial_path = self._cache.new_partial_file()
+        if partial_path is None:
+            return
+
+        log.debug("prefetching track {}", key[1])
+
+        download = _Download(key, partial_path)
+        self._download = download
+        self._service.download_track(
+            key[1],
+            download.cancellable,
+            self._on_track_response,
+            download,
+        )
+
+    def _on_track_response(self, status, body_stream, cancel, download):
+        if status != 200 or body_stream is None:
+            if status is not None:
+                log.debug("prefetching track {}: HTTP response code {}",
+                    download.key[1], status)
+            if body_stream is not None:
+                body_stream.close_async(GLib.PRIORITY_LOW, None, None)
+            self._finish(download, False)
+            return
+
+        download.body_stream = body_stream
+
+        file = Gio.File.new_for_path(download.partial_path)
+        file.replace_async(
+            None,
+            False,
+            Gio.FileCreateFlags.REPLACE_DESTINATION,
+            GLib.PRIORITY_LOW,
+            download.cancellable,
+            self._on_file_open,
+            download,
+        )
+
+    def _on_file_open(self, file, res, download):
+        try:
+            download.out = file.replace_finish(res)
+        except GLib.Error as err:
+            log.debug("prefetching track {}: opening file failed: {}",
+                download.key[1], err)
+            self._finish(download, False)
+            return
+
+        self._read_next(download)
+
+    def _read_next(self, download):
+        download.body_stream.read_bytes_async(
+            PREFETCH_CHUNK_SIZE,
+            GLib.PRIORITY_LOW,
+            download.cancellable,
+            self._on_read,
+            download,
+        )
+
+    def _on_read(self, stream, res, download):
+        try:
+            data = stream.read_bytes_finish(res)
+        except GLib.Error as err:
+            log.debug("prefetching track {} stopped: {}", download.key[1], err)
+            self._finish(download, False)
+            return
+
+        if data.get_size() == 0:
+            log.debug("prefetching track {} done", download.key[1])
+            self._finish(download, True)
+            return
+
+        download.size += data.get_size()
+        if download.size > self._max_size:
+            log.debug("prefetching track {} stopped: larger than {} bytes",
+                download.key[1], self._max_size)
+            self._too_large.add(download.key)
+            self._finish(download, False)
+            return
+
+        download.out.write_all_async(
+            data.get_data(),
+            GLib.PRIORITY_LOW,
+            download.cancellable,
+            self._on_written,
+            download,
+        )
+
+    def _on_written(self, out, res, download):
+        try:
+            out.write_all_finish(res)
+        except GLib.Error as err:
+            log.debug("prefetching track {}: writing failed: {}",
+                download.key[1], err)
+            self._finish(download, False)
+            return
+
+        self._read_next(download)
+
+    def _finish(self, download, success):
+        if download.body_stream is not None:
+            download.body_stream.close_async(GLib.PRIORITY_LOW, None, None)
+            download.body_stream = None
+
+        if download.out is None:
+            self._done(download, success)
+            return
+
+        # The file must be complete on disk before it goes in the cache.
+        download.out.close_async(GLib.PRIORITY_LOW, None, self._on_closed,
+            download, success)
+
+    def _on_closed(self, out, res, download, success):
+        try:
+            out.close_finish(res)
+        except GLib.Error as err:
+            log.debug("prefetching track {}: closing file failed: {}",
+                download.key[1], err)
+            success = False
+
+        self._done(download, success)
+
+    def _done(self, download, success):
+        if self._download is download:
+            self._download = None
+
+        if success:
+            self._cache.add_file(download.key, download.partial_path)
+        else:
+            self._cache.discard_partial_file(download.partial_path)
+
+        self._start_next()
+
+
+class _Download(object):
+    '''
+    _Download is a single track being written into a partial file of the
+    audio cache.
+    '''
+
+    def __init__(self, key, partial_path):
+        self.key = key
+        self.partial_path = partial_path
+        self.cancellable = Gio.Cancellable.new()
+        self.body_stream = None
+        self.out = None
+        self.size = 0
@@ -0,0 +1,119 @@
+# search_aggregator.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import heapq
+import threading
+from gi.repository import GLib
+
+
+def _by_tracks(item):
+    return item["tracks"]
+
+
+def aggregate(tracks, top):
+    '''
+    Groups the tracks of a search result by album and by artist. Returns a
+    dict such as:
+
+        {
+            "albums": [...],
+            "artists": [...],
+            "top_albums": [...],
+            "top_artists": [...],
+        }
+
+    "albums" and "artists" are in the order in which they were first found
+    in `tracks`. Use `sort_by_tracks` before showing them all. "top_albums"
+    and "top_artists" are the `top` ones with the most tracks. Selecting them
+    is O(n log top) instead of sorting everything.
+    '''
+    albums = {}
+    artists = {}
+    for track in tracks:
+        album_id = track.get("album_id")
+        album = albums.get(album_id, None)
+        if album is None:
+            album = {
+                "tracks": 0,
+                "artist": track.get("artist", "n/a"),
+                "album": track.get("album", "n/a"),
+                "album_id": album_id,
+            }
+            albums[album_id] = album
+        album["tracks"] += 1
+
+        artist_id = track.get("artist_id")
+        artist = artists.get(artist_id, None)
+        if artist is None:
+            artist = {
+                "tracks": 0,
+                "artist": track.get("artist", "n/a"),
+                "artist_id": artist_id,
+            }
+            artists[artist_id] = artist
+        artist["tracks"] += 1
+
+    albums = list(albums.values())
+    artists = list(artists.values())
+
+    # nlargest gives the same result as a stable descending sort followed
+    # by slicing. So the previews match the start of the full lists.
+    return {
+        "albums": albums,
+        "artists": artists,
+        "top_albums": heapq.nlargest(top, albums, key=_by_tracks),
+        "top_artists": heapq.nlargest(top, artists, key=_by_tracks),
+    }
+
+
+def sort_by_tracks(items):
+    '''
+    Sorts albums or artists returned by `aggregate` in place so that the
+    ones with most tracks are first.
+    '''
+    items.sort(key=_by_tracks, reverse=True)
+
+
+def aggregate_async(tracks, top, callback, *args):
+    '''
+    Runs `aggregate` in a worker thread. The callback is called in the main
+    loop with the result of `aggregate` followed by `args`. The tracks must
+    not be changed until then.
+    '''
+    thread = threading.Thread(
+        target=_aggregate_thread,
+        args=(tracks, top, callback, args),
+        name="search-aggregator",
+        daemon=True,
+    )
+    thread.start()
+
+
+def _aggregate_thread(tracks, top, callback, args):
+    try:
+        result = aggregate(tracks, top)
+    except Exception:
+        sys.excepthook(*sys.exc_info())
+        result = None
+
+    GLib.idle_add(_deliver, callback, result, args)
+
+
+def _deliver(callback, result, args):
+    callback(result, *args)
+    return False
@@ -0,0 +1,72 @@
+# search_cache.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from euterpe_gtk.lru_cache import LRUCache
+
+# Number of seconds for which a result is used from the cache.
+DEFAULT_TTL = 5 * 60
+
+# Maximum number of results kept in the cache.
+DEFAULT_MAX_ENTRIES = 64
+
+
+class ResultCache(object):
+    '''
+    ResultCache keeps the most recent results of server requests in memory.
+    Results are keyed by the server address and a request key. They expire
+    after `ttl` seconds. Once there are more than `max_entries` results the
+    least recently used ones are removed.
+    '''
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self._cache = LRUCache(max_entries=max_entries, ttl=ttl)
+
+    def get(self, server, key):
+        '''
+        Returns the cached result for `key` or None when there is no such
+        result or it has expired.
+        '''
+        return self._cache.get(self._key(server, key))
+
+    def put(self, server, key, result):
+        self._cache.put(self._key(server, key), result)
+
+    def clear(self):
+        self._cache.clear()
+
+    def get_stats(self):
+        '''
+        Returns a dict with the number of cache hits, misses and results in
+        the cache.
+        '''
+        stats = self._cache.get_stats()
+        del stats["size"]
+        return stats
+
+    def _key(self, server, key):
+        return (server, key)
+
+
+class SearchCache(ResultCache):
+    '''
+    SearchCache keeps the results of the most recent searches. So that
+    "Abbey  Road" and "abbey road" share the same result the queries are
+    normalized.
+    '''
+
+    def _key(self, server, query):
+        return (server, " ".join(query.casefold().split()))
@@ -20,8 +20,14 @@ import sys
 import json
 import mimetypes
 import urllib.parse
-from euterpe_gtk.http import Request, AsyncRequest, Priority
-from euterpe_gtk.utils import emit_signal
+from functools import partial
+from euterpe_gtk.http import Request, AsyncRequest, Priority, response_cache
+from euterpe_gtk.utils import emit_signal, artwork_cache_dir, catalog_file_name
+from euterpe_gtk.artwork_cache import ArtworkCache
+from euterpe_gtk.search_cache import SearchCache, ResultCache
+from euterpe_gtk.catalog import Catalog
+from euterpe_gtk.catalog_sync import CatalogSync
+from euterpe_gtk.json_stream import JSONArrayStream
 import euterpe_gtk.log as log
 from enum import Enum
 
@@ -109,14 +115,32 @@ class Euterpe(GObject.Object):
         self._token = None
         self._username = None
         self._user_agent = "Euterpe-GTK Player/{}".format(version)
+        self._artwork_cache = ArtworkCache(artwork_cache_dir())
+        self._artwork_flights = {}
+        self._json_flights = {}
+        self._search_cache = SearchCache()
+        self._catalog = Catalog(catalog_file_name())
+        self._catalog_sync = CatalogSync(self, self._catalog)
+        self._album_tracks_cache = ResultCache()
+        self._artist_albums_cache = ResultCache()
+        self._catalog_sync.connect("sync-finished", self._on_catalog_synced)
 
     def set_address(self, address):
+        if address != self._remote_address:
+            self._search_cache.clear()
+            self._clear_library_caches()
+            self._catalog_sync.cancel()
+            response_cache().clear()
         self._remote_address = address
 
     def get_address(self):
         return self._remote_address
 
     def set_token(self, token):
+        if token != self._token:
+            # Another user may see different search results.
+            self._search_cache.clear()
+            self._clear_library_caches()
         self._token = token
 
     def get_token(self):
@@ -128,29 +152,287 @@ class Euterpe(GObject.Object):
     def get_username(self):
         return self._username
 
-    def search(self, query, callback):
-        cb = TokenExpirationCallback(self, JSONBodyCallback(callback))
+    def get_artwork_cache(self):
+        return self._artwork_cache
+
+    def get_search_cache(self):
+        return self._search_cache
+
+    def get_catalog(self):
+        return self._catalog
+
+    def get_catalog_sync(self):
+        return self._catalog_sync
+
+    def sync_catalog(self, full=False):
+        '''
+        Starts copying the library of the current server into the local
+        catalog in the background. Unless `full` is True only items which
+        are new since the last sync are downloaded.
+        '''
+        self._catalog_sync.start(full)
+
+    def _on_catalog_synced(self, sync, success):
+        # Albums and artists may have new tracks now.
+        self._clear_library_caches()
+
+    def _clear_library_caches(self):
+        self._album_tracks_cache.clear()
+        self._artist_albums_cache.clear()
+
+    def search(self, query, callback, cancellable=None):
+        '''
+        Searches the library for `query`. The callback receives the HTTP
+        status, the list of found tracks and the query. When `cancellable`
+        is cancelled before the response is read the callback receives None
+        status and body.
+
+        Recent results are served from the search cache. The callback is
+        still called from the main loop and never before this method
+        returns.
+        '''
+        server = self._remote_address
+        found = self._search_cache.get(server, query)
+        if found is not None:
+            log.debug("search results for '{}' found in the cache", query)
+            GLib.idle_add(self._on_cached_search, found, cancellable,
+                callback, query)
+            return
+
+        cb = TokenExpirationCallback(self, JSONBodyCallback(
+            partial(self._on_search_response, server, callback),
+        ))
         address = Euterpe.build_url(self._remote_address, ENDPOINT_SEARCH)
         address = "{}?q={}".format(address, urllib.parse.quote(query, safe=''))
-        req = self._create_request(address, cb)
+        req = self._create_request(address, cb, Priority.HIGH, cancellable)
+        req.get(query)
+
+    def search_streaming(self, query, on_tracks, on_done, cancellable=None):
+        '''
+        Searches the library for `query` like `search` but hands the found
+        tracks to the caller while the response is still downloading. The
+        response is decoded in a worker thread.
+
+            * on_tracks(tracks, query) - called zero or more times with lists
+              of found tracks in the order of the result.
+            * on_done(status, query) - called once at the end with the HTTP
+              status. It is None when the request failed, the body could not
+              be decoded or `cancellable` was cancelled.
+
+        Complete results are stored in the search cache. Results from it are
+        handed at once.
+        '''
+        server = self._remote_address
+        found = self._search_cache.get(server, query)
+        if found is not None:
+            log.debug("search results for '{}' found in the cache", query)
+            GLib.idle_add(self._on_cached_search_streaming, found, cancellable,
+                on_tracks, on_done, query)
+            return
+
+        cb = TokenExpirationCallback(self, partial(
+            self._on_search_stream_response, server, on_tracks, on_done,
+        ))
+        address = Euterpe.build_url(self._remote_address, ENDPOINT_SEARCH)
+        address = "{}?q={}".format(address, urllib.parse.quote(query, safe=''))
+        req = self._create_async_request(address, cancellable, cb,
+            Priority.HIGH)
         req.get(query)
 
+    def _on_search_stream_response(self, server, on_tracks, on_done, status,
+            body_stream, cancel, query):
+        if body_stream is None:
+            on_done(None, query)
+            return
+
+        if status != 200:
+            body_stream.close_async(GLib.PRIORITY_DEFAULT, None, None)
+            on_done(status, query)
+            return
+
+        found = []
+        stream = JSONArrayStream(
+            body_stream,
+            cancel,
+            partial(self._on_search_stream_tracks, found, on_tracks),
+            partial(self._on_search_stream_done, server, found, on_done,
+                status),
+            query,
+        )
+        stream.start()
+
+    def _on_search_stream_tracks(self, found, on_tracks, tracks, query):
+        found.extend(tracks)
+        on_tracks(tracks, query)
+
+    def _on_search_stream_done(self, server, found, on_done, status, error,
+            query):
+        if error is not None:
+            log.debug("reading search results for '{}' failed: {}", query,
+                error)
+            on_done(None, query)
+            return
+
+        self._search_cache.put(server, query, found)
+        on_done(status, query)
+
+    def _on_cached_search_streaming(self, found, cancellable, on_tracks,
+            on_done, query):
+        if cancellable is not None and cancellable.is_cancelled():
+            on_done(None, query)
+            return False
+
+        on_tracks(list(found), query)
+        on_done(200, query)
+        return False
+
+    def _on_search_response(self, server, callback, status, body, query):
+        if status == 200 and isinstance(body, list):
+            # The callback gets its own list so that it cannot change the
+            # cached one.
+            self._search_cache.put(server, query, list(body))
+        callback(status, body, query)
+
+    def _on_cached_search(self, found, cancellable, callback, query):
+        if cancellable is not None and cancellable.is_cancelled():
+            callback(None, None, query)
+            return False
+
+        # The list is copied so that callers cannot change the cached one.
+        callback(200, list(found), query)
+        return False
+
+    def get_album_tracks(self, album, callback, cancellable=None):
+        '''
+        Gets the tracks of `album` (an album dict) ordered by their track
+        numbers. The callback receives the HTTP status, the list of tracks
+        and the album ID. When `cancellable` is cancelled before the tracks
+        are found the callback receives None status and tracks.
+
+        The tracks are taken from the local catalog once it is synced with
+        the server. Otherwise the album name is searched for and the results
+        are filtered by album ID. Either way they are cached per album. The
+        callback is always called from the main loop and never before this
+        method returns.
+        '''
+        server = self._remote_address
+        album_id = album.get("album_id")
+
+        tracks = self._album_tracks_cache.get(server, album_id)
+        if tracks is None and self._catalog.is_synced(server):
+            tracks = self._catalog.get_album_tracks(server, album_id)
+            if tracks is not None and len(tracks) > 0:
+                self._album_tracks_cache.put(server, album_id, tracks)
+            else:
+                # The album may be newer than the last sync.
+                tracks = None
+
+        if tracks is not None:
+            GLib.idle_add(self._on_cached_library_result, tracks,
+                cancellable, callback, album_id)
+            return
+
+        self.search(
+            album.get("album", ""),
+            partial(self._on_album_search, server, album_id, callback),
+            cancellable,
+        )
+
+    def _on_album_search(self, server, album_id, callback, status, body,
+            query):
+        if status != 200 or not isinstance(body, list):
+            callback(status, None, album_id)
+            return
+
+        tracks = [track for track in body if track.get("album_id") == album_id]
+        tracks.sort(key=lambda t: t.get("track") or 0)
+        if len(tracks) > 0:
+            self._album_tracks_cache.put(server, album_id, tracks)
+        callback(status, list(tracks), album_id)
+
+    def _on_cached_library_result(self, found, cancellable, callback,
+            item_id):
+        if cancellable is not None and cancellable.is_cancelled():
+            callback(None, None, item_id)
+            return False
+
+        # The list is copied so that callers cannot change the cached one.
+        callback(200, list(found), item_id)
+        return False
+
+    def get_artist_albums(self, artist, callback, cancellable=None):
+        '''
+        Gets the albums with tracks of `artist` (an artist dict) ordered by
+        name. The callback receives the HTTP status, the list of albums and
+        the artist ID. Albums are dicts with "album", "album_id", "artist" and
+        "artist_id" keys. When `cancellable` is cancelled before the albums
+        are found the callback receives None status and albums.
+
+        Works as `get_album_tracks`. The albums come from the tracks by
+        artist index of the local catalog once it is synced and from
+        searching for the artist name otherwise.
+        '''
+        server = self._remote_address
+        artist_id = artist.get("artist_id")
+
+        albums = self._artist_albums_cache.get(server, artist_id)
+        if albums is None and self._catalog.is_synced(server):
+            albums = self._catalog.get_artist_albums(server, artist_id)
+            if albums is not None and len(albums) > 0:
+                self._artist_albums_cache.put(server, artist_id, albums)
+            else:
+                # The artist may be newer than the last sync.
+                albums = None
+
+        if albums is not None:
+            GLib.idle_add(self._on_cached_library_result, albums, cancellable,
+                callback, artist_id)
+            return
+
+        self.search(
+            artist.get("artist", ""),
+            partial(self._on_artist_search, server, artist_id, callback),
+            cancellable,
+        )
+
+    def _on_artist_search(self, server, artist_id, callback, status, body,
+            query):
+        if status != 200 or not isinstance(body, list):
+            callback(status, None, artist_id)
+            return
+
+        albums = {}
+        for track in body:
+            if track.get("artist_id") != artist_id:
+                continue
+            if track.get("album_id") in albums:
+                continue
+
+            albums[track.get("album_id")] = {
+                "artist": track.get("artist"),
+                "artist_id": track.get("artist_id"),
+                "album": track.get("album"),
+                "album_id": track.get("album_id"),
+            }
+
+        albums = sorted(albums.values(),
+            key=lambda a: (a["album"] or "").casefold())
+        if len(albums) > 0:
+            self._artist_albums_cache.put(server, artist_id, albums)
+        callback(status, list(albums), artist_id)
+
     def get_playlist(self, playlist_id, callback):
-        cb = TokenExpirationCallback(self, JSONBodyCallback(callback))
         address = Euterpe.build_url(self._remote_address, ENDPOINT_PLAYLIST.format(
             playlist_id,
         ))
-        req = self._create_request(address, cb)
-        req.get()
+        self._get_json(address, callback, revalidate=True)
 
     def get_playlists(self, callback, page=1):
-        cb = TokenExpirationCallback(self, JSONBodyCallback(callback))
         address = ("{}?per-page=500&page={}".format(
             Euterpe.build_url(self._remote_address, ENDPOINT_PLAYLISTS),
             page,
         ))
-        req = self._create_request(address, cb)
-        req.get()
+        self._get_json(address, callback, revalidate=True)
 
     def change_playlist(self, playlist_id, callback,
         name=None, description=None, add_track_ids=None, remove_indeces=None,
@@ -170,7 +452,7 @@ class Euterpe(GObject.Object):
         if remove_indeces is not None:
             body["remove_indeces"] = remove_indeces
 
-        req = self._create_request(address, cb)
+        req = self._create_request(address, cb, Priority.HIGH)
         req.patch(
             "appliction/json",
              GLib.Bytes.new(bytes(json.dumps(body), 'utf-8')),
@@ -182,7 +464,7 @@ class Euterpe(GObject.Object):
         """
         cb = TokenExpirationCallback(self, JSONBodyCallback(callback))
         address = Euterpe.build_url(self._remote_address, ENDPOINT_PLAYLISTS)
-        req = self._create_request(address, cb)
+        req = self._create_request(address, cb, Priority.HIGH)
         req.post(
             "application/json",
             GLib.Bytes.new(bytes(json.dumps({"name": name, "description": description}), 'utf-8')),
@@ -197,7 +479,7 @@ class Euterpe(GObject.Object):
         address = Euterpe.build_url(self._remote_address, ENDPOINT_PLAYLIST.format(
             playlist_id,
         ))
-        req = self._create_request(address, cb)
+        req = self._create_request(address, cb, Priority.HIGH)
         req.delete(*args)
 
     def get_recently_added(self, what, callback, per_page=12):
@@ -205,15 +487,13 @@ class Euterpe(GObject.Object):
             log.warning("unknown rencently added type: {}", what)
             return
 
-        cb = TokenExpirationCallback(self, JSONBodyCallback(callback))
         address = Euterpe.build_url(self._remote_address, ENDPOINT_BROWSE)
         address = "{}?by={}&per-page={}&order-by=id&order=desc".format(
             address,
             urllib.parse.quote(what, safe=''),
             per_page,
         )
-        req = self._create_request(address, cb)
-        req.get()
+        self._get_json(address, callback, revalidate=True)
 
     def get_frequently_played(self, what, callback, per_page=12):
         '''
@@ -223,15 +503,13 @@ class Euterpe(GObject.Object):
             log.warning("unknown frequently played type: {}", what)
             return
 
-        cb = TokenExpirationCallback(self, JSONBodyCallback(callback))
         address = Euterpe.build_url(self._remote_address, ENDPOINT_BROWSE)
         address = "{}?by={}&per-page={}&order-by=frequency&order=desc".format(
             address,
             urllib.parse.quote(what, safe=''),
             per_page
         )
-        req = self._create_request(address, cb)
-        req.get()
+        self._get_json(address, callback)
 
     def get_random_list(self, what, callback, per_page=12):
         '''
@@ -251,45 +529,150 @@ class Euterpe(GObject.Object):
         req = self._create_request(address, cb)
         req.get()
 
-    def make_request(self, uri, callback):
+    def make_request(self, uri, callback, *args, priority=Priority.NORMAL,
+            cancellable=None, revalidate=True):
+        '''
+        Makes a GET request for `uri` on the current server. The callback
+        receives the HTTP status, the decoded JSON body and `args`.
+
+        With `revalidate` the response is kept in the HTTP response cache
+        and the server is only asked whether it has changed the next time.
+        '''
         full_url = Euterpe.build_url(self._remote_address, uri)
-        cb = TokenExpirationCallback(self, JSONBodyCallback(callback))
-        req = self._create_request(full_url, cb)
-        req.get()
+        self._get_json(full_url, callback, args, priority, cancellable,
+            revalidate)
 
     def get_album_artwork(self, album_id, size, cancellable, callback, *args):
         '''
-        Makes a request for an album artwork.
+        Makes a request for an album artwork. Images found in the artwork
+        cache are read from the disk instead.
 
             * album_id (int) - the ID of the album for which to get an image.
             * callback - a function described in the http.AsyncRequest.
         '''
         artwork_path = ENDPOINT_ALBUM_ART.format(album_id)
-        address = Euterpe.build_url(self._remote_address, artwork_path)
-
-        if size == ArtworkSize.SMALL:
-            address = "{}?size={}".format(address, 'small')
-
-        cb = TokenExpirationCallback(self, callback)
-        req = self._create_async_request(address, cancellable, cb, Priority.LOW)
-        req.get(*args)
+        self._get_artwork(ARTWORK_ALBUM, album_id, artwork_path, size,
+            cancellable, callback, args)
 
     def get_artist_artwork(self, artist_id, size, cancellable, callback, *args):
         '''
-        Makes a request for an artist image.
+        Makes a request for an artist image. Images found in the artwork
+        cache are read from the disk instead.
 
             * artist_id (int) - the ID of the artist for which to get an image.
             * callback - a function described in the http.AsyncRequest.
         '''
         artwork_path = ENDPOINT_ARTIST_ART.format(artist_id)
-        address = Euterpe.build_url(self._remote_address, artwork_path)
+        self._get_artwork(ARTWORK_ARTIST, artist_id, artwork_path, size,
+            cancellable, callback, args)
+
+    def _get_artwork(self, kind, item_id, artwork_path, size, cancellable,
+        callback, args):
+        cached = self._artwork_cache.lookup_image(self._remote_address, kind,
+            item_id, size)
+        if cached is not None:
+            cached.read_async(GLib.PRIORITY_LOW, cancellable,
+                self._on_cached_artwork_open, kind, item_id, artwork_path, size,
+                cancellable, callback, args)
+            return
+
+        self._download_artwork(kind, item_id, artwork_path, size, cancellable,
+            callback, args)
+
+    def _on_cached_artwork_open(self, file, res, kind, item_id, artwork_path,
+        size, cancellable, callback, args):
+        try:
+            stream = file.read_finish(res)
+        except GLib.Error as err:
+            if cancellable is not None and cancellable.is_cancelled():
+                callback(None, None, None, *args)
+                return
+
+            log.debug("reading cached artwork failed, downloading it: {}", err)
+            self._artwork_cache.remove_image(self._remote_address, kind, item_id)
+            self._download_artwork(kind, item_id, artwork_path, size,
+                cancellable, callback, args)
+            return
+
+        callback(200, stream, cancellable, *args)
+
+    def _download_artwork(self, kind, item_id, artwork_path, size, cancellable,
+        callback, args):
+        '''
+        Downloads an artwork image. Concurrent requests for the same image
+        share a single HTTP request. See ArtworkFlight.
+        '''
+        if cancellable is not None and cancellable.is_cancelled():
+            callback(None, None, None, *args)
+            return
+
+        server = self._remote_address
+        key = (server, kind, item_id, size)
+
+        flight = self._artwork_flights.get(key, None)
+        if flight is not None:
+            flight.subscribe(cancellable, callback, args)
+            return
+
+        flight = ArtworkFlight(partial(self._on_artwork_flight_abandoned, key))
+        flight.subscribe(cancellable, callback, args)
+        self._artwork_flights[key] = flight
+
+        address = Euterpe.build_url(server, artwork_path)
 
         if size == ArtworkSize.SMALL:
             address = "{}?size={}".format(address, 'small')
 
-        cb = TokenExpirationCallback(self, callback)
-        req = self._create_async_request(address, cancellable, cb, Priority.LOW)
-        req.get(*args)
+        cache_cb = partial(self._on_artwork_response, key=key, flight=flight)
+        cb = TokenExpirationCallback(self, cache_cb)
+        req = self._create_async_request(address, flight.get_cancellable(), cb,
+            Priority.LOW)
+        req.get()
+
+    def _on_artwork_flight_abandoned(self, key, flight):
+        if self._artwork_flights.get(key, None) is flight:
+            del self._artwork_flights[key]
+
+    def _on_artwork_response(self, status, body_stream, cancel, key=None,
+        flight=None):
+        '''
+        Reads the whole artwork response so that it could be stored in the
+        artwork cache and shared between all subscribers of the flight.
+        '''
+        if status != 200 or body_stream is None:
+            if body_stream is not None:
+                # Not reading the body would keep its connection busy.
+                body_stream.close_async(GLib.PRIORITY_LOW, None, None)
+            self._on_artwork_flight_abandoned(key, flight)
+            flight.finish(status, None)
+            return
+
+        out = Gio.MemoryOutputStream.new_resizable()
+        out.splice_async(
+            body_stream,
+            Gio.OutputStreamSpliceFlags.CLOSE_SOURCE |
+                Gio.OutputStreamSpliceFlags.CLOSE_TARGET,
+            GLib.PRIORITY_LOW,
+            cancel,
+            self._on_artwork_downloaded,
+            key, flight,
+        )
+
+    def _on_artwork_downloaded(self, out, res, key, flight):
+        self._on_artwork_flight_abandoned(key, flight)
+
+        try:
+            out.splice_finish(res)
+        except GLib.Error as err:
+            if not flight.get_cancellable().is_cancelled():
+                log.debug("reading artwork response failed: {}", err)
+            flight.finish(None, None)
+            return
+
+        data = out.steal_as_bytes()
+        server, kind, item_id, size = key
+        self._artwork_cache.store_image(server, kind, item_id, size, data)
+        flight.finish(200, data)
 
     def get_browse_uri(self, what, page=1, per_page=60, order_by="name", order="asc"):
         if what not in ['album', 'artist', 'song']:
@@ -338,6 +721,8 @@ class Euterpe(GObject.Object):
         '''
         artwork_path = ENDPOINT_ALBUM_ART.format(album_id)
         art_url = Euterpe.build_url(self._remote_address, artwork_path)
+        callback = self._invalidate_artwork_callback(ARTWORK_ALBUM, album_id,
+            callback)
 
         mtype, encoding = mimetypes.guess_type(file_name)
         if mtype is None:
@@ -361,6 +746,8 @@ class Euterpe(GObject.Object):
         '''
         artwork_path = ENDPOINT_ARTIST_ART.format(artist_id)
         art_url = Euterpe.build_url(self._remote_address, artwork_path)
+        callback = self._invalidate_artwork_callback(ARTWORK_ARTIST, artist_id,
+            callback)
 
         mtype, encoding = mimetypes.guess_type(file_name)
         if mtype is None:
@@ -370,6 +757,19 @@ class Euterpe(GObject.Object):
         file.read_async(GLib.PRIORITY_HIGH, cancellable, self._on_image_open,
             art_url, cancellable, callback, mtype, args)
 
+    def _invalidate_artwork_callback(self, kind, item_id, callback):
+        '''
+        Wraps callback so that the cached images for this item are removed
+        once the upload of a new image finishes.
+        '''
+        server = self._remote_address
+
+        def wrapped(*args):
+            self._artwork_cache.remove_image(server, kind, item_id)
+            callback(*args)
+
+        return wrapped
+
     def _on_image_open(self, obj, res, art_url, cancellable, callback, mtype, args):
         image_stream = obj.read_finish(res)
         if image_stream is None:
@@ -393,12 +793,60 @@ class Euterpe(GObject.Object):
 
         req.put(mtype, image_data, *args)
 
-    def _create_request(self, address, callback):
+    def _get_json(self, address, callback, args=(), priority=Priority.NORMAL,
+            cancellable=None, revalidate=False):
+        '''
+        Makes a GET request for `address` and calls the callback with the
+        HTTP status, the decoded JSON body and `args`.
+
+        GET requests are idempotent. So while one for the same address is in
+        flight later callers join it instead of making another one and
+        they all receive the same decoded body. See JSONFlight.
+        '''
+        if cancellable is not None and cancellable.is_cancelled():
+            # An already cancelled subscriber would never be notified by the
+            # flight and would keep it going.
+            callback(None, None, *args)
+            return
+
+        key = (address, self._token)
+        flight = self._json_flights.get(key, None)
+        if flight is not None:
+            log.debug("joining request in flight for {}", address)
+            flight.subscribe(cancellable, callback, args)
+            return
+
+        flight = JSONFlight(partial(self._on_json_flight_abandoned, key))
+        flight.subscribe(cancellable, callback, args)
+        self._json_flights[key] = flight
+
+        cb = TokenExpirationCallback(self, JSONBodyCallback(
+            partial(self._on_json_flight_done, key, flight),
+        ))
+        req = self._create_request(address, cb, priority,
+            flight.get_cancellable(), revalidate)
+        req.get()
+
+    def _on_json_flight_abandoned(self, key, flight):
+        if self._json_flights.get(key, None) is flight:
+            del self._json_flights[key]
+
+    def _on_json_flight_done(self, key, flight, status, body):
+        self._on_json_flight_abandoned(key, flight)
+        flight.finish(status, body)
+
+    def _create_request(self, address, callback, priority=Priority.NORMAL,
+            cancellable=None, revalidate=False):
         '''
         Creates a request which body will be read fully before the callback
         is called.
+
+        Requests which are a direct result of user interaction and the user
+        waits on them should use Priority.HIGH. GET requests for data which
+        rarely changes should use `revalidate`.
         '''
-        req = Request(address, callback)
+        req = Request(address, callback, priority=priority,
+            cancellable=cancellable, revalidate=revalidate)
         req.set_header("User-Agent", self._user_agent)
         if self._token is not None:
             req.set_header("Authorization", "Bearer {}".format(self._token))
@@ -416,6 +864,18 @@ class Euterpe(GObject.Object):
             req.set_header("Authorization", "Bearer {}".format(self._token))
         return req
 
+    def download_track(self, track_id, cancellable, callback, *args):
+        '''
+        Makes a low priority request for the file of a track.
+
+            * track_id (int) - the ID of the track which will be downloaded.
+            * callback - a function described in the http.AsyncRequest.
+        '''
+        cb = TokenExpirationCallback(self, callback)
+        req = self._create_async_request(self.get_track_url(track_id),
+            cancellable, cb, Priority.LOW)
+        req.get(*args)
+
     def get_track_url(self, track_id):
         return Euterpe.build_url(
             self._remote_address,
@@ -433,6 +893,11 @@ class JSONBodyCallback:
         self._callback = callback
 
     def __call__(self, status, body, *args):
+        if body is None:
+            # The request failed or was cancelled before there was a body.
+            self._callback(status, None, *args)
+            return
+
         try:
             responseJSON = json.loads(body)
         except Exception as err:
@@ -444,6 +909,112 @@ class JSONBodyCallback:
             self._callback(status, responseJSON, *args)
 
 
+class Flight:
+    '''
+    Flight is a single request shared by many subscribers. Each subscriber
+    has its own Gio.Cancellable. A cancelled subscriber is notified
+    immediately and dropped from the flight. The request itself is cancelled
+    only when there are no subscribers left.
+
+    Subclasses decide what each subscriber receives with `_deliver`.
+    '''
+
+    def __init__(self, on_abandoned):
+        self._cancellable = Gio.Cancellable.new()
+        self._subscribers = []
+        self._on_abandoned = on_abandoned
+
+    def get_cancellable(self):
+        return self._cancellable
+
+    def subscribe(self, cancellable, callback, args):
+        sub = [cancellable, callback, args, None]
+        if cancellable is not None:
+            # Gio.Cancellable.connect is g_cancellable_connect and shadows the
+            # GObject method for connecting to signals.
+            sub[3] = GObject.Object.connect(
+                cancellable,
+                "cancelled",
+                self._on_subscriber_cancelled,
+                sub,
+            )
+        self._subscribers.append(sub)
+
+    def finish(self, status, data):
+        '''
+        Calls every subscriber with `status` and `data`.
+        '''
+        subscribers = self._subscribers
+        self._subscribers = []
+
+        if data is None and status == 200:
+            status = None
+
+        for cancellable, callback, args, handler_id in subscribers:
+            if handler_id is not None:
+                cancellable.handler_disconnect(handler_id)
+
+            try:
+                self._deliver(callback, status, data, cancellable, args)
+            except Exception:
+                sys.excepthook(*sys.exc_info())
+
+    def _deliver(self, callback, status, data, cancellable, args):
+        raise NotImplementedError()
+
+    def _on_subscriber_cancelled(self, cancellable, sub):
+        remaining = [s for s in self._subscribers if s is not sub]
+        if len(remaining) == len(self._subscribers):
+            return
+
+        self._subscribers = remaining
+        GLib.idle_add(self._notify_cancelled, sub)
+
+        if len(self._subscribers) == 0:
+            self._on_abandoned(self)
+            self._cancellable.cancel()
+
+    def _notify_cancelled(self, sub):
+        cancellable, callback, args, handler_id = sub
+        cancellable.handler_disconnect(handler_id)
+        try:
+            self._deliver(callback, None, None, None, args)
+        except Exception:
+            sys.excepthook(*sys.exc_info())
+        return False
+
+
+class ArtworkFlight(Flight):
+    '''
+    ArtworkFlight is a single artwork download shared by many subscribers.
+
+    Subscriber callbacks are the same as the ones described in the
+    http.AsyncRequest. Each of them receives its own input stream reading
+    the artwork (GLib.Bytes). When there is no artwork subscribers get None
+    as stream.
+    '''
+
+    def _deliver(self, callback, status, data, cancellable, args):
+        stream = None
+        if data is not None:
+            stream = Gio.MemoryInputStream.new_from_bytes(data)
+        callback(status, stream, cancellable, *args)
+
+
+class JSONFlight(Flight):
+    '''
+    JSONFlight is a single JSON GET request shared by many subscribers.
+    The body is decoded once and every subscriber receives the same object.
+    Subscribers must not change it.
+
+    Subscriber callbacks receive the HTTP status, the decoded body and the
+    arguments they subscribed with.
+    '''
+
+    def _deliver(self, callback, status, data, cancellable, args):
+        callback(status, data, *args)
+
+
 class TokenExpirationCallback:
     '''
     An http.Request callback which will wrap the passed callback
@@ -467,6 +1038,10 @@ class ArtworkSize(Enum):
     SMALL = 'small'
 
 
+ARTWORK_ALBUM = 'album'
+ARTWORK_ARTIST = 'artist'
+
+
 ENDPOINT_LOGIN = '/v1/login/token/'
 ENDPOINT_REGISTER_TOKEN = '/v1/register/token/'
 ENDPOINT_SEARCH = '/v1/search/'
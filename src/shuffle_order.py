@@ -0,0 +1,167 @@
+# shuffle_order.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+
+
+class ShuffleOrder:
+    '''
+    ShuffleOrder is a random permutation of the playlist indexes which
+    the player follows when shuffle is on. Every track is played once
+    before any of them is played again.
+
+    The permutation is split at the current position. Everything before it
+    is the shuffle history and everything after it is yet to be played.
+    Moving forward and backward in it is O(1).
+    '''
+
+    def __init__(self):
+        self._order = []
+        # Maps a playlist index to its position in self._order.
+        self._positions = []
+        self._position = 0
+
+    def reset(self, length, first=None):
+        '''
+        Creates a new permutation of `length` playlist indexes. When `first`
+        is given it is the first index of the permutation. Used for the track
+        which is playing when shuffle is turned on.
+        '''
+        self._order = list(range(length))
+        random.shuffle(self._order)
+        self._position = 0
+        self._update_positions()
+
+        if first is not None and 0 <= first < length:
+            self._swap(0, self._positions[first])
+
+    def extend(self, count):
+        '''
+        Adds `count` new playlist indexes after the current last one. Each of
+        them is put at a random place among the tracks not yet played.
+        '''
+        for _ in range(count):
+            index = len(self._order)
+            self._order.append(index)
+            self._positions.append(index)
+            # Fisher-Yates step restricted to the part after the current
+            # position so that the history stays as it is.
+            start = min(self._position + 1, index)
+            self._swap(index, random.randint(start, index))
+
+    def index_after(self, index, wrap=False):
+        '''
+        Returns the playlist index which follows `index` in the permutation
+        or None when `index` is the last one. With `wrap` the first index is
+        returned in that case.
+        '''
+        pos = self._position_of(index)
+        if pos is None:
+            return None
+
+        if pos + 1 < len(self._order):
+            return self._order[pos + 1]
+
+        if wrap and len(self._order) > 0:
+            return self._order[0]
+
+        return None
+
+    def index_before(self, index):
+        '''
+        Returns the playlist index played before `index` or None when there
+        is no such index.
+        '''
+        pos = self._position_of(index)
+        if pos is None or pos == 0:
+            return None
+
+        return self._order[pos - 1]
+
+    def select(self, index):
+        '''
+        Makes `index` the current one. Indexes from the history are just
+        returned to. Any other index is moved right after the current position
+        so that it becomes part of the history and the previous tracks could
+        still be walked back.
+        '''
+        pos = self._position_of(index)
+        if pos is None:
+            return
+
+        if pos > self._position + 1:
+            self._swap(pos, self._position + 1)
+            pos = self._position + 1
+
+        self._position = pos
+
+    def has_after(self, index):
+        return self.index_after(index) is not None
+
+    def has_before(self, index):
+        return self.index_before(index) is not None
+
+    def get_state(self):
+        '''
+        Returns a JSON serializable value from which the order could be
+        restored with `restore`.
+        '''
+        return {
+            "order": self._order[:],
+            "position": self._position,
+        }
+
+    def restore(self, state, length):
+        '''
+        Restores the order from the result of `get_state`. Returns False and
+        leaves the order unchanged when `state` is not a permutation of
+        `length` indexes.
+        '''
+        if not isinstance(state, dict):
+            return False
+
+        order = state.get("order")
+        position = state.get("position")
+        if not isinstance(order, list) or not isinstance(position, int):
+            return False
+
+        if sorted(order) != list(range(length)):
+            return False
+
+        if length > 0 and not 0 <= position < length:
+            return False
+
+        self._order = order[:]
+        self._position = position
+        self._update_positions()
+        return True
+
+    def _position_of(self, index):
+        if index is None or not 0 <= index < len(self._positions):
+            return None
+        return self._positions[index]
+
+    def _swap(self, a, b):
+        order = self._order
+        order[a], order[b] = order[b], order[a]
+        self._positions[order[a]] = a
+        self._positions[order[b]] = b
+
+    def _update_positions(self):
+        self._positions = [0] * len(self._order)
+        for pos, index in enumerate(self._order):
+            self._positions[index] = pos
@@ -44,6 +44,21 @@ def state_file_name():
     return os.path.join(state_dir, 'euterpe.state')
 
 
+def catalog_file_name():
+    data_dir = GLib.get_user_data_dir()
+    return os.path.join(data_dir, 'euterpe-gtk', 'catalog.sqlite')
+
+
+def artwork_cache_dir():
+    cache_dir = GLib.get_user_cache_dir()
+    return os.path.join(cache_dir, 'euterpe-gtk', 'artwork')
+
+
+def audio_cache_dir():
+    cache_dir = GLib.get_user_cache_dir()
+    return os.path.join(cache_dir, 'euterpe-gtk', 'tracks')
+
+
 def format_duration(milliseconds):
     '''
         Accepts duration in milliseconds and returns a string
@@ -19,6 +19,7 @@ from gi.repository import GObject, Gtk, Gio, GLib
 from euterpe_gtk.widgets.track import EuterpeTrack, PLAY_BUTTON_CLICKED, APPEND_BUTTON_CLICKED
 from euterpe_gtk.widgets.add_to_playlist import AddToPlaylist
 from euterpe_gtk.async_artwork import AsyncArtwork
+from euterpe_gtk.chunked_populator import ChunkedPopulator
 import euterpe_gtk.log as log
 
 
@@ -51,14 +52,12 @@ class EuterpeAlbum(Gtk.Viewport):
         self._album_tracks = []
         self._cancel_upload = None
 
-        album_name = album.get("album", "Unknown")
-
         self.album_name.set_label(album.get("album", "Unknown"))
         self.artist_info.set_label("ALBUM BY {}".format(
             album.get("artist", "Unknown").upper()
         ))
 
-        app.get_euterpe().search(album_name, self._on_search_result)
+        app.get_euterpe().get_album_tracks(album, self._on_album_tracks)
         self.play_button.connect(
             "clicked",
             self._on_play_button
@@ -83,6 +82,7 @@ class EuterpeAlbum(Gtk.Viewport):
                 GObject.BindingFlags.INVERT_BOOLEAN
             )
 
+        self._populator = ChunkedPopulator(self, "album tracks")
         self.connect("unrealize", self._on_unrealize)
         self._init_artwork(album)
         self.connect("destroy", self._on_destroy)
@@ -164,7 +164,7 @@ class EuterpeAlbum(Gtk.Viewport):
                 message = "{} {}".format(message, body)
             self.show_notification(message)
 
-    def _on_search_result(self, status, body, query):
+    def _on_album_tracks(self, status, tracks, album_id):
         self.track_list.foreach(self.track_list.remove)
 
         if status != 200:
@@ -178,31 +178,22 @@ class EuterpeAlbum(Gtk.Viewport):
             label.show()
             return
 
-        album_tracks = []
-        for track in body:
-            if track["album_id"] != self._album["album_id"]:
-                continue
-            album_tracks.append(track)
-
-        if len(album_tracks) == 0:
+        if len(tracks) == 0:
             label = Gtk.Label.new()
             label.set_text("No tracks found.")
             self.track_list.add(label)
             label.show()
             return
 
-        self._album_tracks = sorted(
-            album_tracks,
-            key=lambda t: t["track"],
-        )
+        self._album_tracks = tracks
+
+        self._populator.populate(self._album_tracks, self._add_track)
 
-        for track in self._album_tracks:
-            tr_obj = EuterpeTrack(track)
-            self.track_list.add(tr_obj)
-            tr_obj.connect(PLAY_BUTTON_CLICKED, self.on_track_play_clicked)
-            tr_obj.connect(APPEND_BUTTON_CLICKED, self.on_track_append_clicked)
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
+    def _add_track(self, track):
+        tr_obj = EuterpeTrack(track)
+        self.track_list.add(tr_obj)
+        tr_obj.connect(PLAY_BUTTON_CLICKED, self.on_track_play_clicked)
+        tr_obj.connect(APPEND_BUTTON_CLICKED, self.on_track_append_clicked)
 
     def on_track_play_clicked(self, track_widget):
         track = track_widget.get_track()
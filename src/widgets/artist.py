@@ -20,6 +20,7 @@ from euterpe_gtk.widgets.track import EuterpeTrack
 from euterpe_gtk.widgets.small_album import EuterpeSmallAlbum
 from euterpe_gtk.widgets.album import EuterpeAlbum
 from euterpe_gtk.async_artwork import AsyncArtwork
+from euterpe_gtk.chunked_populator import ChunkedPopulator
 import euterpe_gtk.log as log
 
 
@@ -61,7 +62,8 @@ class EuterpeArtist(Gtk.Viewport):
             self._on_set_artist_image
         )
 
-        win.get_euterpe().search(artist_name, self._on_search_result)
+        self._populator = ChunkedPopulator(self, "artist albums")
+        win.get_euterpe().get_artist_albums(artist, self._on_artist_albums)
         self.connect("unrealize", self._on_unrealize)
         self._init_artwork(artist)
         self.connect("destroy", self._on_destroy)
@@ -78,7 +80,7 @@ class EuterpeArtist(Gtk.Viewport):
     def _on_destroy(self, *args):
         self._artwork_loader.cancel()
 
-    def _on_search_result(self, status, body, query):
+    def _on_artist_albums(self, status, albums, artist_id):
         self.album_list.foreach(self.album_list.remove)
 
         if status != 200:
@@ -92,33 +94,19 @@ class EuterpeArtist(Gtk.Viewport):
             label.show()
             return
 
-        artist_albums = {}
-        for track in body:
-            if track["artist_id"] != self._artist["artist_id"]:
-                continue
-            if track["album_id"] in artist_albums:
-                continue
-
-            artist_albums[track["album_id"]] = {
-                "artist": track["artist"],
-                "artist_id": track["artist_id"],
-                "album": track["album"],
-                "album_id": track["album_id"],
-            }
-
-        if len(artist_albums) == 0:
+        if len(albums) == 0:
             label = Gtk.Label.new()
             label.set_text("No albums found.")
             self.album_list.add(label)
             label.show()
             return
 
-        for _, album in artist_albums.items():
-            alb_obj = EuterpeSmallAlbum(album)
-            self.album_list.add(alb_obj)
-            alb_obj.connect("button-next-clicked", self.on_on_album_clicked)
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
+        self._populator.populate(albums, self._add_album)
+
+    def _add_album(self, album):
+        alb_obj = EuterpeSmallAlbum(album)
+        self.album_list.add(alb_obj)
+        alb_obj.connect("button-next-clicked", self.on_on_album_clicked)
 
     def on_on_album_clicked(self, album_widget):
         album_dict = album_widget.get_album()
@@ -26,6 +26,7 @@ from euterpe_gtk.widgets.image_card import EuterpeImageCard
 from euterpe_gtk.widgets.carousel_item import EuterpeCarouselItem
 from euterpe_gtk.widgets.track import EuterpeTrack, PLAY_BUTTON_CLICKED, APPEND_BUTTON_CLICKED
 from euterpe_gtk.navigator import Navigator
+from euterpe_gtk.chunked_populator import ChunkedPopulator
 import euterpe_gtk.log as log
 
 
@@ -104,6 +105,15 @@ class EuterpeBrowseScreen(Gtk.Viewport):
 
         self._nav = Navigator(self.browse_stack, self.browse_main)
         self._mapped = False
+        self._random_albums_populator = ChunkedPopulator(self, "random albums")
+        self._frequent_albums_populator = ChunkedPopulator(
+            self,
+            "frequently played albums",
+        )
+        self._frequent_songs_populator = ChunkedPopulator(
+            self,
+            "frequently played songs",
+        )
         self.connect(
             "map",
             self._on_mapped
@@ -145,6 +155,7 @@ class EuterpeBrowseScreen(Gtk.Viewport):
         )
 
     def _refresh_frequent_albums(self, *args):
+        self._frequent_albums_populator.cancel()
         self.frequently_played_albums.foreach(
             self.frequently_played_albums.remove
         )
@@ -156,6 +167,7 @@ class EuterpeBrowseScreen(Gtk.Viewport):
         )
 
     def _refresh_frequent_songs(self, *args):
+        self._frequent_songs_populator.cancel()
         self.frequently_played_songs.foreach(
             self.frequently_played_songs.remove
         )
@@ -211,13 +223,18 @@ class EuterpeBrowseScreen(Gtk.Viewport):
             self.random_albums.remove
         )
 
-        for album in albums:
-            album_widget = EuterpeCarouselItem(album=album)
-            album_widget.connect("clicked", self._on_album_click)
-            self.random_albums.add(album_widget)
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
+        self._random_albums_populator.populate(
+            albums,
+            self._add_carousel_album,
+            self._add_carousel_refresh,
+        )
 
+    def _add_carousel_album(self, album):
+        album_widget = EuterpeCarouselItem(album=album)
+        album_widget.connect("clicked", self._on_album_click)
+        self.random_albums.add(album_widget)
+
+    def _add_carousel_refresh(self):
         refresh = EuterpeCarouselItem(
             title="New Random",
             desc="Get a new set of random albums",
@@ -254,12 +271,12 @@ class EuterpeBrowseScreen(Gtk.Viewport):
             self.frequently_played_albums.remove
         )
 
-        for album in albums:
-            album_widget = EuterpeBoxAlbum(album)
-            album_widget.connect("clicked", self._on_album_click)
-            self.frequently_played_albums.add(album_widget)
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
+        self._frequent_albums_populator.populate(
+            albums,
+            lambda album: self.frequently_played_albums.add(
+                self._create_album_widget(album)
+            ),
+        )
 
     def _on_frequently_played_songs_callback(self, status, body):
         self.frequently_played_songs_spinner.stop()
@@ -289,11 +306,12 @@ class EuterpeBrowseScreen(Gtk.Viewport):
             self.frequently_played_songs.remove
         )
 
-        for song in songs:
-            song_widget = self._create_song_widget(song)
-            self.frequently_played_songs.add(song_widget)
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
+        self._frequent_songs_populator.populate(
+            songs,
+            lambda song: self.frequently_played_songs.add(
+                self._create_song_widget(song)
+            ),
+        )
 
     def _on_browse_songs_button(self, btn):
         app = self._win.get_application()
@@ -16,80 +16,151 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from gi.repository import GObject, Gtk, GLib
-from euterpe_gtk.utils import emit_signal
-from euterpe_gtk.widgets.entry import EuterpeEntry
-from functools import partial
+from euterpe_gtk.utils import emit_signal, format_duration
 
 
 SIGNAL_TRACK_CLICKED = "track-clicked"
 
+# Inserting more rows than this at once is done with the model detached from
+# the view so that the view does not update for every one of them.
+DETACH_MODEL_ROWS = 100
+
 
 @Gtk.Template(resource_path='/com/doycho/euterpe/gtk/ui/entry-list.ui')
 class EuterpeEntryList(Gtk.ScrolledWindow):
+    '''
+    EuterpeEntryList shows a list of songs. It is backed by a list store and
+    a tree view which draws only the rows which are visible. So it works
+    the same for a few songs and for tens of thousands of them.
+    '''
     __gtype_name__ = 'EuterpeEntryList'
 
     __gsignals__ = {
         SIGNAL_TRACK_CLICKED: (GObject.SignalFlags.RUN_FIRST, None, (int,)),
     }
 
-    entry_container = Gtk.Template.Child()
+    entry_view = Gtk.Template.Child()
+    entry_store = Gtk.Template.Child()
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self._songs = []
         self._current_song = None
-        self._vadj = self.get_vadjustment()
+        self.entry_view.connect("row-activated", self._on_row_activated)
 
     def add(self, song):
-        if not isinstance(song, dict):
-            raise ValueError("only songs allowed to be added")
-        song_widget = EuterpeEntry(song)
-        self._songs.append(song_widget)
-        song_index = len(self._songs) - 1
-        song_widget.connect(
-            "clicked",
-            partial(self._on_track_clicked, song_index)
-        )
-
-        self.entry_container.add(song_widget)
+        self.insert(self.get_size(), [song])
+
+    def insert(self, position, songs):
+        '''
+        Inserts `songs` (a list of song dicts) before `position`.
+        '''
+        store = self.entry_store
+        detach = len(songs) > DETACH_MODEL_ROWS
+        if detach:
+            self.entry_view.set_model(None)
+
+        for offset, song in enumerate(songs):
+            if not isinstance(song, dict):
+                raise ValueError("only songs allowed to be added")
+            store.insert_with_valuesv(
+                position + offset,
+                [0, 1],
+                [_format_description(song), _format_time(song)],
+            )
+
+        if detach:
+            self.entry_view.set_model(store)
+
+        if self._current_song is not None and self._current_song >= position:
+            self._current_song += len(songs)
+        self._show_current()
+
+    def remove(self, position, count):
+        '''
+        Removes `count` songs starting from `position`.
+        '''
+        store = self.entry_store
+        count = min(count, self.get_size() - position)
+        if count <= 0:
+            return
+
+        if count == self.get_size():
+            self.truncate()
+            return
+
+        for _ in range(count):
+            store.remove(store.iter_nth_child(None, position))
+
+        current = self._current_song
+        if current is not None and current >= position + count:
+            self._current_song -= count
+        elif current is not None and current >= position:
+            self._current_song = None
+        self._show_current()
+
+    def get_size(self):
+        '''
+        Returns the number of songs in the list.
+        '''
+        return self.entry_store.iter_n_children(None)
 
     def truncate(self):
-        self._songs = []
+        self.entry_store.clear()
         self._current_song = None
-        for child in self.entry_container.get_children():
-            child.destroy()
 
     def set_currently_playing(self, index):
-        if self._current_song is not None:
-            self._current_song.set_relief(Gtk.ReliefStyle.NONE)
-            self._current_song = None
+        if index is not None and (index < 0 or index >= self.get_size()):
+            index = None
 
-        if index is None:
+        self._current_song = index
+        self._show_current()
+
+        if index is not None:
+            GLib.idle_add(self.scroll_to, index)
+
+    def _show_current(self):
+        selection = self.entry_view.get_selection()
+        if self._current_song is None:
+            selection.unselect_all()
             return
+        selection.select_path(Gtk.TreePath.new_from_indices([self._current_song]))
 
-        if len(self._songs) == 0 or index < 0 or index >= len(self._songs):
+    def _on_row_activated(self, view, path, column):
+        emit_signal(self, SIGNAL_TRACK_CLICKED, path.get_indices()[0])
+
+    def scroll_to(self, index):
+        if index >= self.get_size():
             return
 
-        song_widget = self._songs[index]
-        self._current_song = song_widget
-        song_widget.set_relief(Gtk.ReliefStyle.NORMAL)
-        GLib.idle_add(self.scroll_to, song_widget)
+        path = Gtk.TreePath.new_from_indices([index])
+        visible = self.entry_view.get_visible_range()
+        if visible is not None:
+            start, end = visible
+            if start.compare(path) <= 0 and path.compare(end) < 0:
+                return
 
-    def _on_track_clicked(self, index, *args):
-        emit_signal(self, SIGNAL_TRACK_CLICKED, index)
+        self.entry_view.scroll_to_cell(path, None, False, 0, 0)
 
-    def scroll_to(self, widget):
-        coords = widget.translate_coordinates(self.entry_container, 0, 0)
-        if coords is None:
-            return
 
-        _wleft, wtop = coords
-        wbottom = wtop + widget.get_allocation().height * 2
+def _format_description(song):
+    title = GLib.markup_escape_text(song.get("title", None) or "")
+
+    track_info = []
+
+    artist = song.get("artist", None)
+    if artist is not None:
+        track_info.append(artist)
+
+    album = song.get("album", None)
+    if album is not None:
+        track_info.append(album)
+
+    info = GLib.markup_escape_text(", ".join(track_info))
+    return '<b>{}</b>\n<span alpha="55%">{}</span>'.format(title, info)
 
-        top = self._vadj.get_value()
-        bottom = top + self._vadj.get_page_size()
 
-        if wtop < top:
-            self._vadj.set_value(wtop)
-        elif wbottom > bottom:
-            self._vadj.set_value(wbottom - self._vadj.get_page_size())
+def _format_time(song):
+    duration = song.get("duration", None)
+    if duration is None:
+        return ""
+    return format_duration(duration)
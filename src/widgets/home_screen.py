@@ -16,6 +16,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import time
 
+from functools import partial
 from gi.repository import GObject, Gtk, Gio
 from euterpe_gtk.utils import emit_signal
 from euterpe_gtk.ring_list import RingList
@@ -26,6 +27,7 @@ from euterpe_gtk.widgets.artist import EuterpeArtist
 from euterpe_gtk.navigator import Navigator
 from euterpe_gtk.player import SIGNAL_TRACK_CHANGED
 from euterpe_gtk.widgets.paginated_box_list import PaginatedBoxList
+from euterpe_gtk.chunked_populator import ChunkedPopulator
 
 import euterpe_gtk.log as log
 
@@ -84,6 +86,23 @@ class EuterpeHomeScreen(Gtk.Viewport):
 
         self._nav = Navigator(self.screen_stack, self.main_screen)
 
+        self._added_artists_populator = ChunkedPopulator(
+            self,
+            "recently added artists",
+        )
+        self._added_albums_populator = ChunkedPopulator(
+            self,
+            "recently added albums",
+        )
+        self._listened_artists_populator = ChunkedPopulator(
+            self,
+            "recently listened to artists",
+        )
+        self._listened_albums_populator = ChunkedPopulator(
+            self,
+            "recently listened to albums",
+        )
+
         self.connect(
             SIGNAL_ADDED_ALBUMS_RESTORED,
             self._on_state_added_albums,
@@ -141,12 +160,10 @@ class EuterpeHomeScreen(Gtk.Viewport):
             self.recently_added_artists.remove
         )
 
-        for artist in self._recently_added_artists:
-            artist_widget = EuterpeBoxArtist(artist)
-            artist_widget.connect("clicked", self._on_artist_click)
-            self.recently_added_artists.add(artist_widget)
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
+        self._added_artists_populator.populate(
+            self._recently_added_artists,
+            partial(self._add_artist, self.recently_added_artists, {}),
+        )
 
     def _on_state_added_albums(self, *args):
         if len(self._recently_added_albums) < 1:
@@ -157,12 +174,10 @@ class EuterpeHomeScreen(Gtk.Viewport):
             self.recently_added_albums.remove
         )
 
-        for album in self._recently_added_albums:
-            album_widget = EuterpeBoxAlbum(album)
-            album_widget.connect("clicked", self._on_album_click)
-            self.recently_added_albums.add(album_widget)
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
+        self._added_albums_populator.populate(
+            self._recently_added_albums,
+            partial(self._add_album, self.recently_added_albums, {}),
+        )
 
     def _on_track_changed(self, *args):
         track = self._player.get_track_info()
@@ -197,20 +212,27 @@ class EuterpeHomeScreen(Gtk.Viewport):
         rc = RemovedAlbumCache(self.recently_listened_to_albums, album_boxes)
         self.recently_listened_to_albums.foreach(rc.remove_and_store)
 
-        for album in albums_list:
-            album_id = album.get("album_id", None)
-            album_widget = None
+        self._listened_albums_populator.populate(
+            albums_list,
+            partial(self._add_album, self.recently_listened_to_albums,
+                album_boxes),
+        )
 
-            if album_id is not None and album_id in album_boxes:
-                album_widget = album_boxes[album_id]
-            else:
-                album_widget = EuterpeBoxAlbum(album)
-                album_widget.connect("clicked", self._on_album_click)
+    def _add_album(self, container, album_boxes, album):
+        '''
+        Adds a box for `album` to `container`. It reuses the box from
+        `album_boxes` when there is one for this album.
+        '''
+        album_id = album.get("album_id", None)
+        album_widget = None
 
-            self.recently_listened_to_albums.add(album_widget)
+        if album_id is not None and album_id in album_boxes:
+            album_widget = album_boxes[album_id]
+        else:
+            album_widget = EuterpeBoxAlbum(album)
+            album_widget.connect("clicked", self._on_album_click)
 
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
+        container.add(album_widget)
 
     def _on_recently_listened_to_artists_changed(self, *args):
         artists_list = self._recently_listened_artists.list()
@@ -223,20 +245,27 @@ class EuterpeHomeScreen(Gtk.Viewport):
         rc = RemovedArtistCache(self.recently_listened_to_artists, artist_boxes)
         self.recently_listened_to_artists.foreach(rc.remove_and_store)
 
-        for artist in artists_list:
-            artist_id = artist.get("artist_id", None)
-            artist_widget = None
+        self._listened_artists_populator.populate(
+            artists_list,
+            partial(self._add_artist, self.recently_listened_to_artists,
+                artist_boxes),
+        )
 
-            if artist_id is not None and artist_id in artist_boxes:
-                artist_widget = artist_boxes[artist_id]
-            else:
-                artist_widget = EuterpeBoxArtist(artist)
-                artist_widget.connect("clicked", self._on_artist_click)
+    def _add_artist(self, container, artist_boxes, artist):
+        '''
+        Adds a box for `artist` to `container`. It reuses the box from
+        `artist_boxes` when there is one for this artist.
+        '''
+        artist_id = artist.get("artist_id", None)
+        artist_widget = None
 
-            self.recently_listened_to_artists.add(artist_widget)
+        if artist_id is not None and artist_id in artist_boxes:
+            artist_widget = artist_boxes[artist_id]
+        else:
+            artist_widget = EuterpeBoxArtist(artist)
+            artist_widget.connect("clicked", self._on_artist_click)
 
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
+        container.add(artist_widget)
 
     def get_nav(self):
         return self._nav
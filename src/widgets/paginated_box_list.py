@@ -17,9 +17,23 @@
 
 from gi.repository import GObject, Gtk, GLib
 
+import itertools
 import urllib.parse
+from functools import partial
+from euterpe_gtk.chunked_populator import ChunkedPopulator
+from euterpe_gtk.lru_cache import LRUCache
 import euterpe_gtk.log as log
 
+# Number of seconds for which a browse page is shown from the page cache.
+PAGE_CACHE_TTL = 10 * 60
+
+# Maximum number of browse pages kept in the page cache.
+PAGE_CACHE_MAX_PAGES = 50
+
+# In infinite scroll mode at most this many pages have widgets at the same
+# time. Pages furthest from the scrolled position are removed first.
+MAX_RESIDENT_PAGES = 4
+
 
 @Gtk.Template(resource_path='/com/doycho/euterpe/gtk/ui/paginated-box-list.ui')
 class PaginatedBoxList(Gtk.ScrolledWindow):
@@ -49,6 +63,7 @@ class PaginatedBoxList(Gtk.ScrolledWindow):
     sorting_direction_select = Gtk.Template.Child()
     sort_type_row = Gtk.Template.Child()
     sort_direction_row = Gtk.Template.Child()
+    infinite_scroll_switch = Gtk.Template.Child()
     browse_settings_button = Gtk.Template.Child()
     header_box = Gtk.Template.Child()
 
@@ -60,12 +75,23 @@ class PaginatedBoxList(Gtk.ScrolledWindow):
         self._cfg_store = app.get_cache_store()
         self._create_item_func = create_item_func
         self._widgets_created = False
-        self._removed = False
+        self._populator = ChunkedPopulator(self, "{} list".format(list_type))
 
         self._next_page = None
         self._previous_page = None
         self._current_page = 1
         self._pages_count = None
+        # Incremented for every page load so that responses for pages
+        # which are not wanted anymore could be ignored.
+        self._page_request_id = 0
+
+        # Pages which have widgets in infinite scroll mode, in list order.
+        self._resident_pages = []
+        self._loading_more = False
+        # A widget which keeps its place on the screen while pages are
+        # added or removed above it. See _on_flow_allocated.
+        self._scroll_anchor = None
+        self._scroll_anchor_y = None
 
         if self._list_type == "song":
             self.flow_container.props.max_children_per_line = 1
@@ -158,6 +184,16 @@ class PaginatedBoxList(Gtk.ScrolledWindow):
 
         self.header_box.set_center_widget(self.title)
 
+        self._infinite = self._browse_cfg.get("infinite_scroll", False) is True
+        self.infinite_scroll_switch.set_active(self._infinite)
+        self._show_page_buttons(not self._infinite)
+        self.infinite_scroll_switch.connect(
+            "notify::active",
+            self._on_infinite_scroll_toggled
+        )
+        self.get_vadjustment().connect("value-changed", self._maybe_load_more)
+        self.flow_container.connect("size-allocate", self._on_flow_allocated)
+
     def _store_config(self):
         """
         Stores the config for browsing into the configuration storage object which
@@ -180,15 +216,18 @@ class PaginatedBoxList(Gtk.ScrolledWindow):
         return self._browse_cfg.get("order", self._default_order)
 
     def refresh(self):
-        self.show_loading()
-        self._remove_items()
+        '''
+        Loads the current page again from the server. Cached pages of this
+        list type are dropped since they are likely to be stale as well.
+        '''
+        list_key = (self._euterpe.get_address(), self._list_type)
+        _page_cache.remove_if(lambda key: key[:2] == list_key)
 
         current_page = self._current_page
         if not isinstance(current_page, int):
             current_page = 1
 
-        uri = self._get_new_page_uri(page=current_page)
-        self._euterpe.make_request(uri, self._on_browse_result_callback)
+        self._load_page(current_page)
 
     def _get_new_page_uri(self, page=1):
         if self._list_type == "playlist":
@@ -205,30 +244,102 @@ class PaginatedBoxList(Gtk.ScrolledWindow):
             return
 
         self._widgets_created = True
+        self._load_page(1)
+
+    def _load_page(self, page, uri=None):
+        '''
+        Shows `page` of the list. Pages found in the page cache are shown
+        right away and then revalidated with the server in the background.
+        Other pages are requested from the server. When `uri` is given it
+        is used for the request instead of building a new one. Such as the
+        "next" address from the previous page. `page` is None when the page
+        number is not known.
+        '''
+        if uri is None:
+            uri = self._get_new_page_uri(page=page)
+        if uri is None:
+            log.debug("the returned browse_url address was None, not loading page {}", page)
+            return
 
-        self.show_loading()
         self._remove_items()
+        self._page_request_id += 1
+        self._loading_more = False
+        self._current_page = page if page is not None else '<unknown>'
 
-        uri = self._get_new_page_uri(page=1)
-        if uri is None:
-            log.debug("the returned browse_url address was None, skipping creating widgets")
+        key = self._page_key(page)
+
+        body = None
+        if key is not None:
+            body = _page_cache.get(key)
+
+        if body is not None:
+            log.debug("showing {} page {} from the page cache", self._list_type, page)
+            self._show_page(body)
+        else:
+            self.show_loading()
+
+        self._euterpe.make_request(uri, partial(
+            self._on_browse_result_callback,
+            self._page_request_id,
+            key,
+            body,
+        ))
+
+    def _page_key(self, page):
+        '''
+        Returns the page cache key for `page` or None when the page must not
+        be cached. Such as when its number is not known or the items are in
+        random order and every request returns different ones.
+        '''
+        if page is None or self.get_order_by() == "random":
+            return None
+
+        return (
+            self._euterpe.get_address(),
+            self._list_type,
+            self.get_order_by(),
+            self.get_order(),
+            page,
+        )
+
+    def _on_browse_result_callback(self, request_id, key, shown_body, status, body):
+        listKey = 'data'
+        if self._list_type == "playlist":
+            listKey = "playlists"
+
+        valid = status == 200 and body is not None and listKey in body
+        if valid and key is not None:
+            _page_cache.put(key, body)
+
+        if request_id != self._page_request_id:
+            log.debug("ignoring response for a page which is not shown anymore")
             return
 
-        self._euterpe.make_request(uri, self._on_browse_result_callback)
+        if shown_body is not None:
+            # This is the revalidation of a page shown from the cache.
+            if not valid or body == shown_body:
+                return
+            if len(self._resident_pages) > 1:
+                # Redrawing would throw away the pages scrolled to since.
+                return
+            log.debug("{} page {} has changed on the server", self._list_type, key[-1])
+            self._remove_items()
 
-    def _on_browse_result_callback(self, status, body):
         if status != 200:
             self._show_error("Error, HTTP response code {}".format(status))
             return
 
+        if not valid:
+            self._show_error("Unexpected response from server.")
+            return
+
+        self._show_page(body)
+
+    def _show_page(self, body):
         listKey = 'data'
         if self._list_type == "playlist":
             listKey = "playlists"
 
-        if body is None or listKey not in body:
-            self._show_error("Unexpected response from server.")
-            return
-
         if 'previous' in body and body['previous'] != "":
             self._previous_page = body['previous']
             self.button_previous_page.set_sensitive(True)
@@ -270,19 +381,221 @@ class PaginatedBoxList(Gtk.ScrolledWindow):
 
         self.hide_loading()
 
-        self._populate_items(body[listKey])
+        if not self._infinite:
+            self._populate_items(body[listKey])
+            return
 
-    def _populate_items(self, items):
-        for item in items:
-            widget = self._create_item_func(item)
-            self.add(widget)
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
-            if self._removed or not self.get_realized():
-                break
+        page = _ResidentPage(self._current_page, body)
+        # Random sorting has no pages to scroll to.
+        page.previous_uri = self._previous_page
+        page.next_uri = self._next_page
+        self._resident_pages = [page]
+        self._populate_page(page, body[listKey], append=True)
+
+    def _on_infinite_scroll_toggled(self, switch, *args):
+        self._infinite = switch.get_active()
+        self._browse_cfg["infinite_scroll"] = self._infinite
+        self._store_config()
+        self._show_page_buttons(not self._infinite)
+        self._load_page(1)
+
+    def _show_page_buttons(self, visible):
+        for button in [
+            self.button_first_page,
+            self.button_previous_page,
+            self.button_next_page,
+            self.button_last_page,
+        ]:
+            button.set_visible(visible)
+
+    def _maybe_load_more(self, *args):
+        '''
+        In infinite scroll mode loads the next page once the end of the list
+        is less than a screen away. So that it is usually there before the
+        user has reached it. The same is done for the previous page when
+        it is not resident anymore and the start of the list is that close.
+        '''
+        if not self._infinite or self._loading_more:
+            return False
+
+        if len(self._resident_pages) == 0 or self._populator.is_running():
+            return False
+
+        vadj = self.get_vadjustment()
+        value = vadj.get_value()
+        page_size = vadj.get_page_size()
+
+        last = self._resident_pages[-1]
+        first = self._resident_pages[0]
+
+        if last.next_uri is not None and \
+                vadj.get_upper() - value - page_size < page_size:
+            self._load_more(last.next_uri, append=True)
+        elif first.previous_uri is not None and value < page_size:
+            self._load_more(first.previous_uri, append=False)
 
         return False
 
+    def _load_more(self, uri, append):
+        page = self._get_page_from_url(uri)
+        key = self._page_key(page)
+
+        self._loading_more = True
+        callback = partial(
+            self._on_more_result,
+            self._page_request_id,
+            page,
+            key,
+            append,
+        )
+
+        body = None
+        if key is not None:
+            body = _page_cache.get(key)
+
+        if body is not None:
+            GLib.idle_add(callback, 200, body)
+            return
+
+        self.page_label.set_text("Loading...")
+        self._euterpe.make_request(uri, callback)
+
+    def _on_more_result(self, request_id, page, key, append, status, body):
+        listKey = 'data'
+        if self._list_type == "playlist":
+            listKey = "playlists"
+
+        valid = status == 200 and body is not None and listKey in body
+        if valid and key is not None:
+            _page_cache.put(key, body)
+
+        if request_id != self._page_request_id:
+            return
+
+        self._loading_more = False
+
+        if not valid:
+            log.warning("loading more items failed, HTTP response code {}", status)
+            self._update_resident_pages_label()
+            return
+
+        if 'pages_count' in body:
+            self._pages_count = int(body['pages_count'])
+
+        resident = _ResidentPage(page, body)
+        if append:
+            self._resident_pages.append(resident)
+        else:
+            self._anchor_to_first_page()
+            self._resident_pages.insert(0, resident)
+
+        self._drop_resident_pages(append)
+        self._populate_page(resident, body[listKey], append)
+
+    def _populate_page(self, page, items, append):
+        positions = None
+        if not append:
+            positions = itertools.count()
+
+        self._populator.populate(
+            items,
+            partial(self._add_page_item, page, positions),
+            self._on_page_populated,
+        )
+        self._update_resident_pages_label()
+
+    def _add_page_item(self, page, positions, item):
+        widget = self._create_item_func(item)
+        page.widgets.append(widget)
+        if positions is None:
+            self.add(widget)
+        else:
+            self.flow_container.insert(widget, next(positions))
+
+    def _on_page_populated(self):
+        # The new widgets are allocated on the next frame. Only then it is
+        # known whether they have filled the screen.
+        GLib.idle_add(self._maybe_load_more)
+
+    def _drop_resident_pages(self, appended):
+        '''
+        Removes the widgets of the pages over MAX_RESIDENT_PAGES from the end
+        opposite to the one where a page was just added.
+        '''
+        while len(self._resident_pages) > MAX_RESIDENT_PAGES:
+            if appended:
+                dropped = self._resident_pages.pop(0)
+                self._anchor_to_first_page()
+            else:
+                dropped = self._resident_pages.pop()
+
+            log.debug("dropping {} page {} from the list", self._list_type, dropped.page)
+            for widget in dropped.widgets:
+                # Destroys the GtkFlowBoxChild which wraps the widget too.
+                (widget.get_parent() or widget).destroy()
+
+    def _anchor_to_first_page(self):
+        '''
+        Makes the first widget of the first resident page keep its place on
+        the screen while the pages around it change.
+        '''
+        if len(self._resident_pages) == 0 or \
+                len(self._resident_pages[0].widgets) == 0:
+            self._scroll_anchor = None
+            return
+
+        anchor = self._resident_pages[0].widgets[0]
+        coords = anchor.translate_coordinates(self.flow_container, 0, 0)
+        if coords is None:
+            self._scroll_anchor = None
+            return
+
+        self._scroll_anchor = anchor
+        self._scroll_anchor_y = coords[1]
+
+    def _on_flow_allocated(self, *args):
+        '''
+        Scrolls by as much as the anchor widget has moved so that adding or
+        removing pages above the visible ones does not move them.
+        '''
+        anchor = self._scroll_anchor
+        if anchor is None:
+            return
+
+        coords = anchor.translate_coordinates(self.flow_container, 0, 0)
+        if coords is None:
+            return
+
+        moved = coords[1] - self._scroll_anchor_y
+        if moved == 0:
+            return
+
+        self._scroll_anchor_y = coords[1]
+        vadj = self.get_vadjustment()
+        vadj.set_value(vadj.get_value() + moved)
+
+    def _update_resident_pages_label(self):
+        if len(self._resident_pages) == 0:
+            return
+
+        first = self._resident_pages[0].page
+        last = self._resident_pages[-1].page
+        if first == last:
+            pages = first
+        else:
+            pages = '{}-{}'.format(first, last)
+
+        self.page_label.set_text('Page {} of {}'.format(
+            pages,
+            self._pages_count,
+        ))
+
+    def _populate_items(self, items):
+        self._populator.populate(items, self._add_item)
+
+    def _add_item(self, item):
+        self.add(self._create_item_func(item))
+
     def _on_sorting_type_changed(self, comboBox):
         self._browse_cfg["order_by"] = self.sorting_type_select.get_active_id()
 
@@ -313,81 +626,49 @@ class PaginatedBoxList(Gtk.ScrolledWindow):
         """
         Gets the first page while using the (presumably) new ordering settings.
         """
-        uri = uri = self._get_new_page_uri(page=1)
-        if uri is None:
-            log.debug("the returned browse_url address was None, skipping creating widgets")
-            return
-
-        self.show_loading()
-        self._remove_items()
-
-        self._current_page = 1
-        self._euterpe.make_request(uri, self._on_browse_result_callback)
+        self._load_page(1)
 
     def _on_next_button(self, btn):
         if self._next_page is None:
             return
 
-        self.show_loading()
-        self._remove_items()
-
-        self._set_page_by_url(self._next_page)
-        self._euterpe.make_request(self._next_page, self._on_browse_result_callback)
+        self._load_page(self._get_page_from_url(self._next_page), self._next_page)
 
     def _on_previous_button(self, btn):
         if self._previous_page is None:
             return
 
-        self.show_loading()
-        self._remove_items()
-
-        self._set_page_by_url(self._previous_page)
-        self._euterpe.make_request(self._previous_page, self._on_browse_result_callback)
+        self._load_page(
+            self._get_page_from_url(self._previous_page),
+            self._previous_page,
+        )
 
     def _on_first_page_button(self, btn):
-        self.show_loading()
-        self._remove_items()
-
-        uri = self._get_new_page_uri(page=1)
-        if uri is None:
-            log.debug("the returned URI address was None, stopped loading first page")
-            return
-
-        self._current_page = 1
-        self._euterpe.make_request(uri, self._on_browse_result_callback)
+        self._load_page(1)
 
     def _on_last_page_button(self, btn):
         if self._pages_count is None:
             return
 
-        self.show_loading()
-        self._remove_items()
+        self._load_page(self._pages_count)
 
-        uri = self._get_new_page_uri(page=self._pages_count)
-        if uri is None:
-            log.debug("the returned URI address was None, stopped loading last page")
-            return
-        self._current_page = self._pages_count
-        self._euterpe.make_request(uri, self._on_browse_result_callback)
-
-    def _set_page_by_url(self, url):
+    def _get_page_from_url(self, url):
         parsed = urllib.parse.urlparse(url)
         qparams =  urllib.parse.parse_qs(parsed.query)
         if 'page' not in qparams or len(qparams['page']) < 1:
-            self._current_page = '<unknown>'
-            return
+            return None
 
-        self._current_page = int(qparams['page'].pop())
+        return int(qparams['page'].pop())
 
     def _on_destroy(self, *args):
-        self._removed = True
         self._remove_items()
 
     def _remove_items(self):
+        self._populator.cancel()
+        self._resident_pages = []
+        self._scroll_anchor = None
         for child in self.flow_container.get_children():
             child.destroy()
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
 
     def _show_error(self, text):
         log.warning(text)
@@ -446,3 +727,21 @@ order_settings = {
         "default_direction": "desc",
     },
 }
+
+
+class _ResidentPage(object):
+    '''
+    A browse page shown in infinite scroll mode together with its widgets.
+    '''
+
+    def __init__(self, page, body):
+        self.page = page
+        self.previous_uri = body.get('previous') or None
+        self.next_uri = body.get('next') or None
+        self.widgets = []
+
+
+# Pages are shared between all lists so that a list opened again finds the
+# pages which were shown before. They are keyed by (server, list type,
+# order by, order, page number).
+_page_cache = LRUCache(max_entries=PAGE_CACHE_MAX_PAGES, ttl=PAGE_CACHE_TTL)
@@ -152,7 +152,15 @@ class EuterpePlayerUI(Gtk.Viewport):
         self._connect_player_handler(
             "playlist-changed",
             self.on_player_playlist_changed,
-            self.on_player_playlist_changed
+            self._fill_entry_list
+        )
+        self._connect_player_handler(
+            "tracks-inserted",
+            self.on_player_tracks_inserted,
+        )
+        self._connect_player_handler(
+            "tracks-removed",
+            self.on_player_tracks_removed,
         )
         self._connect_player_handler(
             "repeat-changed",
@@ -172,6 +180,8 @@ class EuterpePlayerUI(Gtk.Viewport):
         self._disconnect_player_handler("track-changed")
         self._disconnect_player_handler("progress")
         self._disconnect_player_handler("playlist-changed")
+        self._disconnect_player_handler("tracks-inserted")
+        self._disconnect_player_handler("tracks-removed")
         self._disconnect_player_handler("repeat-changed")
         self._disconnect_player_handler("shuffle-changed")
 
@@ -182,7 +192,7 @@ class EuterpePlayerUI(Gtk.Viewport):
         self._player.handler_disconnect(signal_id)
         self._player_signals[name] = None
 
-    def _connect_player_handler(self, name, handler, restore_state):
+    def _connect_player_handler(self, name, handler, restore_state=None):
         '''
         This method connects a handler to the named signal of the self._player.
 
@@ -191,7 +201,8 @@ class EuterpePlayerUI(Gtk.Viewport):
         then connects the signal to the handler.
         '''
         self._disconnect_player_handler(name)
-        GLib.idle_add(restore_state, self._player)
+        if restore_state is not None:
+            GLib.idle_add(restore_state, self._player)
         signal_id = self._player.connect(name, handler)
         self._player_signals[name] = signal_id
 
@@ -245,12 +256,27 @@ class EuterpePlayerUI(Gtk.Viewport):
         if player is not self._player:
             return
 
+        # The rows themselves are updated by the tracks-inserted and
+        # tracks-removed handlers.
+        track_index = player.get_track_index()
+        self._entry_list.set_currently_playing(track_index)
+
+    def on_player_tracks_inserted(self, player, position, count):
+        if player is not self._player:
+            return
+
+        tracks = player.get_queue().tracks(position, position + count)
+        self._entry_list.insert(position, tracks)
+
+    def on_player_tracks_removed(self, player, position, count):
+        if player is not self._player:
+            return
+
+        self._entry_list.remove(position, count)
+
+    def _fill_entry_list(self, player):
         self._entry_list.truncate()
-        songs = player.get_playlist()
-        for song in songs:
-            self._entry_list.add(song)
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
+        self._entry_list.insert(0, player.get_queue().tracks())
 
         track_index = player.get_track_index()
         self._entry_list.set_currently_playing(track_index)
@@ -19,6 +19,7 @@ from gi.repository import GObject, Gtk, Gio, Handy
 from euterpe_gtk.widgets.track import EuterpeTrack, PLAY_BUTTON_CLICKED, APPEND_BUTTON_CLICKED
 from euterpe_gtk.utils import emit_signal, format_duration
 from euterpe_gtk.widgets.playlist_delete_confirm import PlaylistDeleteConfirm
+from euterpe_gtk.chunked_populator import ChunkedPopulator
 
 
 SIGNAL_PLAYLIST_DELETED = "playlist-deleted"
@@ -97,6 +98,7 @@ class EuterpePlaylist(Gtk.Viewport):
 
         self._disable_actions_on_spinner(self.loading_spinner)
         self.connect("realize", self._on_realize)
+        self._populator = ChunkedPopulator(self, "playlist tracks")
         self.connect("unrealize", self._on_unrealize)
 
     def _refresh_playlist_info(self):
@@ -238,13 +240,13 @@ class EuterpePlaylist(Gtk.Viewport):
 
         self._playlist_tracks = playlist_tracks
 
-        for track in self._playlist_tracks:
-            tr_obj = EuterpeTrack(track)
-            self.track_list.add(tr_obj)
-            tr_obj.connect(PLAY_BUTTON_CLICKED, self.on_track_play_clicked)
-            tr_obj.connect(APPEND_BUTTON_CLICKED, self.on_track_append_clicked)
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
+        self._populator.populate(self._playlist_tracks, self._add_track)
+
+    def _add_track(self, track):
+        tr_obj = EuterpeTrack(track)
+        self.track_list.add(tr_obj)
+        tr_obj.connect(PLAY_BUTTON_CLICKED, self.on_track_play_clicked)
+        tr_obj.connect(APPEND_BUTTON_CLICKED, self.on_track_append_clicked)
 
     def _show_error(self, text):
         self._hide_spinner()
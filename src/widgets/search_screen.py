@@ -15,7 +15,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from gi.repository import GObject, Gtk
+from functools import partial
+from gi.repository import GObject, Gtk, Gio, GLib
 
 from euterpe_gtk.utils import emit_signal
 from euterpe_gtk.navigator import Navigator
@@ -25,11 +26,22 @@ from euterpe_gtk.widgets.album import EuterpeAlbum
 from euterpe_gtk.widgets.artist import EuterpeArtist
 from euterpe_gtk.widgets.track import EuterpeTrack, PLAY_BUTTON_CLICKED, APPEND_BUTTON_CLICKED
 from euterpe_gtk.widgets.simple_list import EuterpeSimpleList
+from euterpe_gtk.search_aggregator import aggregate_async, sort_by_tracks
 import euterpe_gtk.log as log
 
 
 STATE_RESTORED = "state-restored"
 
+# Milliseconds after the last change of the search text before searching
+# for it while the user is typing.
+SEARCH_DEBOUNCE_MS = 300
+
+# Shorter search texts are searched for only when the user presses Enter.
+SEARCH_MIN_CHARS = 3
+
+# Number of songs, albums and artists shown in the search result previews.
+SEARCH_PREVIEW_SIZE = 10
+
 
 @Gtk.Template(resource_path='/com/doycho/euterpe/gtk/ui/search-screen.ui')
 class EuterpeSearchScreen(Gtk.Viewport):
@@ -67,12 +79,27 @@ class EuterpeSearchScreen(Gtk.Viewport):
         self._search_results = []
         self._found_albums = []
         self._found_artists = []
+        # Found albums and artists are sorted only when all of them are
+        # needed. The previews are selected without sorting.
+        self._found_sorted = True
         self._search_query = ""
+        # The term of the search in progress or None when there is none.
+        self._searching_for = None
+
+        self._search_debounce_id = None
+        self._search_cancellable = None
+        # Incremented on every search so that only the result for the
+        # newest one is ever shown.
+        self._search_id = 0
 
         self.main_search_box.connect(
             "activate",
             self.on_search
         )
+        self.main_search_box.connect(
+            "changed",
+            self._on_search_text_changed
+        )
         self.play_all_search_results.connect(
             "clicked",
             self.on_play_all_search_results
@@ -116,8 +143,10 @@ class EuterpeSearchScreen(Gtk.Viewport):
         self._search_results = []
         self._found_albums = []
         self._found_artists = []
+        self._found_sorted = True
 
     def on_search(self, entry):
+        self._cancel_search_debounce()
         search_term = entry.get_text()
         if search_term == "":
             self._cleanup_search_results()
@@ -133,107 +162,188 @@ class EuterpeSearchScreen(Gtk.Viewport):
             log.warning("received None instead of a search term, aborting")
             return
 
+        self._cancel_search_request()
+
         self.search_loading_indicator.start()
         self.search_loading_indicator.set_visible(True)
 
         self._cleanup_search_results()
 
+        self._search_cancellable = Gio.Cancellable.new()
+        self._searching_for = search_term
+
         euterpe = self._win.get_euterpe()
-        euterpe.search(search_term, self._on_search_result)
+        euterpe.search_streaming(
+            search_term,
+            partial(self._on_search_tracks, self._search_id),
+            partial(self._on_search_done, self._search_id),
+            self._search_cancellable,
+        )
 
-    def _on_search_result(self, status, body, query):
-        self.search_loading_indicator.stop()
-        self.search_loading_indicator.set_visible(False)
+    def _on_search_text_changed(self, entry):
+        '''
+        Searches as the user types. The search starts once the text has not
+        changed for SEARCH_DEBOUNCE_MS. Any search still in progress is
+        cancelled as soon as the text is not its term anymore. So only the
+        result for the text in the entry is ever shown.
+        '''
+        self._cancel_search_debounce()
 
-        self._cleanup_search_results()
+        search_term = entry.get_text().strip()
+        if self._searching_for is not None and \
+                self._searching_for != search_term:
+            self._cancel_search_request()
+            self.search_loading_indicator.stop()
+            self.search_loading_indicator.set_visible(False)
 
-        if status != 200:
-            self.search_error.set_description(
-                "HTTP response code {}.".format(status)
-            )
-            self.search_result_viewport.add(self.search_error)
+        if len(search_term) < SEARCH_MIN_CHARS:
             return
 
-        if len(body) == 0:
-            self.nothing_found.set_description(
-                "Nothing found for '{}'.".format(query)
-            )
-            self.search_result_viewport.add(self.nothing_found)
+        if search_term == self._search_query and self._searching_for is None:
+            # Its results are shown already. Such as when the text was set
+            # while restoring the state.
             return
 
-        self._search_query = query
-        self._search_results = body
-
-        album_to_tracks = {}
-        artists_to_tracks = {}
-        for track in body:
-            album_id = track["album_id"]
-            album = album_to_tracks.get(album_id, {
-                "tracks": 0,
-                "artist": track.get("artist", "n/a"),
-                "album": track.get("album", "n/a"),
-                "album_id": album_id,
-            })
-            if album["tracks"] == 0:
-                album_to_tracks[album_id] = album
-            album["tracks"] += 1
-
-            artist_id = track["artist_id"]
-            artist = artists_to_tracks.get(artist_id, {
-                "tracks": 0,
-                "artist": track.get("artist", "n/a"),
-                "artist_id": artist_id,
-            })
-            if artist["tracks"] == 0:
-                artists_to_tracks[artist_id] = artist
-            artist["tracks"] += 1
-
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
-
-        albums = sorted(
-            album_to_tracks.items(),
-            key=lambda v: v[1]["tracks"],
-            reverse=True
+        self._search_debounce_id = GLib.timeout_add(
+            SEARCH_DEBOUNCE_MS,
+            self._on_search_debounced,
         )
-        self._found_albums = [t[1] for t in albums]
 
-        # Try to remove this from memory as fast as possible.
-        album_to_tracks = None
+    def _on_search_debounced(self):
+        self._search_debounce_id = None
+        self.search_for(self.main_search_box.get_text().strip())
+        return False
+
+    def _cancel_search_debounce(self):
+        if self._search_debounce_id is None:
+            return
+
+        GLib.source_remove(self._search_debounce_id)
+        self._search_debounce_id = None
+
+    def _cancel_search_request(self):
+        # Makes sure the result of the cancelled search is ignored.
+        self._search_id += 1
+        self._searching_for = None
+
+        if self._search_cancellable is None:
+            return
+
+        self._search_cancellable.cancel()
+        self._search_cancellable = None
+
+    def _on_search_tracks(self, search_id, tracks, query):
+        '''
+        Shows the songs preview as soon as the first found tracks arrive.
+        Albums and artists are shown once all of them are here.
+        '''
+        if search_id != self._search_id:
+            return
 
-        self._populate_search_preview_albums()
+        preview_missing = SEARCH_PREVIEW_SIZE - len(self._search_results)
+        self._search_results.extend(tracks)
 
-        artists = sorted(
-            artists_to_tracks.items(),
-            key=lambda v: v[1]["tracks"],
-            reverse=True
+        for track in tracks[:max(0, preview_missing)]:
+            tr_obj = self._create_track_widget(track)
+            self.search_result_songs.add(tr_obj)
+
+        if self.search_result_list.get_parent() is None:
+            self._set_result_actions_sensitive(False)
+            self.search_result_viewport.add(self.search_result_list)
+            self.search_result_list.show()
+
+    def _on_search_done(self, search_id, status, query):
+        if search_id != self._search_id:
+            log.debug("ignoring result for superseded search '{}'", query)
+            return
+
+        self._search_cancellable = None
+
+        if status == 200 and len(self._search_results) > 0:
+            # Grouping many thousands of tracks takes long enough to be
+            # felt. So it is done in a thread and the result is shown at once.
+            aggregate_async(self._search_results, SEARCH_PREVIEW_SIZE,
+                self._on_search_aggregated, search_id, query)
+            return
+
+        self._searching_for = None
+        self.search_loading_indicator.stop()
+        self.search_loading_indicator.set_visible(False)
+
+        self._cleanup_search_results()
+
+        if status != 200:
+            description = "HTTP response code {}.".format(status)
+            if status is None:
+                description = "Reading the search result failed."
+            self.search_error.set_description(description)
+            self.search_result_viewport.add(self.search_error)
+            return
+
+        self.nothing_found.set_description(
+            "Nothing found for '{}'.".format(query)
         )
-        self._found_artists = [t[1] for t in artists]
+        self.search_result_viewport.add(self.nothing_found)
 
-        # Try to remove this from memory as fast as possible.
-        artists_to_tracks = None
+    def _on_search_aggregated(self, result, search_id, query):
+        if search_id != self._search_id:
+            log.debug("ignoring result for superseded search '{}'", query)
+            return
 
-        self._populate_search_preview_artists()
-        self._populate_search_preview_songs()
+        self._searching_for = None
+        self.search_loading_indicator.stop()
+        self.search_loading_indicator.set_visible(False)
 
-        self.search_result_viewport.add(self.search_result_list)
-        self.search_result_list.show()
+        if result is None:
+            self._cleanup_search_results()
+            self.search_error.set_description(
+                "Processing the search result failed."
+            )
+            self.search_result_viewport.add(self.search_error)
+            return
+
+        self._search_query = query
+        self._found_albums = result["albums"]
+        self._found_artists = result["artists"]
+        self._found_sorted = False
+
+        self._populate_search_preview_albums(result["top_albums"])
+        self._populate_search_preview_artists(result["top_artists"])
+        self._set_result_actions_sensitive(True)
+
+    def _set_result_actions_sensitive(self, sensitive):
+        # Acting on a partial result would be surprising.
+        for button in [
+            self.play_all_search_results,
+            self.see_all_albums_button,
+            self.see_all_artists_button,
+            self.see_all_songs_button,
+        ]:
+            button.set_sensitive(sensitive)
 
     def _populate_search_preview_songs(self):
-        for track in self._search_results[:10]:
+        for track in self._search_results[:SEARCH_PREVIEW_SIZE]:
             tr_obj = self._create_track_widget(track)
             self.search_result_songs.add(tr_obj)
 
-    def _populate_search_preview_artists(self):
-        for artist_info in self._found_artists[:10]:
+    def _populate_search_preview_artists(self, artists):
+        for artist_info in artists:
             artist_obj = self._create_small_artists_widget(artist_info)
             self.search_result_artists.add(artist_obj)
 
-    def _populate_search_preview_albums(self):
-        for album_info in self._found_albums[:10]:
+    def _populate_search_preview_albums(self, albums):
+        for album_info in albums:
             album_widget = self._create_small_album_widget(album_info)
             self.search_result_albums.add(album_widget)
 
+    def _sort_found(self):
+        if self._found_sorted:
+            return
+
+        sort_by_tracks(self._found_albums)
+        sort_by_tracks(self._found_artists)
+        self._found_sorted = True
+
     def on_play_all_search_results(self, btn):
         player = self._win.get_player()
         player.set_playlist(self._search_results)
@@ -289,6 +399,7 @@ class EuterpeSearchScreen(Gtk.Viewport):
         return track_obj
 
     def on_see_all_artists(self, btn):
+        self._sort_found()
         artist_list = EuterpeSimpleList(
             self._found_artists,
             self._create_small_artists_widget,
@@ -300,6 +411,7 @@ class EuterpeSearchScreen(Gtk.Viewport):
         self._nav.show_screen(artist_list)
 
     def on_see_all_albums(self, btn):
+        self._sort_found()
         album_list = EuterpeSimpleList(
             self._found_albums,
             self._create_small_album_widget,
@@ -378,6 +490,7 @@ class EuterpeSearchScreen(Gtk.Viewport):
         emit_signal(self, STATE_RESTORED)
 
     def store_state(self, store):
+        self._sort_found()
         state = {
             "search_term": self._search_query,
             "tracks": self._search_results,
@@ -391,7 +504,9 @@ class EuterpeSearchScreen(Gtk.Viewport):
             self.search_result_viewport.remove
         )
         self._populate_search_preview_songs()
-        self._populate_search_preview_albums()
-        self._populate_search_preview_artists()
+        self._populate_search_preview_albums(
+            self._found_albums[:SEARCH_PREVIEW_SIZE])
+        self._populate_search_preview_artists(
+            self._found_artists[:SEARCH_PREVIEW_SIZE])
         self.search_result_viewport.add(self.search_result_list)
         self.search_result_list.show()
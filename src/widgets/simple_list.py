@@ -16,6 +16,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from gi.repository import Gtk, GLib
+from euterpe_gtk.chunked_populator import ChunkedPopulator
 
 
 @Gtk.Template(resource_path='/com/doycho/euterpe/gtk/ui/simple-list.ui')
@@ -40,7 +41,7 @@ class EuterpeSimpleList(Gtk.Viewport):
         self._items = items
         self._create_item_func = create_item_func
         self._widgets_created = False
-        self._removed = False
+        self._populator = ChunkedPopulator(self, "simple list")
 
         self.connect("realize", self._create_widgets)
         self.connect("unrealize", self._on_unrealize)
@@ -61,22 +62,16 @@ class EuterpeSimpleList(Gtk.Viewport):
         )
 
     def _populate_items(self):
-        for item in self._items:
-            widget = self._create_item_func(item)
-            self.add(widget)
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
-            if self._removed or not self.get_realized():
-                break
-
+        self._populator.populate(self._items, self._add_item)
         return False
 
+    def _add_item(self, item):
+        self.add(self._create_item_func(item))
+
     def _on_unrealize(self, *args):
-        self._removed = True
+        self._populator.cancel()
         for child in self.contents.get_children():
             child.destroy()
-            while (Gtk.events_pending()):
-                Gtk.main_iteration()
 
     def add(self, widget):
         self.contents.add(widget)
@@ -304,6 +304,7 @@ class EuterpeGtkWindow(Handy.ApplicationWindow):
         screen = self.login_scroll_view
         if self._logged_in:
             screen = self.logged_in_screen
+            self._euterpe.sync_catalog()
         else:
             self._attach_login_form()
 
@@ -399,6 +400,7 @@ class EuterpeGtkWindow(Handy.ApplicationWindow):
     def _on_login_success(self, login_form):
         self._logged_in = True
         self._home_widget.restore_state(self._cache_store)
+        self._euterpe.sync_catalog()
 
         self.app_stack.set_visible_child(
             self.logged_in_screen
@@ -411,6 +413,10 @@ class EuterpeGtkWindow(Handy.ApplicationWindow):
         self.cleanup_service_config()
         self._logged_in = False
 
+        address = self._euterpe.get_address()
+        if address is not None:
+            self._euterpe.get_catalog().remove_server(address)
+
         self._euterpe.set_address(None)
         self._euterpe.set_token(None)
         self._euterpe.set_username(None)
@@ -0,0 +1,35 @@
+# conftest.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import importlib.util
+
+# The sources are installed as the euterpe_gtk package by meson. Make them
+# importable under the same name straight from the source tree.
+_SRC = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "src")
+
+if "euterpe_gtk" not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        "euterpe_gtk",
+        os.path.join(_SRC, "__init__.py"),
+        submodule_search_locations=[_SRC],
+    )
+    _module = importlib.util.module_from_spec(_spec)
+    sys.modules["euterpe_gtk"] = _module
+    _spec.loader.exec_module(_module)
@@ -0,0 +1,55 @@
+# test_http.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import pytest
+
+gi = pytest.importorskip("gi")
+gi.require_version("Soup", "3.0")
+
+from euterpe_gtk.http import Lane, Priority
+
+
+def test_lane_drains_requests_which_were_not_started():
+    lane = Lane(Priority.LOW, 1, 5000)
+    started = []
+
+    lane.submit(lambda wait: started.append("first") or True, None)
+    for _ in range(3000):
+        lane.submit(lambda wait: False, None)
+    lane.submit(lambda wait: started.append("last") or True, None)
+
+    assert lane.get_stats()["queued"] == 3001
+
+    # Every request but the last one was cancelled while waiting. They are
+    # all skipped without recursing once for each of them.
+    lane.release()
+
+    assert started == ["first", "last"]
+    stats = lane.get_stats()
+    assert stats["queued"] == 0
+    assert stats["in_flight"] == 1
+
+
+def test_lane_fails_requests_above_queue_depth():
+    lane = Lane(Priority.LOW, 1, 1)
+    failed = []
+
+    lane.submit(lambda wait: True, None)
+    lane.submit(lambda wait: True, None)
+    lane.submit(lambda wait: True, lambda: failed.append(True))
+
+    assert failed == [True]
+    assert lane.get_stats()["rejected"] == 1
@@ -0,0 +1,76 @@
+# test_json_decoder.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import json
+
+import pytest
+
+from euterpe_gtk.json_decoder import JSONArrayDecoder
+
+DOCUMENT = (
+    ' [1e5, -2.5E-3, 0, 10, 3.25, -7,'
+    '"café ♫ \\"q\\" \\u00e9", true, false, null,'
+    ' {"id": 42, "tags": [1, 2.0, "x"]}, [], {}, [[-1e+2]] ] '
+).encode("utf-8")
+
+
+def _decode(chunks):
+    decoder = JSONArrayDecoder()
+    items = []
+    for chunk in chunks:
+        items.extend(decoder.feed(chunk))
+    items.extend(decoder.close())
+    return items
+
+
+def test_decodes_whole_document():
+    assert _decode([DOCUMENT]) == json.loads(DOCUMENT)
+
+
+@pytest.mark.parametrize("offset", range(1, len(DOCUMENT)))
+def test_decodes_document_split_at_any_byte(offset):
+    chunks = [DOCUMENT[:offset], DOCUMENT[offset:]]
+    assert _decode(chunks) == json.loads(DOCUMENT)
+
+
+def test_decodes_document_byte_by_byte():
+    chunks = [DOCUMENT[i:i + 1] for i in range(len(DOCUMENT))]
+    assert _decode(chunks) == json.loads(DOCUMENT)
+
+
+def test_number_is_not_returned_before_its_end():
+    decoder = JSONArrayDecoder()
+    assert decoder.feed(b'[1e') == []
+    assert decoder.feed(b'5') == []
+    assert decoder.feed(b']') == [1e5]
+    assert decoder.close() == []
+
+
+def test_empty_array():
+    assert _decode([b'[', b' ]']) == []
+
+
+@pytest.mark.parametrize("document", [
+    b'{"a": 1}',
+    b'[1, 2',
+    b'[1 2]',
+    b'[1,]',
+    b'[1] x',
+    b'[1e]',
+])
+def test_invalid_document(document):
+    with pytest.raises(ValueError):
+        _decode([document])
@@ -0,0 +1,81 @@
+# test_lru_cache.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from euterpe_gtk.lru_cache import LRUCache
+import euterpe_gtk.lru_cache as lru_cache
+
+
+def test_removes_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_size_limit_keeps_newest():
+    cache = LRUCache(max_size=10, size_func=len)
+    cache.put("a", "12345")
+    cache.put("b", "123456")
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "123456"
+    assert cache.get_size() == 6
+
+    cache.put("c", "x" * 20)
+    assert len(cache) == 1
+    assert cache.get_size() == 20
+
+    cache.remove("c")
+    assert cache.get_size() == 0
+
+
+def test_expires_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(lru_cache.time, "monotonic", lambda: now[0])
+
+    cache = LRUCache(ttl=10)
+    cache.put("a", 1)
+
+    now[0] += 10
+    assert cache.get("a") == 1
+
+    now[0] += 1
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_remove_if_and_stats():
+    cache = LRUCache()
+    cache.put(("s1", 1), "a")
+    cache.put(("s1", 2), "b")
+    cache.put(("s2", 1), "c")
+
+    cache.remove_if(lambda key: key[0] == "s1")
+
+    assert cache.get(("s1", 1)) is None
+    assert cache.get(("s2", 1)) == "c"
+    assert cache.get_stats() == {
+        "hits": 1,
+        "misses": 1,
+        "entries": 1,
+        "size": 0,
+    }
@@ -0,0 +1,174 @@
+# test_player.py
+#
+# Copyright 2025 Doychin Atanasov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import wave
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import pytest
+
+gi = pytest.importorskip("gi")
+gi.require_version("Gst", "1.0")
+from gi.repository import GLib, Gst
+
+Gst.init(None)
+
+for _factory in ["concat", "souphttpsrc", "wavparse", "fakesink"]:
+    if Gst.ElementFactory.find(_factory) is None:
+        pytest.skip("GStreamer element {} is missing".format(_factory),
+            allow_module_level=True)
+
+import euterpe_gtk.player as player_module
+from euterpe_gtk.player import Player, SIGNAL_TRACK_CHANGED
+
+TRACK_SECONDS = 1
+SAMPLE_RATE = 8000
+
+
+class FakeService(object):
+
+    def __init__(self, address):
+        self._address = address
+
+    def get_address(self):
+        return self._address
+
+    def get_token(self):
+        return None
+
+    def get_track_url(self, track_id):
+        return "{}/{}.wav".format(self._address, track_id)
+
+    def download_track(self, track_id, cancellable, callback, *args):
+        # Prefetching would put the next track in the audio cache and it
+        # would not be streamed.
+        GLib.idle_add(lambda: callback(404, None, cancellable, *args))
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+def _write_track(path):
+    with wave.open(str(path), "wb") as track:
+        track.setnchannels(1)
+        track.setsampwidth(2)
+        track.setframerate(SAMPLE_RATE)
+        track.writeframes(b"\x00\x00" * SAMPLE_RATE * TRACK_SECONDS)
+
+
+@pytest.fixture
+def server(tmp_path):
+    tracks = tmp_path / "tracks"
+    tracks.mkdir()
+    _write_track(tracks / "1.wav")
+    _write_track(tracks / "2.wav")
+
+    handler = partial(_QuietHandler, directory=str(tracks))
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(httpd.server_address[1])
+    httpd.shutdown()
+
+
+@pytest.fixture
+def player(tmp_path, monkeypatch, server):
+    make = Gst.ElementFactory.make
+
+    def make_element(factory, name):
+        if factory == "autoaudiosink":
+            factory = "fakesink"
+        return make(factory, name)
+
+    monkeypatch.setattr(Gst.ElementFactory, "make", make_element)
+    monkeypatch.setattr(player_module, "audio_cache_dir",
+        lambda: str(tmp_path / "cache"))
+
+    p = Player(FakeService(server))
+    yield p
+    p.stop()
+
+
+def test_gapless_switch_between_streamed_tracks(player, server):
+    player.set_playlist([{"id": 1}, {"id": 2}])
+    player.play()
+    player._prepare_next_track()
+
+    prepared = player._next_source
+    assert prepared is not None
+
+    loop = GLib.MainLoop()
+    changes = []
+
+    def on_track_changed(p):
+        changes.append(p.get_track_index())
+        loop.quit()
+
+    player.connect(SIGNAL_TRACK_CHANGED, on_track_changed)
+    GLib.timeout_add_seconds(TRACK_SECONDS + 10, loop.quit)
+    loop.run()
+
+    assert changes == [1]
+    # The prepared source was switched to instead of the track being
+    # loaded again after the end of the first one.
+    assert player._current_source is prepared
+    assert player._next_source is None
+    # The first track was streamed in full and is in the audio cache now.
+    cache = player.get_audio_cache()
+    assert cache.lookup((server, 1)) is not None
+
+
+def test_next_skips_to_prepared_source(player, server):
+    player.set_playlist([{"id": 1}, {"id": 2}])
+    player.play()
+    player._prepare_next_track()
+
+    prepared = player._next_source
+    assert prepared is not None
+
+    player.next()
+
+    # The prepared source is used instead of connecting to the server again.
+    assert player.get_track_index() == 1
+    assert player._current_source is prepared
+    assert player._next_source is None
+
+    loop = GLib.MainLoop()
+    errors = []
+    ended = []
+
+    def on_error(bus, message):
+        errors.append(message.parse_error())
+        loop.quit()
+
+    def on_eos(bus, message):
+        ended.append(True)
+        loop.quit()
+
+    bus = player._pipeline.get_bus()
+    bus.connect("message::error", on_error)
+    bus.connect("message::eos", on_eos)
+    GLib.timeout_add_seconds(TRACK_SECONDS + 10, loop.quit)
+    loop.run()
+
+    # The second track was played to its end.
+    assert errors == []
+    assert ended == [True]